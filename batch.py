@@ -0,0 +1,74 @@
+"""
+LC–MS Scientific Viewer (rewrite 2026)
+Elaborazione batch senza GUI – Python 3.12
+
+Esempio:
+    python batch.py cartella_run/ --out risultati/ --xic 445.1200 301.1410
+    (rilanciando lo stesso comando i file già elaborati vengono saltati)
+"""
+
+import argparse
+import os
+import sys
+
+from core.batch import BatchProcessor, MEMORY_BUDGET
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python batch.py",
+        description="Riepiloghi TIC/BPC, picchi e XIC per cartelle di file mzML."
+    )
+    parser.add_argument("inputs", nargs="+", help="file .mzML e/o cartelle")
+    parser.add_argument("--out", required=True,
+                        help="cartella di output (tabella + checkpoint)")
+    parser.add_argument("--recursive", action="store_true",
+                        help="cerca i file anche nelle sottocartelle")
+    parser.add_argument("--xic", nargs="*", type=float, default=[],
+                        help="m/z target per gli XIC")
+    parser.add_argument("--ppm", type=float, default=5.0, help="tolleranza XIC (ppm)")
+    parser.add_argument("--threshold", type=float, default=5.0,
+                        help="soglia del peak picking (%% del massimo)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processi paralleli (default: CPU)")
+    parser.add_argument("--memory", type=float, default=MEMORY_BUDGET / 1024 ** 3,
+                        help="budget di memoria totale in GiB, diviso tra i "
+                             "processi (0 = nessun limite)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    paths = BatchProcessor.find_files(args.inputs, recursive=args.recursive)
+    if not paths:
+        print("Nessun file mzML trovato.", file=sys.stderr)
+        return 2
+
+    processor = BatchProcessor(args.out, xic_targets=args.xic, ppm=args.ppm,
+                               peak_percent=args.threshold, workers=args.workers,
+                               memory_budget=int(args.memory * 1024 ** 3) or None)
+
+    def progress(done, total, path, status, seconds):
+        name = os.path.basename(path)
+        if done is None:
+            print(f"[   –/{total}] {name}: già elaborato", file=sys.stderr)
+        else:
+            print(f"[{done:>4}/{total}] {name}: {status} ({seconds:.1f} s)",
+                  file=sys.stderr, flush=True)
+
+    try:
+        table, errors = processor.run(paths, progress=progress)
+    except KeyboardInterrupt:
+        print("\nInterrotto: rilancia lo stesso comando per riprendere.",
+              file=sys.stderr)
+        return 130
+
+    print(f"Tabella: {table}")
+    for path, error in errors:
+        print(f"ERRORE {os.path.basename(path)}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
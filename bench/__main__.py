@@ -0,0 +1,86 @@
+"""
+bench/__main__.py
+Riga di comando dei benchmark:  python -m bench [opzioni]
+Versione riscritta 2026 – Python 3.12
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import matplotlib
+matplotlib.use("Agg")
+
+from bench.scenarios import BenchmarkSuite
+from bench.synthetic import SyntheticMzML
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Benchmark headless di caricamento, ricerche, plotting e zoom."
+    )
+    data = parser.add_argument_group("dataset sintetico")
+    data.add_argument("--scans", type=int, default=2000, help="numero di scan")
+    data.add_argument("--peaks", type=int, default=300, help="picchi per scan MS1")
+    data.add_argument("--ms2-ratio", type=float, default=0.75,
+                      help="frazione di scan MS2 (0 – <1)")
+    data.add_argument("--no-compression", action="store_true",
+                      help="array binari non compressi (default zlib)")
+    data.add_argument("--mode", choices=SyntheticMzML.MODES, default="centroid")
+    data.add_argument("--seed", type=int, default=0)
+    data.add_argument("--mzml", help="usa un file mzML esistente invece del sintetico")
+
+    run = parser.add_argument_group("esecuzione")
+    run.add_argument("--repeat", type=int, default=5, help="ripetizioni per scenario")
+    run.add_argument("--workers", type=int, default=None,
+                     help="processi per load_parallel (default: CPU)")
+    run.add_argument("--only", nargs="+", choices=BenchmarkSuite.SCENARIOS,
+                     help="esegue solo gli scenari indicati")
+    run.add_argument("--out", help="scrive i risultati in JSON")
+    run.add_argument("--compare", help="confronta con un JSON di una versione precedente")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="lcms_bench_data_") as tmp:
+        if args.mzml:
+            path, dataset = args.mzml, {"file": os.path.abspath(args.mzml)}
+        else:
+            generator = SyntheticMzML(
+                n_scans=args.scans, peaks=args.peaks, ms2_ratio=args.ms2_ratio,
+                compression=not args.no_compression, mode=args.mode, seed=args.seed
+            )
+            path = generator.write(os.path.join(tmp, "synthetic.mzML"))
+            dataset = generator.describe()
+
+        suite = BenchmarkSuite(path, repeat=args.repeat, workers=args.workers,
+                               seed=args.seed, dataset=dataset)
+        report = suite.run(
+            only=args.only,
+            progress=lambda name: print(f"… {name}", file=sys.stderr, flush=True)
+        )
+
+    print(f"{'scenario':<18} {'min (s)':>10} {'mediana (s)':>12} {'per op (s)':>12}")
+    for name, r in report["results"].items():
+        per_op = f"{r['per_op_s']:.3e}" if "per_op_s" in r else ""
+        print(f"{name:<18} {r['min_s']:>10.4f} {r['median_s']:>12.4f} {per_op:>12}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"\n{'scenario':<18} {'base (s)':>10} {'ora (s)':>10} {'rapporto':>9}")
+        for name, old, new, ratio in BenchmarkSuite.compare(base, report):
+            print(f"{name:<18} {old:>10.4f} {new:>10.4f} {ratio:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+bench/scenarios.py
+Scenari di benchmark headless (backend Agg) – LC–MS Viewer
+Versione riscritta 2026 – Python 3.12
+"""
+
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class BenchmarkSuite:
+    """
+    Esegue scenari temporizzati su un file mzML (tipicamente generato
+    da SyntheticMzML) senza display: le figure usano FigureCanvasAgg.
+
+    Ogni scenario ha un setup non misurato e una funzione misurata
+    `repeat` volte; il risultato riporta min / mediana / media e, se lo
+    scenario esegue più operazioni per chiamata, il tempo per operazione.
+
+    run() restituisce un dict JSON con chiavi stabili (nome scenario),
+    confrontabile tra versioni con compare().
+    """
+
+    SCENARIOS = (
+        "load_eager",
+        "load_parallel",
+        "load_lazy",
+        "load_budgeted",
+        "load_cached",
+        "closest_ms1",
+        "closest_ms1_many",
+        "plot_tic_bpc",
+        "plot_ms1",
+        "detect_peaks",
+        "zoom_drag",
+        "zoom_drag_blit",
+        "zoom_release",
+        "xic_extract",
+        "spatial_query",
+    )
+
+    def __init__(self, mzml_path, repeat=5, workers=None, seed=0, dataset=None):
+        self.mzml_path = mzml_path
+        self.repeat = repeat
+        self.workers = workers or os.cpu_count() or 1
+        self.rng = np.random.default_rng(seed)
+        self.dataset = dataset or {}
+
+        self._loader = None        # run caricato per gli scenari interattivi
+        self._figure = None
+
+    # ==========================================================
+    # ESECUZIONE
+    # ==========================================================
+    def run(self, only=None, progress=None):
+        """
+        Esegue gli scenari (tutti o solo quelli in `only`).
+        progress(nome) viene chiamata prima di ogni scenario.
+        """
+        names = [n for n in self.SCENARIOS if only is None or n in only]
+        results = {}
+
+        tmp = tempfile.mkdtemp(prefix="lcms_bench_")
+        self._cache_root = os.path.join(tmp, "cache")
+        try:
+            for name in names:
+                if progress is not None:
+                    progress(name)
+                results[name] = getattr(self, f"_bench_{name}")()
+        finally:
+            if self._loader is not None:
+                self._loader.reset()
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        return {
+            "meta": self.environment(),
+            "dataset": dict(self.dataset, file_bytes=os.path.getsize(self.mzml_path)),
+            "repeat": self.repeat,
+            "results": results,
+        }
+
+    def _time(self, fn, setup=None, ops=1):
+        """Misura fn() `repeat` volte (setup() non misurato prima di ognuna)."""
+        times = []
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+
+        result = {
+            "min_s": min(times),
+            "median_s": statistics.median(times),
+            "mean_s": statistics.fmean(times),
+            "ops": ops,
+        }
+        if ops > 1:
+            result["per_op_s"] = result["median_s"] / ops
+        return result
+
+    @staticmethod
+    def environment():
+        import matplotlib
+        versions = {"python": platform.python_version(), "numpy": np.__version__,
+                    "matplotlib": matplotlib.__version__}
+        try:
+            import pyteomics
+            versions["pyteomics"] = getattr(pyteomics, "__version__", None)
+        except ImportError:
+            pass
+        return {
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "versions": versions,
+            "argv": sys.argv[1:],
+        }
+
+    # ==========================================================
+    # CARICAMENTO
+    # ==========================================================
+    def _bench_load(self, ops_kwargs, loader_kwargs=None, setup=None):
+        from core.loader import MZMLLoader
+
+        state = {}
+
+        def make():
+            if setup is not None:
+                setup()
+            state["loader"] = MZMLLoader(**(loader_kwargs or {}))
+
+        def fn():
+            state["loader"].load(self.mzml_path, **ops_kwargs)
+
+        result = self._time(fn, setup=make)
+
+        # Profilo per fase dell'ultima ripetizione
+        report = state["loader"].profile_report()
+        if report is not None:
+            result["phases_s"] = report["phases_s"]
+            result["spectra_per_s"] = report["spectra_per_s"]
+        state["loader"].reset()
+        return result
+
+    def _bench_load_eager(self):
+        return self._bench_load({})
+
+    def _bench_load_parallel(self):
+        result = self._bench_load({"workers": self.workers})
+        result["workers"] = self.workers
+        return result
+
+    def _bench_load_lazy(self):
+        return self._bench_load({"lazy": True})
+
+    def _bench_load_budgeted(self):
+        return self._bench_load({}, {"memory_budget": 2 * 1024 ** 3})
+
+    def _bench_load_cached(self):
+        from core.cache import SpectraCache
+        from core.loader import MZMLLoader
+
+        cache = SpectraCache(root=self._cache_root)
+        MZMLLoader(cache=cache).load(self.mzml_path)      # cache calda
+        return self._bench_load({}, {"cache": cache})
+
+    # ==========================================================
+    # RICERCHE
+    # ==========================================================
+    def _loaded(self):
+        """Run caricato una volta per gli scenari che non misurano il load."""
+        if self._loader is None:
+            from core.loader import MZMLLoader
+            self._loader = MZMLLoader()
+            self._loader.load(self.mzml_path)
+        return self._loader
+
+    def _random_rts(self, n):
+        rts = self._loaded().ms1_rt_sorted
+        return self.rng.uniform(rts[0], rts[-1], n)
+
+    def _bench_closest_ms1(self):
+        loader = self._loaded()
+        rts = self._random_rts(1000)
+
+        def fn():
+            for rt in rts:
+                loader.get_closest_ms1(rt)
+
+        return self._time(fn, ops=len(rts))
+
+    def _bench_closest_ms1_many(self):
+        loader = self._loaded()
+        rts = self._random_rts(100_000)
+        return self._time(lambda: loader.get_closest_ms1_many(rts), ops=len(rts))
+
+    def _bench_xic_extract(self):
+        from core.xic import XICExtractor
+
+        loader = self._loaded()
+        targets = self.rng.uniform(150.0, 950.0, 50)
+        xic = XICExtractor()
+
+        # Indice costruito nel primo setup e riusato (come nella GUI)
+        return self._time(lambda: xic.extract(loader, targets, ppm=10.0),
+                          setup=loader.get_spatial_index,
+                          ops=len(targets))
+
+    def _bench_spatial_query(self):
+        loader = self._loaded()
+        index = loader.get_spatial_index()
+        rts = self._random_rts(100)
+        mzs = self.rng.uniform(100.0, 950.0, 100)
+
+        def fn():
+            for rt, mz in zip(rts, mzs):
+                index.query(rt, rt + 1.0, mz, mz + 50.0)
+
+        return self._time(fn, ops=len(rts))
+
+    # ==========================================================
+    # PLOTTING / INTERAZIONE
+    # ==========================================================
+    def _axes(self):
+        """Figura Agg con il layout della finestra principale."""
+        if self._figure is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+            fig = Figure(figsize=(14, 10), dpi=100, layout="constrained")
+            FigureCanvasAgg(fig)
+            axes = [fig.add_subplot(3, 1, i) for i in (1, 2, 3)]
+            self._figure = (fig, *axes)
+        return self._figure
+
+    def _bench_plot_tic_bpc(self):
+        from core.plotting import PlotManager
+
+        loader = self._loaded()
+        fig, ax_tic, ax_bpc, _ = self._axes()
+        plotting = PlotManager()
+
+        def fn():
+            plotting.plot_tic(ax_tic, loader)
+            plotting.plot_bpc(ax_bpc, loader)
+            fig.canvas.draw()
+
+        return self._time(fn)
+
+    def _bench_plot_ms1(self):
+        from core.plotting import PlotManager
+
+        loader = self._loaded()
+        fig, _, _, ax_ms1 = self._axes()
+        plotting = PlotManager()
+        scans = [loader.get_closest_ms1(rt) for rt in self._random_rts(self.repeat)]
+        it = iter(scans * 2)
+
+        def fn():
+            rt, mz, intens = next(it)
+            plotting.plot_ms1(ax_ms1, loader, mz=mz, intensities=intens, rt=rt)
+            fig.canvas.draw()
+
+        return self._time(fn)
+
+    def _bench_detect_peaks(self):
+        from core.peak_picking import PeakPickingCore
+
+        y = np.asarray(self._loaded().tic_values)
+        core = PeakPickingCore()
+        core._detect_peaks(y, 5.0)        # import di scipy fuori misura
+        return self._time(lambda: core._detect_peaks(y, 5.0))
+
+    def _zoom_setup(self, blit=False):
+        from core.overlay import BlitOverlay
+        from core.plotting import PlotManager
+        from core.zoom import ZoomController
+
+        loader = self._loaded()
+        fig, ax_tic, ax_bpc, ax_ms1 = self._axes()
+        plotting = PlotManager()
+        plotting.plot_tic(ax_tic, loader)
+        plotting.plot_bpc(ax_bpc, loader)
+        plotting.plot_ms1(ax_ms1, loader)
+        zoom = ZoomController(overlay=BlitOverlay(fig.canvas) if blit else None)
+        fig.canvas.draw()
+        return loader, fig, (ax_tic, ax_bpc, ax_ms1), plotting, zoom
+
+    @staticmethod
+    def _event(ax, xdata, button=1):
+        """Evento mouse minimo per ZoomController (coordinate dati e pixel)."""
+        ydata = sum(ax.get_ylim()) / 2
+        x, y = ax.transData.transform((xdata, ydata))
+        return SimpleNamespace(inaxes=ax, xdata=xdata, ydata=ydata, x=x, y=y,
+                               button=button, dblclick=False, key=None,
+                               canvas=ax.figure.canvas)
+
+    def _bench_zoom_drag(self):
+        """Click, FRAMES movimenti (ciascuno con un ridisegno) e rilascio."""
+        frames = 10
+        loader, fig, axes, plotting, zoom = self._zoom_setup()
+        ax_tic = axes[0]
+        lo, hi = ax_tic.get_xlim()
+        xs = np.linspace(lo + 0.2 * (hi - lo), lo + 0.6 * (hi - lo), frames + 1)
+
+        def fn():
+            zoom.on_click(self._event(ax_tic, xs[0]), *axes, loader, plotting)
+            fig.canvas.draw_idle()
+            for x in xs[1:]:
+                zoom._last_motion_ts = 0.0          # niente limite 60 FPS
+                zoom.on_motion(self._event(ax_tic, x))
+                fig.canvas.draw_idle()
+            zoom.on_release(self._event(ax_tic, xs[-1]), *axes, loader, plotting)
+            ax_tic.set_xlim(lo, hi)
+            axes[1].set_xlim(lo, hi)
+
+        return self._time(fn, ops=frames)
+
+    def _bench_zoom_drag_blit(self):
+        """Come zoom_drag ma con il rettangolo in blitting (come la GUI)."""
+        frames = 10
+        loader, fig, axes, plotting, zoom = self._zoom_setup(blit=True)
+        ax_tic = axes[0]
+        lo, hi = ax_tic.get_xlim()
+        xs = np.linspace(lo + 0.2 * (hi - lo), lo + 0.6 * (hi - lo), frames + 1)
+
+        def fn():
+            zoom.on_click(self._event(ax_tic, xs[0]), *axes, loader, plotting)
+            zoom.overlay.update()
+            for x in xs[1:]:
+                zoom._last_motion_ts = 0.0          # niente limite 60 FPS
+                zoom.on_motion(self._event(ax_tic, x))
+                zoom.overlay.update()
+            zoom.on_release(self._event(ax_tic, xs[-1]), *axes, loader, plotting)
+            ax_tic.set_xlim(lo, hi)
+            axes[1].set_xlim(lo, hi)
+            fig.canvas.draw()                        # sfondo per il ciclo successivo
+
+        return self._time(fn, ops=frames)
+
+    def _bench_zoom_release(self):
+        """Rilascio dello zoom: nuovi limiti, MS1 della finestra, ridisegno."""
+        loader, fig, axes, plotting, zoom = self._zoom_setup()
+        ax_tic = axes[0]
+        lo, hi = ax_tic.get_xlim()
+        x0, x1 = lo + 0.3 * (hi - lo), lo + 0.5 * (hi - lo)
+
+        def setup():
+            ax_tic.set_xlim(lo, hi)
+            axes[1].set_xlim(lo, hi)
+            zoom.on_click(self._event(ax_tic, x0), *axes, loader, plotting)
+
+        def fn():
+            zoom.on_release(self._event(ax_tic, x1), *axes, loader, plotting)
+            fig.canvas.draw()
+
+        return self._time(fn, setup=setup)
+
+    # ==========================================================
+    # CONFRONTO
+    # ==========================================================
+    @staticmethod
+    def compare(base, current, key="median_s"):
+        """
+        Righe (scenario, base, corrente, rapporto) per gli scenari presenti
+        in entrambi i report; rapporto > 1 = più lento.
+        """
+        rows = []
+        for name, result in current["results"].items():
+            old = base.get("results", {}).get(name)
+            if old is None or not old.get(key):
+                continue
+            rows.append((name, old[key], result[key], result[key] / old[key]))
+        return rows
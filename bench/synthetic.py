@@ -0,0 +1,247 @@
+"""
+bench/synthetic.py
+Generatore di file mzML sintetici (indexedmzML) per i benchmark
+Versione riscritta 2026 – Python 3.12
+"""
+
+import base64
+import zlib
+
+import numpy as np
+
+
+class SyntheticMzML:
+    """
+    Scrive un indexedmzML riproducibile (seed) con:
+    - n_scans scan, di cui circa ms2_ratio MS2 (pattern DDA regolare)
+    - peaks centroidi per scan; in modalità "profile" ogni centroide
+      diventa profile_width punti gaussiani
+    - array binari zlib o non compressi
+    - cvParam TIC / BPC per scan, spectrumRef dei precursori e
+      <chromatogramList> con il TIC (come i file dei convertitori)
+
+    La scrittura è in streaming: la memoria non dipende da n_scans.
+    """
+
+    MODES = ("centroid", "profile")
+
+    def __init__(self, n_scans=1000, peaks=300, ms2_ratio=0.75,
+                 compression=True, mode="centroid", profile_width=7,
+                 rt_step=0.05, chromatograms=True, seed=0):
+        if mode not in self.MODES:
+            raise ValueError(f"Modalità non valida: {mode}")
+        if not 0.0 <= ms2_ratio < 1.0:
+            raise ValueError("ms2_ratio deve essere in [0, 1)")
+
+        self.n_scans = int(n_scans)
+        self.peaks = int(peaks)
+        self.ms2_ratio = float(ms2_ratio)
+        self.compression = compression
+        self.mode = mode
+        self.profile_width = int(profile_width)
+        self.rt_step = float(rt_step)
+        self.chromatograms = chromatograms
+        self.seed = seed
+
+    def describe(self):
+        """Parametri del dataset (per il report dei benchmark)."""
+        return {
+            "n_scans": self.n_scans,
+            "peaks": self.peaks,
+            "ms2_ratio": self.ms2_ratio,
+            "compression": "zlib" if self.compression else "none",
+            "mode": self.mode,
+            "profile_width": self.profile_width if self.mode == "profile" else None,
+            "seed": self.seed,
+        }
+
+    # ==========================================================
+    # SCRITTURA
+    # ==========================================================
+    def write(self, path):
+        """Scrive il file e restituisce path."""
+        rng = np.random.default_rng(self.seed)
+        offsets = []
+        chrom_offsets = []
+        tic_times, tic_values = [], []
+
+        with open(path, "wb") as f:
+            f.write(self._header().encode())
+
+            last_ms1 = None
+            acc = 0.0
+            for i in range(self.n_scans):
+                # Livello: il primo scan è sempre MS1, poi diffusione
+                # dell'errore per rispettare ms2_ratio
+                acc += self.ms2_ratio
+                level = 1
+                if i > 0 and acc >= 1.0:
+                    level = 2
+                    acc -= 1.0
+
+                rt = i * self.rt_step
+                spectrum_id = f"scan={i + 1}"
+                mz, intensity = self._peaks(rng, rt, level)
+
+                if level == 1:
+                    tic_times.append(rt)
+                    tic_values.append(float(intensity.sum()))
+
+                offsets.append((spectrum_id, f.tell()))
+                f.write(self._spectrum(i, spectrum_id, level, rt, mz, intensity,
+                                       last_ms1, rng).encode())
+
+                if level == 1:
+                    last_ms1 = spectrum_id
+
+            f.write(b"</spectrumList>\n")
+
+            if self.chromatograms:
+                f.write(b'<chromatogramList count="1" defaultDataProcessingRef="dp">\n')
+                chrom_offsets.append(("TIC", f.tell()))
+                f.write(self._chromatogram("TIC", tic_times, tic_values).encode())
+                f.write(b"</chromatogramList>\n")
+
+            f.write(b"</run>\n</mzML>\n")
+
+            index_offset = f.tell()
+            f.write(self._index_list(offsets, chrom_offsets).encode())
+            f.write(f"<indexListOffset>{index_offset}</indexListOffset>\n"
+                    "</indexedmzML>\n".encode())
+
+        return path
+
+    # ==========================================================
+    # DATI
+    # ==========================================================
+    def _peaks(self, rng, rt, level):
+        """Centroidi (o profili) con un'eluizione gaussiana a metà run."""
+        n = self.peaks if level == 1 else max(1, self.peaks // 4)
+        center = self.n_scans * self.rt_step / 2
+        elution = 1.0 + 10.0 * np.exp(-((rt - center) ** 2))
+
+        mz = np.sort(rng.uniform(100.0, 1000.0, n))
+        intensity = rng.exponential(1000.0, n) * elution
+
+        if self.mode == "profile":
+            k = np.arange(self.profile_width) - self.profile_width // 2
+            mz = (mz[:, None] + k[None, :] * 0.005).ravel()
+            shape = np.exp(-0.5 * (k / max(1.0, self.profile_width / 4)) ** 2)
+            intensity = (intensity[:, None] * shape[None, :]).ravel()
+            order = np.argsort(mz, kind="stable")
+            mz, intensity = mz[order], intensity[order]
+
+        return mz, intensity.astype(np.float32)
+
+    def _encode(self, values, dtype):
+        raw = np.asarray(values, dtype=dtype).tobytes()
+        if self.compression:
+            raw = zlib.compress(raw)
+        return base64.b64encode(raw).decode("ascii")
+
+    # ==========================================================
+    # XML
+    # ==========================================================
+    def _header(self):
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<indexedmzML xmlns="http://psi.hupo.org/ms/mzml" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n'
+            '<mzML xmlns="http://psi.hupo.org/ms/mzml" version="1.1.0" id="synthetic">\n'
+            '<cvList count="2">'
+            '<cv id="MS" fullName="Proteomics Standards Initiative Mass Spectrometry Ontology" '
+            'version="4.1.0" URI="https://purl.obolibrary.org/obo/ms.obo"/>'
+            '<cv id="UO" fullName="Unit Ontology" '
+            'URI="https://purl.obolibrary.org/obo/uo.obo"/>'
+            '</cvList>\n'
+            f'<run id="synthetic_run"><spectrumList count="{self.n_scans}" '
+            'defaultDataProcessingRef="dp">\n'
+        )
+
+    def _binary_arrays(self, arrays):
+        """arrays: lista di (valori, dtype, accession, nome, attributi unità)."""
+        if self.compression:
+            comp = ("MS:1000574", "zlib compression")
+        else:
+            comp = ("MS:1000576", "no compression")
+
+        out = f'<binaryDataArrayList count="{len(arrays)}">\n'
+        for values, dtype, accession, name, unit in arrays:
+            if dtype == np.float64:
+                width = ("MS:1000523", "64-bit float")
+            else:
+                width = ("MS:1000521", "32-bit float")
+            out += (
+                '<binaryDataArray>'
+                f'<cvParam cvRef="MS" accession="{width[0]}" name="{width[1]}"/>'
+                f'<cvParam cvRef="MS" accession="{comp[0]}" name="{comp[1]}"/>'
+                f'<cvParam cvRef="MS" accession="{accession}" name="{name}"{unit}/>'
+                f'<binary>{self._encode(values, dtype)}</binary>'
+                '</binaryDataArray>\n'
+            )
+        return out + '</binaryDataArrayList>\n'
+
+    def _spectrum(self, index, spectrum_id, level, rt, mz, intensity,
+                  parent_id, rng):
+        if self.mode == "profile":
+            kind = ("MS:1000128", "profile spectrum")
+        else:
+            kind = ("MS:1000127", "centroid spectrum")
+
+        out = (
+            f'<spectrum index="{index}" id="{spectrum_id}" '
+            f'defaultArrayLength="{len(mz)}">\n'
+            f'<cvParam cvRef="MS" accession="MS:1000511" name="ms level" value="{level}"/>\n'
+            f'<cvParam cvRef="MS" accession="{kind[0]}" name="{kind[1]}"/>\n'
+            '<cvParam cvRef="MS" accession="MS:1000285" name="total ion current" '
+            f'value="{float(intensity.sum())!r}"/>\n'
+            '<cvParam cvRef="MS" accession="MS:1000505" name="base peak intensity" '
+            f'value="{float(intensity.max())!r}"/>\n'
+            '<scanList count="1"><scan>'
+            '<cvParam cvRef="MS" accession="MS:1000016" name="scan start time" '
+            f'value="{rt!r}" unitCvRef="UO" unitAccession="UO:0000031" unitName="minute"/>'
+            '</scan></scanList>\n'
+        )
+
+        if level == 2:
+            ref = f' spectrumRef="{parent_id}"' if parent_id else ""
+            out += (
+                f'<precursorList count="1"><precursor{ref}>'
+                '<selectedIonList count="1"><selectedIon>'
+                '<cvParam cvRef="MS" accession="MS:1000744" name="selected ion m/z" '
+                f'value="{float(rng.uniform(200.0, 900.0))!r}"/>'
+                '</selectedIon></selectedIonList></precursor></precursorList>\n'
+            )
+
+        out += self._binary_arrays([
+            (mz, np.float64, "MS:1000514", "m/z array", ""),
+            (intensity, np.float32, "MS:1000515", "intensity array", ""),
+        ])
+        return out + '</spectrum>\n'
+
+    def _chromatogram(self, chrom_id, times, values):
+        minute = ' unitCvRef="UO" unitAccession="UO:0000031" unitName="minute"'
+        return (
+            f'<chromatogram index="0" id="{chrom_id}" defaultArrayLength="{len(times)}">\n'
+            '<cvParam cvRef="MS" accession="MS:1000235" '
+            'name="total ion current chromatogram" value=""/>\n'
+            + self._binary_arrays([
+                (times, np.float64, "MS:1000595", "time array", minute),
+                (values, np.float64, "MS:1000515", "intensity array", ""),
+            ])
+            + '</chromatogram>\n'
+        )
+
+    @staticmethod
+    def _index_list(offsets, chrom_offsets):
+        count = 2 if chrom_offsets else 1
+        out = [f'<indexList count="{count}">\n<index name="spectrum">\n']
+        out += [f'<offset idRef="{sid}">{offset}</offset>\n' for sid, offset in offsets]
+        out.append('</index>\n')
+        if chrom_offsets:
+            out.append('<index name="chromatogram">\n')
+            out += [f'<offset idRef="{cid}">{offset}</offset>\n'
+                    for cid, offset in chrom_offsets]
+            out.append('</index>\n')
+        out.append('</indexList>\n')
+        return "".join(out)
@@ -0,0 +1,257 @@
+"""
+core/batch.py
+Elaborazione batch senza GUI di cartelle di file mzML
+Versione riscritta 2026 – Python 3.12
+"""
+
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from core.loader import MZMLLoader
+from core.peak_picking import PeakPickingCore
+from core.xic import XICExtractor
+
+
+# Budget di memoria totale (byte) ripartito tra i processi del pool:
+# oltre la quota per processo un run resta lazy, come nella GUI
+MEMORY_BUDGET = 2 * 1024 ** 3
+
+# Colonne della tabella consolidata (formato lungo, una riga per record)
+TABLE_COLUMNS = (
+    "file", "record", "target_mz", "rt", "intensity", "area",
+    "n_ms1", "n_ms2", "rt_min", "rt_max", "detail",
+)
+
+
+def _area(times, values):
+    """Area trapezoidale di una traccia."""
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(times) < 2:
+        return 0.0
+    return float(np.sum(np.diff(times) * (values[1:] + values[:-1]) / 2))
+
+
+def _process_file(file_path, params, memory_budget=None):
+    """
+    Eseguito nel processo worker: carica il run (entro memory_budget,
+    la quota di questo processo) e restituisce la lista dei record
+    (dict con le chiavi di TABLE_COLUMNS).
+    """
+    t0 = time.perf_counter()
+    loader = MZMLLoader(memory_budget=memory_budget)
+    loader.load(file_path)
+
+    try:
+        peak_core = PeakPickingCore()
+        name = os.path.basename(file_path)
+        rts = loader.ms1_rt_sorted
+        common = {
+            "file": name,
+            "n_ms1": len(loader.ms1_spectra),
+            "n_ms2": len(loader.ms2_spectra),
+            "rt_min": float(rts[0]) if len(rts) else None,
+            "rt_max": float(rts[-1]) if len(rts) else None,
+        }
+        records = []
+
+        # Riepiloghi e picchi di TIC / BPC
+        for trace, times, values in (("tic", loader.tic_times, loader.tic_values),
+                                     ("bpc", loader.bpc_times, loader.bpc_values)):
+            if not len(values):
+                continue
+            values = np.asarray(values, dtype=np.float64)
+            apex = int(np.argmax(values))
+            records.append(dict(common, record=f"{trace}_summary",
+                                rt=float(times[apex]),
+                                intensity=float(values[apex]),
+                                area=_area(times, values)))
+
+            x_peaks, y_peaks, _ = peak_core.detect_peaks(times, values,
+                                                         params["peak_percent"])
+            for rt, intensity in zip(x_peaks, y_peaks):
+                records.append(dict(common, record=f"{trace}_peak",
+                                    rt=float(rt), intensity=float(intensity)))
+
+        # XIC dei target richiesti
+        targets = params["xic_targets"]
+        if targets:
+            result = XICExtractor().extract(loader, targets, ppm=params["ppm"])
+            times = result["times"]
+            for mz, trace in zip(result["targets"], result["xic"]):
+                apex = int(np.argmax(trace)) if len(trace) else None
+                records.append(dict(
+                    common, record="xic", target_mz=float(mz),
+                    rt=float(times[apex]) if apex is not None else None,
+                    intensity=float(trace[apex]) if apex is not None else 0.0,
+                    area=_area(times, trace),
+                    detail=f"ppm={params['ppm']:g}"
+                ))
+    finally:
+        loader.reset()
+
+    for record in records:
+        record.setdefault("detail", "")
+    return records, time.perf_counter() - t0
+
+
+class BatchProcessor:
+    """
+    Elabora molti file mzML in un pool di processi (un file per task):
+    riepiloghi TIC / BPC, picchi (stessi criteri di PeakPickingCore)
+    e XIC opzionali.
+
+    memory_budget (byte, None = nessun limite) è il totale per tutto il
+    pool: ogni processo riceve memory_budget // processi e i run che non
+    ci stanno vengono letti lazy.
+
+    Ogni file completato viene salvato in un checkpoint JSON in
+    <out_dir>/checkpoints; una nuova esecuzione con gli stessi parametri
+    salta i file già elaborati (path, dimensione e mtime invariati).
+    Alla fine tutti i checkpoint vengono uniti in una tabella CSV unica.
+    I file in errore non vengono salvati e sono ritentati al riavvio.
+    """
+
+    def __init__(self, out_dir, xic_targets=None, ppm=5.0, peak_percent=5.0,
+                 workers=None, memory_budget=MEMORY_BUDGET):
+        self.out_dir = out_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.memory_budget = memory_budget
+        self.params = {
+            "xic_targets": sorted(float(t) for t in (xic_targets or [])),
+            "ppm": float(ppm),
+            "peak_percent": float(peak_percent),
+        }
+
+    @property
+    def checkpoint_dir(self):
+        return os.path.join(self.out_dir, "checkpoints")
+
+    @staticmethod
+    def find_files(inputs, recursive=False):
+        """File .mzML da una lista di file e/o cartelle (ordinati)."""
+        found = []
+        for item in inputs:
+            if os.path.isdir(item):
+                if recursive:
+                    for base, _, names in os.walk(item):
+                        found += [os.path.join(base, n) for n in names
+                                  if n.lower().endswith(".mzml")]
+                else:
+                    found += [os.path.join(item, n) for n in os.listdir(item)
+                              if n.lower().endswith(".mzml")]
+            elif os.path.isfile(item):
+                found.append(item)
+        return sorted({os.path.abspath(p) for p in found})
+
+    # ==========================================================
+    # ESECUZIONE
+    # ==========================================================
+    def run(self, paths, progress=None):
+        """
+        Elabora i file mancanti e scrive la tabella consolidata.
+        progress(done, total, path, status, seconds) per ogni file.
+        Restituisce (path della tabella, lista di (path, errore)).
+        """
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+        pending = [p for p in paths if self._read_checkpoint(p) is None]
+        done = len(paths) - len(pending)
+        errors = []
+
+        if progress is not None:
+            for path in paths:
+                if path not in pending:
+                    progress(None, len(paths), path, "checkpoint", 0.0)
+
+        if pending:
+            n_workers = min(self.workers, len(pending))
+            budget = (None if self.memory_budget is None
+                      else self.memory_budget // n_workers)
+            pool = ProcessPoolExecutor(max_workers=n_workers)
+            try:
+                futures = {pool.submit(_process_file, path, self.params, budget): path
+                           for path in pending}
+                for future in as_completed(futures):
+                    path = futures[future]
+                    done += 1
+                    try:
+                        records, seconds = future.result()
+                    except Exception as e:
+                        errors.append((path, str(e)))
+                        if progress is not None:
+                            progress(done, len(paths), path, "errore", 0.0)
+                        continue
+
+                    self._write_checkpoint(path, records)
+                    if progress is not None:
+                        progress(done, len(paths), path, "ok", seconds)
+            except KeyboardInterrupt:
+                # I checkpoint già scritti restano validi per la ripresa
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            pool.shutdown()
+
+        return self.write_table(paths, errors), errors
+
+    # ==========================================================
+    # CHECKPOINT
+    # ==========================================================
+    def _checkpoint_path(self, file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.checkpoint_dir, f"{key}.json")
+
+    def _fingerprint(self, file_path):
+        stat = os.stat(file_path)
+        return {
+            "path": os.path.abspath(file_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "params": self.params,
+        }
+
+    def _read_checkpoint(self, file_path):
+        """Record salvati se il checkpoint è valido, altrimenti None."""
+        try:
+            with open(self._checkpoint_path(file_path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("fingerprint") != self._fingerprint(file_path):
+                return None
+            return data["records"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_checkpoint(self, file_path, records):
+        path = self._checkpoint_path(file_path)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self._fingerprint(file_path),
+                       "records": records}, f)
+        os.replace(tmp, path)
+
+    # ==========================================================
+    # TABELLA CONSOLIDATA
+    # ==========================================================
+    def write_table(self, paths, errors=()):
+        """Unisce i checkpoint (e gli errori) in <out_dir>/batch_results.csv."""
+        table = os.path.join(self.out_dir, "batch_results.csv")
+        failed = dict(errors)
+
+        with open(table, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS)
+            writer.writeheader()
+            for path in paths:
+                if path in failed:
+                    writer.writerow({"file": os.path.basename(path),
+                                     "record": "error",
+                                     "detail": failed[path].replace("\n", " ")})
+                    continue
+                for record in self._read_checkpoint(path) or []:
+                    writer.writerow(record)
+        return table
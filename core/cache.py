@@ -0,0 +1,225 @@
+"""
+core/cache.py
+Cache binaria persistente (sidecar .npy) per i file mzML già letti
+Versione riscritta 2026 – Python 3.12
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+
+CACHE_VERSION = 2
+
+# Array salvati per ogni run (nome file = chiave + ".npy")
+ARRAY_KEYS = (
+    "rt", "level", "precursor", "offsets", "mz", "intensity", "ids", "parent_ids",
+    "tic_times", "tic_values", "bpc_times", "bpc_values",
+)
+
+
+class SpectraCache:
+    """
+    Cache su disco dei run già decodificati.
+
+    Struttura:
+        <root>/<chiave del path>/manifest.json
+        <root>/<chiave del path>/<array>.npy
+
+    Il manifest registra path, dimensione, mtime e un hash del contenuto
+    (primo e ultimo MiB del file): se uno di questi cambia la voce viene
+    ignorata e riscritta. Gli array vengono riaperti con mmap_mode="r",
+    quindi la riapertura costa solo la lettura dei manifest.
+
+    Oltre max_bytes vengono eliminate le voci usate meno di recente (LRU);
+    max_bytes=None disattiva l'eviction (es. nei worker di una sessione,
+    dove evict() viene chiamata una volta sola dal processo principale).
+    """
+
+    HASH_CHUNK = 1 << 20
+
+    def __init__(self, root=None, max_bytes=4 * 1024 ** 3):
+        if root is None:
+            root = os.environ.get(
+                "LCMS_VIEWER_CACHE",
+                os.path.join(os.path.expanduser("~"), ".cache", "lcms_viewer")
+            )
+        self.root = root
+        self.max_bytes = max_bytes
+
+    # ==========================================================
+    # LETTURA
+    # ==========================================================
+    def load(self, file_path):
+        """
+        Restituisce un dict { nome: array memory-mapped } se la cache
+        è valida per file_path, altrimenti None.
+        """
+        entry = self._entry_dir(file_path)
+        manifest = self._read_manifest(entry)
+        if manifest is None:
+            return None
+
+        if not self._is_valid(file_path, manifest):
+            return None
+
+        try:
+            data = {
+                key: np.load(os.path.join(entry, f"{key}.npy"), mmap_mode="r")
+                for key in ARRAY_KEYS
+            }
+        except Exception:
+            return None
+
+        # Aggiorna l'ordine LRU
+        manifest["last_access"] = time.time()
+        self._write_manifest(entry, manifest)
+        return data
+
+    def contains(self, file_path):
+        """True se esiste una voce valida per file_path."""
+        manifest = self._read_manifest(self._entry_dir(file_path))
+        return manifest is not None and self._is_valid(file_path, manifest)
+
+    # ==========================================================
+    # SCRITTURA
+    # ==========================================================
+    def save(self, file_path, arrays):
+        """
+        Salva gli array di un run (dict con tutte le chiavi ARRAY_KEYS)
+        e applica la politica di eviction.
+        """
+        entry = self._entry_dir(file_path)
+        tmp = f"{entry}.tmp-{os.getpid()}"
+
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+
+            nbytes = 0
+            for key in ARRAY_KEYS:
+                arr = np.asarray(arrays[key])
+                np.save(os.path.join(tmp, f"{key}.npy"), arr)
+                nbytes += arr.nbytes
+
+            stat = os.stat(file_path)
+            now = time.time()
+            self._write_manifest(tmp, {
+                "version": CACHE_VERSION,
+                "path": os.path.abspath(file_path),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "hash": self._content_hash(file_path),
+                "nbytes": nbytes,
+                "created": now,
+                "last_access": now,
+            })
+
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+
+        self.evict()
+
+    # ==========================================================
+    # EVICTION
+    # ==========================================================
+    def evict(self, max_bytes=None, keep=()):
+        """
+        Elimina le voci meno usate finché la cache non rientra
+        in max_bytes (default: self.max_bytes). Le voci dei file in
+        keep (path) non vengono eliminate.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        if limit is None:
+            return
+        keep = {os.path.abspath(p) for p in keep}
+        entries = self.entries()
+
+        total = sum(m.get("nbytes", 0) for _, m in entries)
+        for entry, manifest in sorted(entries,
+                                      key=lambda e: e[1].get("last_access", 0)):
+            if total <= limit:
+                break
+            if manifest.get("path") in keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= manifest.get("nbytes", 0)
+
+    def entries(self):
+        """Lista di (cartella, manifest) presenti in cache."""
+        if not os.path.isdir(self.root):
+            return []
+
+        out = []
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            if ".tmp-" in name or not os.path.isdir(entry):
+                continue
+            manifest = self._read_manifest(entry)
+            if manifest is not None:
+                out.append((entry, manifest))
+        return out
+
+    def clear(self):
+        """Svuota completamente la cache."""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    # ==========================================================
+    # SUPPORTO
+    # ==========================================================
+    def _entry_dir(self, file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, key)
+
+    def _read_manifest(self, entry):
+        try:
+            with open(os.path.join(entry, "manifest.json"), "r") as f:
+                manifest = json.load(f)
+        except Exception:
+            return None
+        if manifest.get("version") != CACHE_VERSION:
+            return None
+        return manifest
+
+    def _write_manifest(self, entry, manifest):
+        try:
+            with open(os.path.join(entry, "manifest.json"), "w") as f:
+                json.dump(manifest, f, indent=2)
+        except Exception:
+            pass
+
+    def _is_valid(self, file_path, manifest):
+        """Verifica path / size / mtime / hash rispetto al manifest."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+
+        if manifest.get("path") != os.path.abspath(file_path):
+            return False
+        if manifest.get("size") != stat.st_size or \
+                manifest.get("mtime") != stat.st_mtime:
+            return False
+
+        return self._content_hash(file_path) == manifest.get("hash")
+
+    def _content_hash(self, file_path):
+        """Hash di dimensione + primo e ultimo MiB del file."""
+        h = hashlib.blake2b(digest_size=16)
+        size = os.path.getsize(file_path)
+        h.update(str(size).encode())
+
+        with open(file_path, "rb") as f:
+            h.update(f.read(self.HASH_CHUNK))
+            if size > self.HASH_CHUNK:
+                f.seek(max(self.HASH_CHUNK, size - self.HASH_CHUNK))
+                h.update(f.read(self.HASH_CHUNK))
+        return h.hexdigest()
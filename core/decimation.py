@@ -0,0 +1,341 @@
+"""
+core/decimation.py
+Decimazione per pixel delle tracce (TIC / BPC / XIC) e degli spettri a stick
+Versione riscritta 2026 – Python 3.12
+"""
+
+import weakref
+
+import numpy as np
+
+
+# Sotto questo numero di bucket non si costruiscono altri livelli
+MIN_BUCKETS = 256
+
+# Punti per colonna di pixel oltre i quali si passa alla piramide
+# (2 = un minimo e un massimo per pixel)
+POINTS_PER_PIXEL = 2
+
+# Sovracampionamento rispetto alla larghezza dell'asse in pixel
+# (margine per ridimensionamenti della finestra e schermi HiDPI)
+OVERSAMPLE = 2
+
+# Artisti gestiti: Line2D → MinMaxPyramid, LineCollection → StickSpectrum
+# (per risalire ai dati completi)
+_MANAGED = weakref.WeakKeyDictionary()
+
+
+class MinMaxPyramid:
+    """
+    Piramide multi-risoluzione di una traccia (x crescente).
+
+    Il livello k divide gli indici in bucket contigui di 2**k punti e
+    conserva, per ogni bucket, l'indice del minimo e del massimo.
+
+    query() divide la finestra X in colonne di pixel e per ogni colonna
+    tiene primo, ultimo, minimo e massimo (M4): la linea disegnata ha in
+    ogni colonna gli stessi estremi della traccia completa, anche sui
+    segmenti che attraversano i bordi. L'intervallo di indici di una
+    colonna viene coperto esattamente dai bucket dei vari livelli (come
+    in un segment tree: al più due bucket per livello), quindi il costo
+    dipende dalla larghezza dello schermo e dal numero di livelli, non
+    dal numero di scan.
+    """
+
+    def __init__(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if len(x) > 1 and np.any(np.diff(x) < 0):
+            order = np.argsort(x, kind="stable")
+            x, y = x[order], y[order]
+        self.x = x
+        self.y = y
+
+        # levels[k] = (indici dei minimi, indici dei massimi), bucket di 2**k
+        lo = hi = np.arange(len(y), dtype=np.intp)
+        self.levels = [(lo, hi)]
+        while len(lo) > MIN_BUCKETS:
+            lo, hi = self._merge(lo, hi)
+            self.levels.append((lo, hi))
+
+    def __len__(self):
+        return len(self.x)
+
+    def _merge(self, lo, hi):
+        """Unisce i bucket a coppie (livello successivo)."""
+        if len(lo) % 2:
+            lo = np.append(lo, lo[-1])
+            hi = np.append(hi, hi[-1])
+        lo = lo.reshape(-1, 2)
+        hi = hi.reshape(-1, 2)
+        y = self.y
+        lo = np.where(y[lo[:, 0]] <= y[lo[:, 1]], lo[:, 0], lo[:, 1])
+        hi = np.where(y[hi[:, 0]] >= y[hi[:, 1]], hi[:, 0], hi[:, 1])
+        return lo, hi
+
+    # ==========================================================
+    # QUERY
+    # ==========================================================
+    def query(self, xmin, xmax, pixels):
+        """
+        Punti da disegnare per la finestra [xmin, xmax] su `pixels`
+        colonne. Include un punto fuori da ciascun bordo, così la linea
+        arriva fino ai limiti dell'asse.
+        """
+        n = len(self.x)
+        if n == 0:
+            return self.x, self.y
+
+        i0 = max(int(np.searchsorted(self.x, xmin, side="left")) - 1, 0)
+        i1 = min(int(np.searchsorted(self.x, xmax, side="right")) + 1, n)
+        if i1 <= i0:
+            return self.x[:0], self.y[:0]
+
+        pixels = max(int(pixels), 1)
+        visible = i1 - i0
+        if visible <= POINTS_PER_PIXEL * pixels or xmax <= xmin:
+            return self.x[i0:i1], self.y[i0:i1]
+
+        # Colonne di pixel come intervalli di indici [starts, ends) dei
+        # punti dentro la finestra; i due punti esterni si aggiungono a parte
+        j0 = i0 + int(self.x[i0] < xmin)
+        j1 = i1 - int(self.x[i1 - 1] > xmax)
+        inner = np.searchsorted(
+            self.x, xmin + (xmax - xmin) * np.arange(1, pixels) / pixels,
+            side="left"
+        )
+        inner = np.clip(inner, j0, j1)
+        starts = np.concatenate(([j0], inner))
+        ends = np.concatenate((inner, [j1]))
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+        if len(starts) == 0:
+            idx = np.unique([i0, i1 - 1])
+            return self.x[idx], self.y[idx]
+
+        # Minimo / massimo per colonna: scomposizione bottom-up di
+        # [starts, ends) nei bucket della piramide, livello per livello
+        y = self.y
+        best_lo = starts.copy()
+        best_hi = starts.copy()
+        lp, rp = starts.copy(), ends.copy()
+        top = len(self.levels) - 1
+        for level, (lo, hi) in enumerate(self.levels):
+            active = np.flatnonzero(lp < rp)
+            if len(active) == 0:
+                break
+            if level == top:
+                # Livello più grossolano: tutti i bucket restanti
+                nodes, col = _ranges(lp[active], rp[active], active)
+                for cand, best, sign in ((lo[nodes], best_lo, 1.0),
+                                         (hi[nodes], best_hi, -1.0)):
+                    order = np.lexsort((sign * y[cand], col))
+                    group = np.concatenate(([True], np.diff(col[order]) != 0))
+                    _improve(y, best, col[order][group], cand[order][group], sign)
+                break
+
+            take = active[(lp[active] & 1) == 1]
+            _improve(y, best_lo, take, lo[lp[take]], 1.0)
+            _improve(y, best_hi, take, hi[lp[take]], -1.0)
+            lp[take] += 1
+
+            take = active[((rp[active] & 1) == 1) & (lp[active] < rp[active])]
+            rp[take] -= 1
+            _improve(y, best_lo, take, lo[rp[take]], 1.0)
+            _improve(y, best_hi, take, hi[rp[take]], -1.0)
+
+            lp >>= 1
+            rp >>= 1
+
+        idx = np.unique(np.concatenate(([i0, i1 - 1], starts, ends - 1,
+                                        best_lo, best_hi)))
+        return self.x[idx], self.y[idx]
+
+
+def _improve(y, best, cols, cand, sign):
+    """best[cols] = cand dove sign * y[cand] < sign * y[best[cols]]."""
+    better = sign * y[cand] < sign * y[best[cols]]
+    best[cols[better]] = cand[better]
+
+
+def _ranges(starts, ends, labels):
+    """
+    Concatenazione degli intervalli [starts, ends) e, per ogni elemento,
+    l'etichetta del suo intervallo.
+    """
+    counts = np.maximum(ends - starts, 0)
+    total = int(counts.sum())
+    offset = np.cumsum(counts) - counts
+    values = np.repeat(starts - offset, counts) + np.arange(total)
+    return values.astype(np.intp, copy=False), np.repeat(labels, counts)
+
+
+class StickSpectrum:
+    """
+    Spettro a stick (MS1 / MS2) ordinato per m/z.
+
+    query() tiene, per ogni colonna di pixel della finestra m/z, solo lo
+    stick più intenso: a schermo il risultato è identico (gli stick della
+    stessa colonna si sovrappongono) e il numero di segmenti è limitato
+    dalla larghezza dell'asse anche per spettri profile da 60k punti.
+    """
+
+    def __init__(self, mz, intensities):
+        mz = np.asarray(mz, dtype=np.float64)
+        y = np.asarray(intensities, dtype=np.float64)
+        if len(mz) > 1 and np.any(np.diff(mz) < 0):
+            order = np.argsort(mz, kind="stable")
+            mz, y = mz[order], y[order]
+        self.x = mz
+        self.y = y
+
+    def __len__(self):
+        return len(self.x)
+
+    def query(self, xmin, xmax, pixels):
+        """(m/z, intensità) degli stick da disegnare in [xmin, xmax]."""
+        i0 = int(np.searchsorted(self.x, xmin, side="left"))
+        i1 = int(np.searchsorted(self.x, xmax, side="right"))
+        mz, y = self.x[i0:i1], self.y[i0:i1]
+
+        pixels = max(int(pixels), 1)
+        if len(mz) <= pixels or xmax <= xmin:
+            return mz, y
+
+        # Colonna di pixel di ogni stick (crescente: mz è ordinato)
+        column = ((mz - xmin) * (pixels / (xmax - xmin))).astype(np.intp)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(column)) + 1))
+        peak = np.maximum.reduceat(y, starts)
+
+        # Primo stick che raggiunge il massimo della sua colonna
+        sizes = np.diff(np.append(starts, len(y)))
+        hit = np.flatnonzero(y == np.repeat(peak, sizes))
+        group = np.searchsorted(starts, hit, side="right") - 1
+        first = hit[np.unique(group, return_index=True)[1]]
+        return mz[first], y[first]
+
+    @staticmethod
+    def segments(mz, y):
+        """Segmenti (m/z, 0) → (m/z, intensità) per una LineCollection."""
+        seg = np.zeros((len(mz), 2, 2))
+        seg[:, :, 0] = np.asarray(mz)[:, None]
+        seg[:, 1, 1] = y
+        return seg
+
+
+# ----------------------------------------------------------
+# COLLEGAMENTO AGLI ASSI
+# ----------------------------------------------------------
+def axis_pixels(ax):
+    """Larghezza dell'asse in pixel di schermo (con sovracampionamento)."""
+    return ax.get_window_extent().width * OVERSAMPLE
+
+
+def plot_decimated(ax, x, y, **kwargs):
+    """
+    Come ax.plot(x, y) ma con decimazione min/max: la linea viene
+    ricalcolata a ogni cambio dei limiti X (zoom, reset, sync TIC ↔ BPC).
+    Restituisce la Line2D.
+    """
+    pyramid = MinMaxPyramid(x, y)
+    (line,) = ax.plot(*_full_range(pyramid, ax), **kwargs)
+    _MANAGED[line] = pyramid
+
+    # ax.clear() ricrea il registro dei callback: nessuna disconnessione
+    def on_xlim(ax_changed, line=line):
+        pyramid = _MANAGED.get(line)
+        if pyramid is None or line.axes is not ax_changed:
+            return
+        xmin, xmax = sorted(ax_changed.get_xlim())
+        line.set_data(*pyramid.query(xmin, xmax, axis_pixels(ax_changed)))
+
+    ax.callbacks.connect("xlim_changed", on_xlim)
+    return line
+
+
+def set_decimated_data(line, x, y):
+    """
+    Nuovi dati per una linea di plot_decimated (riuso dell'artista):
+    nuova piramide e punti per l'intero intervallo, così relim() e
+    l'autoscala vedono tutta la traccia.
+    """
+    pyramid = MinMaxPyramid(x, y)
+    _MANAGED[line] = pyramid
+    line.set_data(*_full_range(pyramid, line.axes))
+
+
+def _full_range(pyramid, ax):
+    if len(pyramid) == 0:
+        return pyramid.x, pyramid.y
+    return pyramid.query(pyramid.x[0], pyramid.x[-1], axis_pixels(ax))
+
+
+def plot_sticks(ax, mz, intensities, **kwargs):
+    """
+    Spettro a stick come singola LineCollection (al posto di ax.stem),
+    decimato al massimo per pixel e ricalcolato a ogni cambio dei
+    limiti X. Imposta i limiti X sull'intervallo m/z dello spettro.
+    Restituisce la LineCollection.
+    """
+    from matplotlib.collections import LineCollection
+
+    sticks = LineCollection([], **kwargs)
+    ax.add_collection(sticks, autolim=False)
+    set_stick_data(sticks, mz, intensities)
+
+    def on_xlim(ax_changed, sticks=sticks):
+        spectrum = _MANAGED.get(sticks)
+        if spectrum is None or sticks.axes is not ax_changed:
+            return
+        xmin, xmax = sorted(ax_changed.get_xlim())
+        sticks.set_segments(StickSpectrum.segments(
+            *spectrum.query(xmin, xmax, axis_pixels(ax_changed))))
+
+    ax.callbacks.connect("xlim_changed", on_xlim)
+    return sticks
+
+
+def set_stick_data(sticks, mz, intensities):
+    """
+    Nuovo spettro per una collection di plot_sticks (riuso
+    dell'artista). I limiti X seguono l'intervallo m/z con i margini
+    dell'asse; la decimazione avviene nel callback di xlim_changed.
+    """
+    spectrum = StickSpectrum(mz, intensities)
+    _MANAGED[sticks] = spectrum
+    ax = sticks.axes
+    if len(spectrum) == 0:
+        sticks.set_segments([])
+        return
+
+    xmin, xmax = float(spectrum.x[0]), float(spectrum.x[-1])
+    pad = (xmax - xmin) * ax.margins()[0] or 0.5
+    sticks.set_segments(StickSpectrum.segments(
+        *spectrum.query(xmin, xmax, axis_pixels(ax))))
+    ax.set_xlim(xmin - pad, xmax + pad)
+
+
+def axis_data(ax):
+    """
+    Dati completi della prima traccia o spettro dell'asse (non
+    decimati), oppure None se l'asse è vuoto. Usato dal peak picking.
+    """
+    for artist in [*ax.lines, *ax.collections]:
+        managed = _MANAGED.get(artist)
+        if managed is not None:
+            return managed.x, managed.y
+    if ax.lines:
+        return line_data(ax.lines[0])
+    return None
+
+
+def line_data(line):
+    """
+    Dati completi di una linea (non decimati se gestita da
+    plot_decimated), es. per il peak picking.
+    """
+    pyramid = _MANAGED.get(line)
+    if pyramid is not None:
+        return pyramid.x, pyramid.y
+    return (np.asarray(line.get_xdata(), dtype=np.float64),
+            np.asarray(line.get_ydata(), dtype=np.float64))
@@ -0,0 +1,135 @@
+"""
+core/diagnostics.py
+Finestra diagnostica: profilo dell'ultimo caricamento e memoria
+Versione riscritta 2026 – Python 3.12
+"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+from core.profiling import LoadProfile
+
+
+class Diagnostics:
+    """
+    Mostra il LoadProfile dell'ultimo caricamento (fasi, spettri/s,
+    byte letti, picco di memoria), le statistiche di memoria del run
+    o della sessione e i tempi di avvio. Il report può essere salvato
+    in JSON.
+    """
+
+    def __init__(self):
+        self.startup = None
+
+    def open_window(self, root, get_loader, get_session=None, startup=None):
+        """
+        get_loader:  callable che restituisce il loader corrente
+        get_session: callable opzionale che restituisce la RunSession
+        startup:     StartupReport opzionale (tempi di avvio)
+        """
+        self.startup = startup
+
+        win = tk.Toplevel(root)
+        win.title("Diagnostica caricamento")
+        win.geometry("520x520")
+        win.attributes("-topmost", True)
+
+        text = tk.Text(win, width=60, height=24, font=("Consolas", 10))
+        text.pack(fill="both", expand=True, padx=12, pady=(10, 4))
+
+        trace_var = tk.BooleanVar(value=get_loader().trace_memory)
+        ttk.Checkbutton(
+            win,
+            text="Traccia memoria al prossimo caricamento (tracemalloc, più lento)",
+            variable=trace_var,
+            command=lambda: setattr(get_loader(), "trace_memory", trace_var.get())
+        ).pack(anchor="w", padx=12, pady=4)
+
+        row = tk.Frame(win)
+        row.pack(fill="x", padx=12, pady=(4, 12))
+
+        ttk.Button(
+            row,
+            text="Aggiorna",
+            command=lambda: self._refresh(text, get_loader(), get_session)
+        ).pack(side="left", fill="x", expand=True, padx=(0, 3))
+
+        ttk.Button(
+            row,
+            text="Salva JSON",
+            command=lambda: self._save_json(get_loader(), get_session)
+        ).pack(side="left", fill="x", expand=True, padx=(3, 0))
+
+        self._refresh(text, get_loader(), get_session)
+
+    # ==========================================================
+    # CONTENUTO
+    # ==========================================================
+    def _refresh(self, text, loader, get_session):
+        report = loader.profile_report()
+        if report is None:
+            body = "Nessun caricamento registrato."
+        else:
+            body = LoadProfile.format_report(report)
+
+        body += "\n\nMemoria:\n" + self._format_memory(loader.memory_stats())
+
+        session = get_session() if get_session is not None else None
+        if session is not None and len(session) > 1:
+            body += f"\n\nSessione ({len(session)} run):\n" + \
+                self._format_memory(session.memory_stats())
+
+        if self.startup is not None:
+            body += "\n\n" + self.startup.summary()
+
+        text.configure(state="normal")
+        text.delete("1.0", "end")
+        text.insert("1.0", body)
+        text.configure(state="disabled")
+
+    @staticmethod
+    def _format_memory(stats):
+        def mb(n):
+            return "–" if n is None else f"{n / 1024 ** 2:.1f} MiB"
+
+        lines = []
+        if "mode" in stats:
+            lines.append(f"  modalità      {stats['mode'] or '–'}")
+        lines += [
+            f"  budget        {mb(stats['budget'])}",
+            f"  residenti     {mb(stats['resident_bytes'])}",
+            f"  MS1 / indice  {mb(stats.get('derived_bytes', 0))}",
+            f"  stima totale  {mb(stats['estimated_bytes'])}",
+            f"  LRU hit/miss  {stats['hits']} / {stats['misses']}"
+            f"  (eviction {stats['evictions']})",
+        ]
+        return "\n".join(lines)
+
+    # ==========================================================
+    # ESPORTAZIONE
+    # ==========================================================
+    def _save_json(self, loader, get_session):
+        if loader.profile is None:
+            messagebox.showwarning("Nessun profilo", "Carica prima un file mzML.")
+            return
+
+        path = filedialog.asksaveasfilename(
+            title="Salva report diagnostico",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json")]
+        )
+        if not path:
+            return
+
+        extra = {"memory": loader.memory_stats()}
+        session = get_session() if get_session is not None else None
+        if session is not None and len(session) > 1:
+            extra["session_memory"] = session.memory_stats()
+        if self.startup is not None:
+            extra["startup_s"] = dict(self.startup.marks)
+
+        try:
+            loader.profile.to_json(path, extra=extra)
+            messagebox.showinfo("Report salvato", f"Report salvato in:\n\n{path}")
+        except (OSError, TypeError, ValueError) as e:
+            messagebox.showerror("Errore", f"Errore durante il salvataggio:\n\n{e}")
@@ -0,0 +1,308 @@
+"""
+core/export.py
+Esportazione tabellare in streaming (CSV / Parquet / NPZ) – LC–MS Viewer
+Versione riscritta 2026 – Python 3.12
+"""
+
+import zipfile
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+import numpy as np
+
+
+# Righe massime per blocco scritto (picchi MS1 dell'intero run)
+CHUNK_ROWS = 1_000_000
+
+# Estensione → formato
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".npz": "npz"}
+
+
+def parquet_available():
+    """True se pyarrow è installato."""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class DataExporter:
+    """
+    Esporta in tabella:
+    - TIC / BPC                     (rt, tic, bpc)
+    - spettro MS1 corrente          (mz, intensity)
+    - tutti i picchi MS1 del run    (scan, rt, mz, intensity)
+    - lista MS2                     (index, rt, precursor_mz, parent_ms1, n_peaks)
+    - risultato del peak picking    (x, intensity)
+
+    I dati arrivano al writer a blocchi di al massimo CHUNK_ROWS righe:
+    l'intero run MS1 viene scritto senza costruirlo in memoria (con un
+    archivio packed / memory-mapped si leggono solo viste).
+
+    Formati: CSV, Parquet (pyarrow, un row group per blocco) oppure
+    NPZ (un array .npy per colonna e per blocco: <colonna>.<nnnnn>;
+    read_npz riunisce i blocchi).
+    """
+
+    # ==========================================================
+    # SORGENTI (generatori di blocchi)
+    # ==========================================================
+    @staticmethod
+    def chromatogram_chunks(loader):
+        yield {
+            "rt": np.asarray(loader.tic_times, dtype=np.float64),
+            "tic": np.asarray(loader.tic_values, dtype=np.float64),
+            "bpc": np.asarray(loader.bpc_values, dtype=np.float64),
+        }
+
+    @staticmethod
+    def spectrum_chunks(mz, intensities):
+        yield {
+            "mz": np.asarray(mz, dtype=np.float64),
+            "intensity": np.asarray(intensities, dtype=np.float64),
+        }
+
+    @staticmethod
+    def ms1_run_chunks(loader, chunk_rows=CHUNK_ROWS):
+        """Picchi di tutti gli MS1 in ordine di RT, a blocchi di scan."""
+        store = loader.store
+        scans = loader.ms1_spectra.indices
+        counts = np.asarray(store.counts)[scans]
+
+        group, rows = [], 0
+        for pos in loader.ms1_rt_order:
+            group.append(pos)
+            rows += int(counts[pos])
+            if rows >= chunk_rows:
+                yield DataExporter._ms1_group(store, scans, group)
+                group, rows = [], 0
+        if group:
+            yield DataExporter._ms1_group(store, scans, group)
+
+    @staticmethod
+    def _ms1_group(store, scans, group):
+        mz_parts, int_parts, scan_col, rt_col = [], [], [], []
+        for pos in group:
+            mz, intens = store.peaks(scans[pos])
+            mz_parts.append(mz)
+            int_parts.append(intens)
+            scan_col.append(np.full(len(mz), pos, dtype=np.int64))
+            rt_col.append(np.full(len(mz), store.rt[scans[pos]]))
+        return {
+            "scan": np.concatenate(scan_col),
+            "rt": np.concatenate(rt_col),
+            "mz": np.concatenate(mz_parts).astype(np.float64, copy=False),
+            "intensity": np.concatenate(int_parts).astype(np.float64, copy=False),
+        }
+
+    @staticmethod
+    def ms2_list_chunks(loader):
+        store = loader.store
+        ms2 = loader.ms2_spectra.indices
+        yield {
+            "index": np.arange(len(ms2), dtype=np.int64),
+            "rt": np.asarray(store.rt[ms2], dtype=np.float64),
+            "precursor_mz": np.asarray(store.precursor[ms2], dtype=np.float64),
+            "parent_ms1": np.asarray(loader.ms2_parent, dtype=np.int64),
+            "n_peaks": np.asarray(store.counts[ms2], dtype=np.int64),
+        }
+
+    @staticmethod
+    def peak_chunks(x, y):
+        yield {
+            "x": np.asarray(x, dtype=np.float64),
+            "intensity": np.asarray(y, dtype=np.float64),
+        }
+
+    # ==========================================================
+    # SCRITTURA
+    # ==========================================================
+    @staticmethod
+    def format_for(path):
+        for ext, fmt in FORMATS.items():
+            if path.lower().endswith(ext):
+                return fmt
+        raise ValueError(f"Estensione non supportata: {path}")
+
+    def write(self, chunks, path, fmt=None):
+        """Scrive i blocchi nel formato indicato (default: dall'estensione)."""
+        fmt = fmt or self.format_for(path)
+        writer = {"csv": _CSVWriter, "parquet": _ParquetWriter,
+                  "npz": _NPZWriter}[fmt](path)
+        rows = 0
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+                rows += len(next(iter(chunk.values())))
+        finally:
+            writer.close()
+        return rows
+
+    @staticmethod
+    def read_npz(path):
+        """Riunisce i blocchi di un NPZ scritto da DataExporter."""
+        with np.load(path) as data:
+            columns = [str(c) for c in data["__columns__"]]
+            names = sorted(k for k in data.files if k != "__columns__")
+            return {
+                col: np.concatenate([data[k] for k in names
+                                     if k.rsplit(".", 1)[0] == col])
+                for col in columns
+            }
+
+    # ==========================================================
+    # FINESTRA ESPORTAZIONE
+    # ==========================================================
+    def open_window(self, root, get_loader, plotting, peak_core):
+        """
+        Finestra per scegliere i dati e il formato.
+        get_loader: callable che restituisce il loader corrente
+        """
+        win = tk.Toplevel(root)
+        win.title("Esporta dati")
+        win.geometry("340x300")
+        win.attributes("-topmost", True)
+
+        ttk.Label(win, text="Dati da esportare:",
+                  font=("Segoe UI", 10)).pack(anchor="w", padx=12, pady=(10, 4))
+
+        what_var = tk.StringVar(value="chrom")
+        for value, text in (("chrom", "TIC / BPC"),
+                            ("ms1", "Spettro MS1 corrente"),
+                            ("ms1_run", "Tutti gli MS1 del run"),
+                            ("ms2", "Lista MS2"),
+                            ("peaks", "Picchi (ultimo peak picking)")):
+            ttk.Radiobutton(win, text=text, value=value,
+                            variable=what_var).pack(anchor="w", padx=20)
+
+        row = tk.Frame(win)
+        row.pack(fill="x", padx=12, pady=10)
+        ttk.Label(row, text="Formato:").pack(side="left")
+
+        formats = ["CSV", "NPZ"] + (["Parquet"] if parquet_available() else [])
+        fmt_var = tk.StringVar(value="CSV")
+        ttk.Combobox(row, width=10, state="readonly", values=formats,
+                     textvariable=fmt_var).pack(side="left", padx=6)
+
+        ttk.Button(
+            win,
+            text="Esporta…",
+            command=lambda: self._export_dialog(
+                root, what_var.get(), fmt_var.get().lower(),
+                get_loader(), plotting, peak_core
+            )
+        ).pack(fill="x", padx=12, pady=(4, 12))
+
+    def _chunks_for(self, what, loader, plotting, peak_core):
+        """Generatore di blocchi per la scelta, oppure messaggio d'errore."""
+        if what == "peaks":
+            result = peak_core.last_result
+            if result is None:
+                return None, "Esegui prima un peak picking."
+            return self.peak_chunks(result["x"], result["y"]), None
+
+        if not loader.has_data():
+            return None, "Carica un file mzML."
+
+        if what == "chrom":
+            return self.chromatogram_chunks(loader), None
+        if what == "ms1":
+            if plotting.current_ms1 is None:
+                return None, "Nessuno spettro MS1 visualizzato."
+            _, mz, intens = plotting.current_ms1
+            return self.spectrum_chunks(mz, intens), None
+        if what == "ms1_run":
+            return self.ms1_run_chunks(loader), None
+        if not loader.ms2_spectra:
+            return None, "Nessuno spettro MS2 trovato."
+        return self.ms2_list_chunks(loader), None
+
+    def _export_dialog(self, root, what, fmt, loader, plotting, peak_core):
+        chunks, problem = self._chunks_for(what, loader, plotting, peak_core)
+        if problem:
+            messagebox.showwarning("Nessun dato", problem)
+            return
+
+        ext = {"csv": ".csv", "parquet": ".parquet", "npz": ".npz"}[fmt]
+        path = filedialog.asksaveasfilename(
+            title="Esporta dati",
+            defaultextension=ext,
+            filetypes=[(fmt.upper(), f"*{ext}")]
+        )
+        if not path:
+            return
+
+        root.configure(cursor="watch")
+        root.update_idletasks()
+        try:
+            rows = self.write(chunks, path, fmt=fmt)
+            messagebox.showinfo("Esportazione completata",
+                                f"{rows} righe esportate in:\n\n{path}")
+        except Exception as e:
+            messagebox.showerror("Errore",
+                                 f"Errore durante l'esportazione:\n\n{e}")
+        finally:
+            root.configure(cursor="")
+
+
+# ----------------------------------------------------------
+# WRITER PER FORMATO
+# ----------------------------------------------------------
+class _CSVWriter:
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8", newline="")
+        self.columns = None
+
+    def write(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk)
+            self.f.write(",".join(self.columns) + "\n")
+        fmt = ["%d" if np.issubdtype(chunk[c].dtype, np.integer) else "%.10g"
+               for c in self.columns]
+        table = np.column_stack([chunk[c] for c in self.columns])
+        np.savetxt(self.f, table, delimiter=",", fmt=fmt)
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        import pyarrow.parquet  # noqa: F401  (errore chiaro se manca)
+        self.path = path
+        self.writer = None
+
+    def write(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table(chunk)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _NPZWriter:
+    def __init__(self, path):
+        self.zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED,
+                                   allowZip64=True)
+        self.columns = None
+        self.n = 0
+
+    def write(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk)
+        for col in self.columns:
+            with self.zip.open(f"{col}.{self.n:05d}.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, np.ascontiguousarray(chunk[col]))
+        self.n += 1
+
+    def close(self):
+        with self.zip.open("__columns__.npy", "w") as f:
+            np.lib.format.write_array(f, np.array(self.columns or [], dtype=str))
+        self.zip.close()
@@ -0,0 +1,379 @@
+"""
+core/heatmap.py
+Mappa di intensità RT × m/z con raffinamento progressivo – LC–MS Viewer
+Versione riscritta 2026 – Python 3.12
+"""
+
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+import numpy as np
+
+
+# Picchi usati per la prima mappa grossolana (scan campionati)
+COARSE_PEAKS = 200_000
+
+# Picchi letti per blocco durante il binning della mappa completa
+CHUNK_PEAKS = 2_000_000
+
+# Risoluzione della mappa grossolana (bin RT, bin m/z)
+COARSE_SHAPE = (200, 150)
+
+# Intervallo di polling dei risultati in background (ms)
+MAP_POLL_MS = 50
+
+# Attesa dopo l'ultimo cambio di limiti prima di ricalcolare (ms)
+REBIN_DELAY_MS = 150
+
+# Massimo numero di bin per asse
+MAX_BINS = 2000
+
+
+def bin_peaks(rt, mz, intensities, region, shape):
+    """
+    Somma delle intensità su una griglia RT × m/z (bincount vettoriale),
+    in scala log(1 + I). region = (rt_min, rt_max, mz_min, mz_max),
+    shape = (bin RT, bin m/z). Restituisce l'immagine (m/z × RT).
+    """
+    rt_min, rt_max, mz_min, mz_max = region
+    n_rt, n_mz = shape
+
+    keep = (rt >= rt_min) & (rt <= rt_max) & (mz >= mz_min) & (mz <= mz_max)
+    rt, mz = rt[keep], mz[keep]
+    weights = np.asarray(intensities[keep], dtype=np.float64)
+
+    i = ((rt - rt_min) * (n_rt / max(rt_max - rt_min, 1e-12))).astype(np.intp)
+    j = ((mz - mz_min) * (n_mz / max(mz_max - mz_min, 1e-12))).astype(np.intp)
+    np.clip(i, 0, n_rt - 1, out=i)
+    np.clip(j, 0, n_mz - 1, out=j)
+
+    image = np.bincount(j * n_rt + i, weights=weights, minlength=n_rt * n_mz)
+    return np.log1p(image.reshape(n_mz, n_rt))
+
+
+def bin_scans(store, scans, region, shape, chunk_peaks=CHUNK_PEAKS):
+    """
+    Come bin_peaks ma direttamente dagli array del PackedSpectra degli
+    scan indicati: il bin RT viene calcolato una volta per scan e ripetuto
+    sui suoi picchi. store.mz / store.intensity vengono letti a blocchi di
+    al massimo chunk_peaks picchi (slice se gli scan del blocco sono
+    contigui), senza copie di RT / m/z / intensità dell'intero run.
+    """
+    rt_min, rt_max, mz_min, mz_max = region
+    n_rt, n_mz = shape
+    image = np.zeros(n_rt * n_mz, dtype=np.float64)
+
+    # Ordine dello store: scan contigui → picchi contigui
+    scans = np.sort(np.asarray(scans, dtype=np.intp))
+    rt = np.asarray(store.rt[scans], dtype=np.float64)
+    keep = (rt >= rt_min) & (rt <= rt_max)
+    scans, rt = scans[keep], rt[keep]
+
+    rt_bin = ((rt - rt_min) * (n_rt / max(rt_max - rt_min, 1e-12))).astype(np.intp)
+    np.clip(rt_bin, 0, n_rt - 1, out=rt_bin)
+    starts = np.asarray(store.offsets[scans], dtype=np.intp)
+    counts = np.asarray(store.offsets[scans + 1], dtype=np.intp) - starts
+
+    # Blocchi di scan con al più chunk_peaks picchi (almeno uno scan)
+    cum = np.cumsum(counts)
+    k0 = 0
+    while k0 < len(scans):
+        base = cum[k0] - counts[k0]
+        k1 = max(int(np.searchsorted(cum, base + chunk_peaks, side="right")), k0 + 1)
+        n = counts[k0:k1]
+
+        if scans[k1 - 1] - scans[k0] == k1 - k0 - 1:
+            a, b = int(starts[k0]), int(starts[k1 - 1] + counts[k1 - 1])
+            mz, intens = store.mz[a:b], store.intensity[a:b]
+        else:
+            first = np.cumsum(n) - n
+            sel = np.repeat(starts[k0:k1] - first, n) + np.arange(int(n.sum()))
+            mz, intens = store.mz[sel], store.intensity[sel]
+
+        i = np.repeat(rt_bin[k0:k1], n)
+        inside = (mz >= mz_min) & (mz <= mz_max)
+        j = ((mz[inside] - mz_min) * (n_mz / max(mz_max - mz_min, 1e-12))).astype(np.intp)
+        np.clip(j, 0, n_mz - 1, out=j)
+
+        image += np.bincount(j * n_rt + i[inside],
+                             weights=np.asarray(intens[inside], dtype=np.float64),
+                             minlength=n_rt * n_mz)
+        k0 = k1
+
+    return np.log1p(image.reshape(n_mz, n_rt))
+
+
+class IntensityMap:
+    """
+    Panoramica RT × m/z di tutti i picchi MS1 di un run.
+
+    - la mappa grossolana (scan campionati, COARSE_SHAPE) compare subito
+    - in background viene calcolata la mappa completa alla risoluzione
+      in pixel dell'asse
+    - dopo uno zoom / pan (toolbar) solo la regione visibile viene
+      ricalcolata ad alta risoluzione tramite l'indice RT × m/z del
+      loader e sovrapposta alla panoramica, con la stessa scala dei
+      colori della panoramica
+
+    I calcoli girano in un thread; i risultati arrivano su una coda letta
+    con root.after. Ogni richiesta ha un numero di generazione: i risultati
+    superati da richieste più recenti (o di un run precedente) vengono
+    scartati.
+    """
+
+    def __init__(self):
+        self.window = None
+        self.loader = None
+        self.on_select_rt = None
+
+        self._queue = queue.Queue()
+        self._generation = 0
+        self._overview_gen = None  # richieste i cui risultati sono attesi
+        self._detail_gen = None
+        self._region = None        # (rt_min, rt_max, mz_min, mz_max) dell'intero run
+        self._detail_region = None
+        self._rebin_job = None
+        self._clim = None          # scala log(1 + I) comune a panoramica e dettaglio
+
+    def is_open(self):
+        return bool(self.window) and bool(tk.Toplevel.winfo_exists(self.window))
+
+    # ==========================================================
+    # FINESTRA
+    # ==========================================================
+    def open_window(self, root, get_loader, on_select_rt=None):
+        """
+        get_loader: callable che restituisce il loader corrente
+        on_select_rt(rt) = callback al click sulla mappa (es. MS1 @ RT)
+        """
+        loader = get_loader()
+        if not loader.ms1_spectra:
+            messagebox.showwarning("Nessun dato", "Carica un file mzML.")
+            return
+
+        if self.is_open():
+            if loader is self.loader:
+                self.window.lift()
+                return
+            self.window.destroy()
+
+        self.loader = loader
+        self.on_select_rt = on_select_rt
+        self._detail_region = None
+
+        self.window = tk.Toplevel(root)
+        self.window.title("Mappa RT × m/z")
+        self.window.geometry("980x620")
+
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import (
+            FigureCanvasTkAgg, NavigationToolbar2Tk
+        )
+
+        self.status = ttk.Label(self.window, text="Calcolo mappa…")
+        self.status.pack(side="bottom", fill="x", padx=10, pady=(0, 6))
+
+        self.fig = Figure(figsize=(9, 5.5), dpi=100, layout="constrained")
+        self.ax = self.fig.add_subplot(1, 1, 1)
+        self.ax.set_xlabel("Tempo (min)")
+        self.ax.set_ylabel("m/z")
+        self.ax.set_title("Intensità MS1 • log(1 + I)", pad=10)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.window)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.window,
+                                            pack_toolbar=False)
+        self.toolbar.pack(side="bottom", fill="x")
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+
+        self.im_full = None
+        self.im_detail = None
+        self._clim = None
+
+        self.canvas.mpl_connect("button_press_event", self._on_click)
+
+        # Bin della mappa completa = pixel dell'asse (calcolati qui, non nel thread)
+        self.canvas.get_tk_widget().update_idletasks()
+        self._overview_gen = self._start(self._overview_job, loader,
+                                         self._pixel_shape(len(loader.ms1_spectra)))
+        self._detail_gen = None
+        self.window.after(MAP_POLL_MS, self._poll)
+
+    # ==========================================================
+    # CALCOLO IN BACKGROUND
+    # ==========================================================
+    def _start(self, job, *args):
+        """Avvia job(*args) in un thread; restituisce la generazione."""
+        self._generation += 1
+        threading.Thread(target=self._run, args=(self._generation, job, args),
+                         daemon=True).start()
+        return self._generation
+
+    def _run(self, generation, job, args):
+        try:
+            for result in job(*args):
+                self._queue.put((generation, result))
+        except Exception as e:
+            self._queue.put((generation, ("error", str(e))))
+
+    def _overview_job(self, loader, shape_full):
+        """Mappa grossolana (scan campionati), poi quella completa."""
+        store, scans = loader.ms1_packed()
+        starts = store.offsets[scans]
+        ends = store.offsets[scans + 1]
+        total = int((ends - starts).sum())
+        if total == 0:
+            yield ("error", "Nessun picco MS1.")
+            return
+
+        # Estensione da primo / ultimo picco di ogni scan (m/z ordinati)
+        nonempty = ends > starts
+        rts = store.rt[scans]
+        region = (float(rts[0]), float(rts[-1]),
+                  float(store.mz[starts[nonempty]].min()),
+                  float(store.mz[ends[nonempty] - 1].max()))
+
+        step = max(1, total // COARSE_PEAKS)
+        shape = (min(COARSE_SHAPE[0], max(1, len(scans) // step)), COARSE_SHAPE[1])
+        yield ("coarse", region, bin_scans(store, scans[::step], region, shape))
+
+        yield ("full", region, bin_scans(store, scans, region, shape_full))
+
+    def _detail_job(self, loader, region, shape):
+        """Solo la regione visibile, ad alta risoluzione (indice RT × m/z)."""
+        index = loader.get_spatial_index()
+        rt, mz, intens = index.query(*region)
+        yield ("detail", region, bin_peaks(rt, mz, intens, region, shape))
+
+    def _pixel_shape(self, n_scans):
+        """Bin = pixel dell'asse (RT limitato al numero di scan)."""
+        bbox = self.ax.get_window_extent()
+        n_rt = int(min(bbox.width, n_scans, MAX_BINS))
+        n_mz = int(min(bbox.height, MAX_BINS))
+        return max(n_rt, 1), max(n_mz, 1)
+
+    # ==========================================================
+    # RISULTATI
+    # ==========================================================
+    def _poll(self):
+        if not self.is_open():
+            return
+
+        while True:
+            try:
+                generation, result = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation not in (self._overview_gen, self._detail_gen):
+                continue
+            if result[0] == "error":
+                self.status.configure(text=f"Errore: {result[1]}")
+            elif result[0] == "detail":
+                self._show_detail(*result[1:])
+            else:
+                self._show_overview(*result)
+
+        self.window.after(MAP_POLL_MS, self._poll)
+
+    def _show_overview(self, kind, region, image):
+        rt_min, rt_max, mz_min, mz_max = region
+        extent = (rt_min, rt_max, mz_min, mz_max)
+
+        if self.im_full is None:
+            self._region = region
+            self.im_full = self.ax.imshow(image, extent=extent, origin="lower",
+                                          aspect="auto", cmap="viridis",
+                                          interpolation="nearest")
+            self.ax.set_xlim(rt_min, rt_max)
+            self.ax.set_ylim(mz_min, mz_max)
+
+            # Limiti gestiti a mano: set_extent non deve spostare la vista
+            self.ax.set_autoscale_on(False)
+            self.ax.callbacks.connect("xlim_changed", self._on_limits)
+            self.ax.callbacks.connect("ylim_changed", self._on_limits)
+        else:
+            self.im_full.set_data(image)
+            self.im_full.set_extent(extent)
+
+        # La scala dei colori segue la panoramica e vale anche per il
+        # dettaglio: stesso colore = stessa intensità in entrambe
+        self._clim = (0, max(float(image.max()), 1e-12))
+        for im in (self.im_full, self.im_detail):
+            if im is not None:
+                im.set_clim(*self._clim)
+
+        if kind == "coarse":
+            self.status.configure(text="Mappa grossolana • raffinamento in corso…")
+        else:
+            n_mz, n_rt = image.shape
+            self.status.configure(text=f"Mappa completa • {n_rt} × {n_mz} bin")
+        self.canvas.draw_idle()
+
+    def _show_detail(self, region, image):
+        rt_min, rt_max, mz_min, mz_max = region
+        extent = (rt_min, rt_max, mz_min, mz_max)
+
+        if self.im_detail is None:
+            self.im_detail = self.ax.imshow(image, extent=extent, origin="lower",
+                                            aspect="auto", cmap="viridis",
+                                            interpolation="nearest")
+        else:
+            self.im_detail.set_data(image)
+            self.im_detail.set_extent(extent)
+            self.im_detail.set_visible(True)
+        self.im_detail.set_clim(*self._clim)
+
+        n_mz, n_rt = image.shape
+        self.status.configure(text=f"Regione visibile • {n_rt} × {n_mz} bin")
+        self.canvas.draw_idle()
+
+    # ==========================================================
+    # ZOOM / CLICK
+    # ==========================================================
+    def _on_limits(self, ax):
+        """Cambio dei limiti: ricalcolo della regione dopo una breve pausa."""
+        if self._rebin_job is not None:
+            self.window.after_cancel(self._rebin_job)
+        self._rebin_job = self.window.after(REBIN_DELAY_MS, self._rebin)
+
+    def _rebin(self):
+        self._rebin_job = None
+        if self._region is None:
+            return
+
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+        full = self._region
+        region = (max(x0, full[0]), min(x1, full[1]),
+                  max(y0, full[2]), min(y1, full[3]))
+        if region[1] <= region[0] or region[3] <= region[2]:
+            return
+
+        # Vista (quasi) intera: basta la panoramica
+        if (region[1] - region[0] >= 0.98 * (full[1] - full[0]) and
+                region[3] - region[2] >= 0.98 * (full[3] - full[2])):
+            if self.im_detail is not None and self.im_detail.get_visible():
+                self.im_detail.set_visible(False)
+                self.canvas.draw_idle()
+            self._detail_region = None
+            self._detail_gen = None        # scarta dettagli in corso
+            return
+
+        if region == self._detail_region:
+            return
+        self._detail_region = region
+
+        rts = self.loader.ms1_rt_sorted
+        n_scans = int(np.searchsorted(rts, region[1], side="right") -
+                      np.searchsorted(rts, region[0], side="left"))
+        self.status.configure(text="Ricalcolo della regione visibile…")
+        self._detail_gen = self._start(self._detail_job, self.loader, region,
+                                       self._pixel_shape(max(n_scans, 1)))
+
+    def _on_click(self, event):
+        if event.inaxes is not self.ax or event.xdata is None:
+            return
+        if self.toolbar.mode or event.button != 1 or self.on_select_rt is None:
+            return
+        self.on_select_rt(event.xdata)
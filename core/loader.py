@@ -6,9 +6,176 @@ Gestione del caricamento file mzML tramite pyteomics.
 Versione riscritta 2026 – Python 3.12
 """
 
-from pyteomics import mzml
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
+from core.profiling import LoadProfile
+from core.spatial_index import RTMZIndex
+from core.spectra import (
+    LazySpectra, PackedSpectra, PackedSpectraBuilder, SpectrumView
+)
+
+
+class LoadCancelled(Exception):
+    """Sollevata da MZMLLoader.load quando il caricamento viene annullato."""
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """
+    Sollevata quando una struttura sull'intero run (MS1 packed, indice
+    RT × m/z) supererebbe il memory_budget del loader.
+    """
+
+
+# Intervallo minimo (s) tra due notifiche di avanzamento
+PROGRESS_INTERVAL = 0.25
+
+
+# ----------------------------------------------------------
+# WORKER PER LA DECODIFICA PARALLELA
+# ----------------------------------------------------------
+_worker_reader = None
+
+
+def _init_worker(file_path):
+    """Apre un reader indicizzato per processo worker."""
+    from pyteomics import mzml
+
+    global _worker_reader
+    _worker_reader = mzml.PreIndexedMzML(file_path)
+
+
+def _decode_chunk(ids, intensity_dtype=None):
+    """
+    Decodifica un blocco di scan (per id) in un PackedSpectra.
+    Restituisce anche i punti (rt, tic, bpc) degli MS1 del blocco,
+    calcolati sulle intensità originali prima della conversione.
+    """
+    builder = PackedSpectraBuilder(intensity_dtype=intensity_dtype)
+    times, tic, bpc = [], [], []
+
+    for spectrum_id in ids:
+        spectrum = _worker_reader.get_by_id(spectrum_id)
+
+        level = spectrum.get("ms level")
+        if level not in (1, 2):
+            continue
+
+        rt = MZMLLoader._spectrum_rt(spectrum)
+        if rt is None:
+            continue
+
+        mz = spectrum.get("m/z array")
+        intensities = spectrum.get("intensity array")
+        if mz is None or intensities is None:
+            continue
+
+        precursor, parent_id = None, None
+        if level == 1:
+            times.append(rt)
+            tic.append(float(np.sum(intensities)))
+            bpc.append(float(np.max(intensities)))
+        else:
+            precursor = MZMLLoader._spectrum_precursor(spectrum)
+            parent_id = MZMLLoader._spectrum_parent_ref(spectrum)
+        builder.append(rt, level, precursor, mz, intensities,
+                       spectrum_id=spectrum_id, parent_id=parent_id)
+
+    return builder.build(), (times, tic, bpc)
+
+
+def _has_index_list(file_path):
+    """True se il file termina con un <indexListOffset> (indexedmzML)."""
+    try:
+        with open(file_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1024))
+            return b"<indexListOffset>" in f.read()
+    except OSError:
+        return False
+
+
+# ----------------------------------------------------------
+# LETTURA DEGLI HEADER (modalità lazy)
+# ----------------------------------------------------------
+# Byte letti per volta cercando la fine dell'header di uno spettro
+HEADER_READ = 4096
+
+
+def _read_spectrum_header(f, offset):
+    """
+    Byte di uno <spectrum> dall'offset dell'indice fino a
+    <binaryDataArrayList> escluso, richiuso con </spectrum>.
+    None se lo spettro non ha array binari.
+    """
+    f.seek(offset)
+    data = b""
+    while True:
+        block = f.read(HEADER_READ)
+        data += block
+        end = data.find(b"<binaryDataArrayList")
+        if end >= 0:
+            return data[:end] + b"</spectrum>"
+        if b"</spectrum>" in data or not block:
+            return None
+
+
+def _cv_params(element):
+    """{ nome: valore } dei cvParam figli diretti di un elemento."""
+    return {p.get("name"): p.get("value") for p in element.findall("cvParam")}
+
+
+def _float_or_none(value):
+    return None if value is None else float(value)
+
+
+def _parse_spectrum_header(data):
+    """
+    Header di uno spettro: dict { level, rt, tic, bpc, count,
+    precursor, parent_id }, oppure None se l'XML non è interpretabile
+    qui (il chiamante ricade su pyteomics).
+    """
+    import xml.etree.ElementTree as ET
+
+    try:
+        spectrum = ET.fromstring(data)
+    except ET.ParseError:
+        return None
+
+    params = _cv_params(spectrum)
+    if "ms level" not in params:
+        return None
+
+    scan = spectrum.find("scanList/scan")
+    rt = None if scan is None else _cv_params(scan).get("scan start time")
+
+    precursor, parent_id = None, None
+    element = spectrum.find("precursorList/precursor")
+    if element is not None:
+        parent_id = element.get("spectrumRef")
+        ion = element.find("selectedIonList/selectedIon")
+        if ion is not None:
+            precursor = _cv_params(ion).get("selected ion m/z")
+
+    tic = params.get("total ion current")
+    bpc = params.get("base peak intensity")
+    if tic is None or bpc is None:
+        tic = bpc = None
+
+    return {
+        "level": int(params["ms level"]),
+        "rt": _float_or_none(rt),
+        "tic": _float_or_none(tic),
+        "bpc": _float_or_none(bpc),
+        "count": int(spectrum.get("defaultArrayLength", 0)),
+        "precursor": _float_or_none(precursor),
+        "parent_id": parent_id,
+    }
+
 
 class MZMLLoader:
     """
@@ -20,9 +187,32 @@ class MZMLLoader:
     - registrare spettrogrammi MS1 multipli
     - registrare spettrogrammi MS2
     - fornire dati ai moduli plotting / zoom
+
+    I picchi sono conservati in un archivio colonnare (PackedSpectra);
+    ms1_spectra / ms2_spectra sono viste compatibili con le vecchie
+    liste di tuple / dict. Con memory_budget (byte) il run viene tenuto
+    in memoria (intensità float32) solo se la stima dei picchi rientra nel
+    budget; altrimenti resta lazy con una cache LRU limitata al budget.
+
+    Con una SpectraCache i run già letti vengono riaperti in memory-map
+    dalla cache su disco.
+
+    In modalità lazy (load(..., lazy=True)) vengono letti solo i
+    metadati degli scan; i picchi sono decodificati su richiesta
+    dall'indice mzML.
+
+    Ogni load registra un LoadProfile (self.profile): tempi per fase,
+    byte letti, spettri/s e, con trace_memory=True, il picco tracemalloc.
     """
 
-    def __init__(self):
+    def __init__(self, cache=None, memory_budget=None, trace_memory=False):
+        self.cache = cache                  # SpectraCache opzionale
+        self.memory_budget = memory_budget  # byte, None = nessun limite
+        self.trace_memory = trace_memory    # picco di memoria nel profilo
+
+        # Strutture derivate (ms1_packed / indice RT × m/z) costruite
+        # anche dai thread in background: una sola costruzione alla volta
+        self._derived_lock = threading.RLock()
         self.reset()
 
     # ----------------------------------------------------------
@@ -30,7 +220,18 @@ class MZMLLoader:
     # ----------------------------------------------------------
     def reset(self):
         """Reset completo di tutti i contenuti."""
+        if getattr(self, "store", None) is not None:
+            self.store.close()
+
         self.file_path = None
+        self.store = None          # PackedSpectra | LazySpectra
+        self.profile = None        # LoadProfile dell'ultimo load
+
+        # Avanzamento / annullamento (solo durante load)
+        self._progress = None
+        self._cancel = None
+        self._reported = 0
+        self._last_report = 0.0
 
         # TIC / BPC
         self.tic_times = []
@@ -41,87 +242,800 @@ class MZMLLoader:
         # MS1
         self.ms1_mz = None
         self.ms1_int = None
-        self.ms1_spectra = []      # lista di tuple: (rt, mz_array, int_array)
+        self.ms1_spectra = []      # vista di tuple: (rt, mz_array, int_array)
+
+        # Indice RT degli MS1 (ordinato) per ricerche O(log n)
+        self.ms1_rt_sorted = np.empty(0)
+        self.ms1_rt_order = np.empty(0, dtype=np.intp)
+
+        # Strutture derivate, costruite su richiesta
+        self._ms1_packed = None
+        self._spatial_index = None
 
         # MS2
-        self.ms2_spectra = []      # lista dict: { rt, precursor, mz[], int[] }
+        self.ms2_spectra = []      # vista di dict: { rt, precursor, mz[], int[] }
+
+        # Collegamenti MS1 ↔ MS2 e indice dei precursori
+        self.ms2_parent = np.empty(0, dtype=np.intp)       # MS2 → indice MS1 (-1)
+        self.ms1_child_offsets = np.zeros(1, dtype=np.int64)
+        self.ms1_children = np.empty(0, dtype=np.intp)     # CSR MS1 → MS2
+        self.precursor_sorted = np.empty(0)
+        self.precursor_order = np.empty(0, dtype=np.intp)
 
     # ----------------------------------------------------------
     # CARICAMENTO MZML
     # ----------------------------------------------------------
-    def load(self, file_path: str):
+    def load(self, file_path: str, lazy: bool = False, workers: int = 1,
+             progress=None, cancel=None):
         """
         Carica un file mzML e popola TIC, BPC, MS1, MS2.
         Mantiene comportamento identico al viewer originale,
         ma con struttura molto più robusta.
+
+        lazy=True → primo passaggio solo sui metadati (indexList),
+        picchi decodificati on demand da ms1_spectra / ms2_spectra.
+
+        workers > 1 → decodifica parallela su più processi (solo file
+        indicizzati; altrimenti si ricade sul percorso seriale).
+
+        Se presente una cache valida viene usata in entrambe le modalità;
+        la lettura completa (lazy=False) la scrive al primo caricamento.
+
+        progress(done, total, times, tic, bpc) viene chiamata periodicamente
+        con i nuovi punti di TIC / BPC (total può essere None).
+        cancel: threading.Event; se impostato solleva LoadCancelled.
         """
 
         self.reset()
         self.file_path = file_path
+        self._progress = progress
+        self._cancel = cancel
+
+        profile = self.profile = LoadProfile(file_path, self.trace_memory)
+        profile.start()
 
         try:
-            with mzml.read(file_path) as reader:
-                for spectrum in reader:
+            if self._load_cached(file_path):
+                profile.strategy = ("cache" if isinstance(self.store, PackedSpectra)
+                                    else "cache (lazy)")
+                return
 
-                    # MS level
-                    level = spectrum.get("ms level")
-                    if level is None:
-                        continue
+            if lazy:
+                profile.strategy = "lazy"
+                self._load_lazy(file_path)
+            elif self.memory_budget is not None:
+                self._load_budgeted(file_path, workers)
+            elif workers > 1 and _has_index_list(file_path):
+                profile.strategy = "parallel"
+                self._load_parallel(file_path, workers)
+                self._save_cache(file_path)
+            else:
+                profile.strategy = "eager"
+                self._load_eager(file_path)
+                self._save_cache(file_path)
+        except LoadCancelled:
+            self.reset()
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Errore caricando il file mzML:\n{e}")
+        finally:
+            self._progress = None
+            self._cancel = None
+            profile.count_spectra(len(self.store) if self.store is not None else 0)
+            profile.stop()
 
-                    # Tempo di ritenzione
-                    try:
-                        rt = spectrum["scanList"]["scan"][0]["scan start time"]
-                    except Exception:
-                        continue
+    def profile_report(self):
+        """Report (dict) del profilo dell'ultimo load, oppure None."""
+        return None if self.profile is None else self.profile.report()
+
+    def _load_eager(self, file_path):
+        """Lettura completa: tutti i picchi in un archivio colonnare."""
+        self._attach_store(self._decode_serial(file_path))
+
+    def _load_parallel(self, file_path, workers):
+        """Lettura completa con decodifica su più processi."""
+        self._attach_store(self._decode_parallel(file_path, workers))
+
+    def _load_budgeted(self, file_path, workers):
+        """
+        Un solo passaggio sul file: decodifica completa (intensità
+        float32) finché i picchi rientrano nel budget; superato il
+        budget lo stesso passaggio prosegue sui soli header e il run
+        resta lazy con una cache LRU limitata al budget.
+        """
+        if workers > 1 and _has_index_list(file_path):
+            store = self._decode_parallel(file_path, workers,
+                                          intensity_dtype=np.float32,
+                                          max_bytes=self.memory_budget)
+        else:
+            store = self._decode_serial(file_path,
+                                        intensity_dtype=np.float32,
+                                        max_bytes=self.memory_budget)
+
+        if isinstance(store, LazySpectra):
+            self.profile.strategy = "budgeted (lazy)"
+        else:
+            self.profile.strategy = "budgeted (packed)"
+        self._attach_store(store)
+        self._save_cache(file_path)
+
+    def _decode_serial(self, file_path, chromatograms=True, intensity_dtype=None,
+                       max_bytes=None):
+        """
+        Decodifica sequenziale di tutti gli scan in un PackedSpectra.
+        chromatograms=True → accoda anche i punti di TIC / BPC.
+
+        max_bytes: quando i picchi decodificati superano la soglia si
+        scartano e il resto del file viene letto solo negli header
+        (_read_headers); restituisce allora un LazySpectra.
+        """
+        from pyteomics import mzml
+
+        builder = PackedSpectraBuilder(intensity_dtype=intensity_dtype,
+                                       max_bytes=max_bytes)
+        profile = self.profile
+
+        # Decodifica binaria esplicita: separa nel profilo il parsing XML
+        # dalla decodifica base64 / zlib
+        entries = None
+        if _has_index_list(file_path):
+            reader = mzml.PreIndexedMzML(file_path, decode_binary=False)
+            entries = self._index_entries(reader)
+            total = len(entries)
+        else:
+            reader = mzml.read(file_path, decode_binary=False)
+            total = None
 
-                    # Dati spettrali
-                    mz = spectrum.get("m/z array")
-                    intensities = spectrum.get("intensity array")
+        done = 0
+        switched = False
+        profile.reset_lap()
+        with reader:
+            for done, spectrum in enumerate(reader, 1):
+                profile.lap("parse")
+                self._tick(done, total)
 
-                    if mz is None or intensities is None:
+                # MS level
+                level = spectrum.get("ms level")
+                if level not in (1, 2):
+                    continue
+
+                # Tempo di ritenzione
+                rt = self._spectrum_rt(spectrum)
+                if rt is None:
+                    continue
+
+                # Dati spettrali
+                mz = spectrum.get("m/z array")
+                intensities = spectrum.get("intensity array")
+
+                if mz is None or intensities is None:
+                    continue
+
+                if level == 1:
+                    precursor, parent_id = None, None
+                else:
+                    precursor = self._spectrum_precursor(spectrum)
+                    parent_id = self._spectrum_parent_ref(spectrum)
+
+                if builder.overflowed:
+                    # File senza indice: si prosegue qui con i soli metadati
+                    if level == 1 and chromatograms:
+                        self._append_header_chromatograms(spectrum, rt)
+                    builder.append_header(rt, level, precursor,
+                                          spectrum.get("defaultArrayLength", 0),
+                                          spectrum_id=spectrum.get("id"),
+                                          parent_id=parent_id)
+                    profile.lap("append")
+                    continue
+
+                mz, intensities = mz.decode(), intensities.decode()
+                profile.lap("decode")
+
+                if level == 1 and chromatograms:
+                    self._append_chromatograms(rt, intensities)
+                    profile.lap("reduce")
+
+                builder.append(rt, level, precursor, mz, intensities,
+                               spectrum_id=spectrum.get("id"),
+                               parent_id=parent_id)
+                profile.lap("append")
+
+                # Oltre il budget: il resto del file solo negli header
+                if builder.overflowed and entries is not None and \
+                        entries[done - 1][0] == spectrum.get("id"):
+                    if done < len(entries):
+                        profile.add_bytes(entries[done][1])
+                    self._read_headers(file_path, reader, entries[done:],
+                                       builder, chromatograms, done, total)
+                    switched, done = True, total
+                    break
+
+        if not switched:
+            profile.add_file_pass(file_path)
+        self._tick(done, total, force=True)
+
+        if builder.overflowed:
+            return self._lazy_store(file_path, builder.headers())
+        with profile.phase("build"):
+            return builder.build()
+
+    def _decode_parallel(self, file_path, workers, chromatograms=True,
+                         intensity_dtype=None, max_bytes=None):
+        """
+        Divide gli offset dell'indice in blocchi, li decodifica in
+        processi separati e unisce i risultati in ordine di RT.
+
+        I blocchi seguono l'ordine del file: se gli RT sono già
+        crescenti (il caso normale) l'unione è una sola concatenazione,
+        senza il riordino che copierebbe di nuovo l'intero run.
+        TIC / BPC arrivano già ridotti dai worker.
+
+        max_bytes: oltre la soglia i picchi dei blocchi vengono scartati
+        (restano i metadati), i blocchi non ancora avviati vengono letti
+        solo negli header e si restituisce un LazySpectra.
+        """
+        from pyteomics import mzml
+
+        profile = self.profile
+        reader = mzml.PreIndexedMzML(file_path, decode_binary=False)
+        with profile.phase("index read"):
+            entries = self._index_entries(reader)
+        total = len(entries)
+
+        # Più blocchi che worker per bilanciare il carico; byte di ogni
+        # blocco = distanza tra il suo primo offset e quello successivo
+        n_chunks = min(total, workers * 4) or 1
+        chunks = [entries[c[0]:c[-1] + 1]
+                  for c in np.array_split(np.arange(total), n_chunks) if len(c)]
+        bounds = [chunk[0][1] for chunk in chunks] + [os.path.getsize(file_path)]
+
+        builder = PackedSpectraBuilder(max_bytes=max_bytes)
+        done = 0
+        # Parsing e decodifica avvengono nei worker: qui solo il tempo reale
+        t0 = time.perf_counter()
+        with reader, ProcessPoolExecutor(max_workers=workers,
+                                         initializer=_init_worker,
+                                         initargs=(file_path,)) as pool:
+            futures = [pool.submit(_decode_chunk, [i for i, _ in chunk],
+                                   intensity_dtype)
+                       for chunk in chunks]
+            try:
+                for k, (chunk, future) in enumerate(zip(chunks, futures)):
+                    if future.cancelled():
+                        # Oltre il budget: blocco mai avviato → solo header
+                        self._read_headers(file_path, reader, chunk, builder,
+                                           chromatograms, done, total)
+                        done += len(chunk)
                         continue
 
-                    # ----------------------------
-                    # MS1
-                    # ----------------------------
-                    if level == 1:
-                        tic = float(np.sum(intensities))
-                        bpc = float(np.max(intensities))
-
-                        self.tic_times.append(rt)
-                        self.tic_values.append(tic)
-
-                        self.bpc_times.append(rt)
-                        self.bpc_values.append(bpc)
-
-                        # Salva primo MS1 come default
-                        if self.ms1_mz is None:
-                            self.ms1_mz = mz
-                            self.ms1_int = intensities
-
-                        # Salva tutti gli MS1 (per zoom / sync MS1)
-                        self.ms1_spectra.append((rt, mz, intensities))
-
-                    # ----------------------------
-                    # MS2
-                    # ----------------------------
-                    elif level == 2:
-                        try:
-                            precursor = spectrum["precursorList"]["precursor"][0][
-                                "selectedIonList"
-                            ]["selectedIon"][0]["selected ion m/z"]
-                        except Exception:
-                            precursor = None
-
-                        self.ms2_spectra.append({
-                            "rt": rt,
-                            "precursor": precursor,
-                            "mz": mz,
-                            "int": intensities,
-                        })
+                    part, points = future.result()
+                    profile.add_bytes(bounds[k + 1] - bounds[k])
+                    builder.extend(part)
+                    done += len(chunk)
+                    if chromatograms:
+                        self._extend_chromatograms(*points)
+                    self._tick(done, total, force=True)
 
-        except Exception as e:
-            raise RuntimeError(f"Errore caricando il file mzML:\n{e}")
+                    if builder.overflowed:
+                        for pending in futures[k + 1:]:
+                            pending.cancel()
+            except LoadCancelled:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        profile.add("decode (workers)", time.perf_counter() - t0)
+
+        if builder.overflowed:
+            return self._lazy_store(file_path, builder.headers())
+
+        with profile.phase("merge"):
+            store = builder.build()
+            del builder
+            if np.any(np.diff(store.rt) < 0):
+                store = store.take(np.argsort(store.rt, kind="stable"))
+                if chromatograms:
+                    self._sort_chromatograms()
+
+        return store
+
+    def _load_lazy(self, file_path):
+        """
+        Primo passaggio sui soli header (_read_headers): id, RT, livello,
+        precursore e numero di picchi di ogni scan, TIC / BPC degli MS1.
+        I picchi sono decodificati su richiesta dall'indice mzML.
+        """
+        from pyteomics import mzml
+
+        builder = PackedSpectraBuilder()
+        with mzml.PreIndexedMzML(file_path, decode_binary=False) as reader:
+            with self.profile.phase("index read"):
+                entries = self._index_entries(reader)
+            self._read_headers(file_path, reader, entries, builder)
+
+        self._attach_store(self._lazy_store(file_path, builder.headers()))
+
+    @staticmethod
+    def _index_entries(reader):
+        """(id, offset) degli spettri dell'indice, in ordine di file."""
+        return sorted(reader.index["spectrum"].items(), key=lambda entry: entry[1])
+
+    def _read_headers(self, file_path, reader, entries, builder,
+                      chromatograms=True, done=0, total=None):
+        """
+        Legge i soli header degli spettri indicati da entries (id, offset):
+        i byte dello spettro fino a <binaryDataArrayList> (i base64 non
+        vengono letti né tokenizzati), quindi il costo dipende dal numero
+        di scan e non dal numero di picchi. I metadati vanno nel builder
+        (append_header).
+
+        TIC / BPC degli MS1 vengono letti dai cvParam "total ion current"
+        / "base peak intensity"; solo se mancano si decodifica l'array di
+        intensità. Gli header non interpretabili (es. cvParam in
+        referenceableParamGroup) passano dal parser di pyteomics.
+        done / total: avanzamento già raggiunto e totale degli scan.
+        """
+        profile = self.profile
+        total = total if total is not None else done + len(entries)
+
+        profile.reset_lap()
+        with open(file_path, "rb") as f:
+            for done, (spectrum_id, offset) in enumerate(entries, done + 1):
+                self._tick(done, total)
+
+                data = _read_spectrum_header(f, offset)
+                if data is None:
+                    continue        # spettro senza array binari
+                profile.add_bytes(len(data))
+                header = _parse_spectrum_header(data)
+                profile.lap("parse")
+                if header is None:
+                    header = self._full_header(reader.get_by_id(spectrum_id))
+                    profile.lap("parse (pyteomics)")
+                if header is None:
+                    continue
+
+                level, rt = header["level"], header["rt"]
+                if level not in (1, 2) or rt is None:
+                    continue
+
+                if level == 1 and chromatograms:
+                    if header["tic"] is None:
+                        spectrum = reader.get_by_id(spectrum_id)
+                        intensities = spectrum["intensity array"].decode()
+                        profile.lap("decode")
+                        self._append_chromatograms(rt, intensities)
+                    else:
+                        self._append_point(rt, header["tic"], header["bpc"])
+                    profile.lap("reduce")
+
+                builder.append_header(
+                    rt, level,
+                    header["precursor"] if level == 2 else None,
+                    header["count"],
+                    spectrum_id=spectrum_id,
+                    parent_id=header["parent_id"] if level == 2 else None
+                )
+                profile.lap("append")
+
+        self._tick(done, total, force=True)
+
+    def _lazy_store(self, file_path, headers):
+        """
+        LazySpectra dai metadati degli scan (headers() di un builder o
+        di un altro LazySpectra); con memory_budget cache LRU limitata
+        al budget e intensità float32.
+        """
+        budgeted = self.memory_budget is not None
+        return LazySpectra(
+            file_path, headers["ids"], headers["rt"], headers["level"],
+            headers["precursor"], parent_ids=headers["parent_ids"],
+            counts=headers["counts"],
+            cache_bytes=self.memory_budget if budgeted else 0,
+            intensity_dtype=np.float32 if budgeted else None
+        )
+
+    # ----------------------------------------------------------
+    # RUN LAZY TRA PROCESSI
+    # ----------------------------------------------------------
+    def lazy_headers(self):
+        """
+        Metadati di un run lazy (scan e TIC / BPC) come dict
+        serializzabile, per riaprirlo in un altro processo con
+        open_headers() senza rileggere il file. None se il run non è lazy.
+        """
+        if not isinstance(self.store, LazySpectra):
+            return None
+
+        headers = self.store.headers()
+        headers.update(
+            strategy=self.profile.strategy if self.profile else None,
+            tic_times=list(self.tic_times),
+            tic_values=list(self.tic_values),
+            bpc_times=list(self.bpc_times),
+            bpc_values=list(self.bpc_values),
+        )
+        return headers
+
+    def open_headers(self, file_path, headers):
+        """Riapre un run lazy dai metadati di lazy_headers()."""
+        self.reset()
+        self.file_path = file_path
+
+        profile = self.profile = LoadProfile(file_path, self.trace_memory)
+        profile.start()
+        profile.strategy = headers.get("strategy") or "lazy"
+        try:
+            self.tic_times = list(headers["tic_times"])
+            self.tic_values = list(headers["tic_values"])
+            self.bpc_times = list(headers["bpc_times"])
+            self.bpc_values = list(headers["bpc_values"])
+            self._attach_store(self._lazy_store(file_path, headers))
+        finally:
+            profile.count_spectra(len(self.store) if self.store is not None else 0)
+            profile.stop()
+
+    def _load_cached(self, file_path):
+        """
+        Riapre il run dalla cache su disco. True se riuscito.
+        Se i picchi in cache superano memory_budget il run viene aperto
+        lazy dai metadati in cache (senza rileggere il file).
+        """
+        if self.cache is None:
+            return False
+
+        with self.profile.phase("cache read"):
+            data = self.cache.load(file_path)
+        if data is None:
+            return False
+        self.profile.add_bytes(sum(arr.nbytes for arr in data.values()))
+
+        self.tic_times = data["tic_times"].tolist()
+        self.tic_values = data["tic_values"].tolist()
+        self.bpc_times = data["bpc_times"].tolist()
+        self.bpc_values = data["bpc_values"].tolist()
+
+        ids = data["ids"].tolist()
+        parent_ids = [i or None for i in data["parent_ids"].tolist()]
+
+        peak_bytes = data["mz"].nbytes + data["intensity"].nbytes
+        if self.memory_budget is not None and peak_bytes > self.memory_budget:
+            self._attach_store(self._lazy_store(file_path, {
+                "ids": ids,
+                "rt": np.array(data["rt"]),
+                "level": np.array(data["level"]),
+                "precursor": np.array(data["precursor"]),
+                "parent_ids": parent_ids,
+                "counts": np.diff(data["offsets"]),
+            }))
+            return True
+
+        self._attach_store(PackedSpectra(
+            data["rt"], data["level"], data["precursor"],
+            data["offsets"], data["mz"], data["intensity"],
+            ids=ids,
+            parent_ids=parent_ids
+        ))
+        return True
+
+    def _save_cache(self, file_path):
+        """Scrive il run appena letto nella cache su disco."""
+        if self.cache is None or not isinstance(self.store, PackedSpectra):
+            return
+
+        store = self.store
+        with self.profile.phase("cache write"):
+            self.cache.save(file_path, {
+                "rt": store.rt,
+                "level": store.level,
+                "precursor": store.precursor,
+                "offsets": store.offsets,
+                "mz": store.mz,
+                "intensity": store.intensity,
+                "ids": np.array([i or "" for i in store.ids], dtype=str),
+                "parent_ids": np.array([i or "" for i in store.parent_ids], dtype=str),
+                "tic_times": np.asarray(self.tic_times, dtype=np.float64),
+                "tic_values": np.asarray(self.tic_values, dtype=np.float64),
+                "bpc_times": np.asarray(self.bpc_times, dtype=np.float64),
+                "bpc_values": np.asarray(self.bpc_values, dtype=np.float64),
+            })
+
+    def _attach_store(self, store):
+        """Collega un archivio di scan e crea le viste MS1 / MS2."""
+        with self.profile.phase("index"):
+            self.store = store
+
+            levels = store.level
+            self.ms1_spectra = SpectrumView(store, np.flatnonzero(levels == 1))
+            self.ms2_spectra = SpectrumView(store, np.flatnonzero(levels == 2),
+                                            record="dict")
+
+            # Indice RT ordinato (una sola volta per run)
+            rts = self.ms1_spectra.rts
+            self.ms1_rt_order = np.argsort(rts, kind="stable")
+            self.ms1_rt_sorted = rts[self.ms1_rt_order]
+
+            self._build_ms2_links()
+
+            # Primo MS1 come default
+            if self.ms1_spectra:
+                _, self.ms1_mz, self.ms1_int = self.ms1_spectra[0]
+
+    def _build_ms2_links(self):
+        """
+        Per ogni MS2: indice MS1 del padre (spectrumRef, altrimenti
+        l'ultimo MS1 precedente nell'archivio), mappa inversa MS1 → MS2
+        in formato CSR e indice ordinato dei precursori m/z.
+        """
+        store = self.store
+        ms1_idx = self.ms1_spectra.indices
+        ms2_idx = self.ms2_spectra.indices
+
+        # Posizione MS1 dell'ultimo MS1 precedente (fallback)
+        parent = np.searchsorted(ms1_idx, ms2_idx, side="left") - 1
+
+        if store.parent_ids and store.ids:
+            ms1_pos = {store.ids[j]: p for p, j in enumerate(ms1_idx)}
+            for k, j in enumerate(ms2_idx):
+                ref = store.parent_ids[j]
+                if ref is not None and ref in ms1_pos:
+                    parent[k] = ms1_pos[ref]
+
+        self.ms2_parent = parent.astype(np.intp)
+
+        linked = np.flatnonzero(parent >= 0)
+        order = linked[np.argsort(parent[linked], kind="stable")]
+        counts = np.bincount(parent[linked], minlength=len(ms1_idx))
+        self.ms1_children = order
+        self.ms1_child_offsets = np.zeros(len(ms1_idx) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.ms1_child_offsets[1:])
+
+        precursors = store.precursor[ms2_idx]
+        self.precursor_order = np.argsort(precursors, kind="stable")
+        self.precursor_sorted = precursors[self.precursor_order]
+
+    # ----------------------------------------------------------
+    # AVANZAMENTO / ANNULLAMENTO
+    # ----------------------------------------------------------
+    def _check_cancel(self):
+        if self._cancel is not None and self._cancel.is_set():
+            raise LoadCancelled()
+
+    def _tick(self, done, total, force=False):
+        """
+        Controlla l'annullamento e, al massimo ogni PROGRESS_INTERVAL,
+        notifica i punti di TIC / BPC aggiunti dall'ultima chiamata.
+        """
+        self._check_cancel()
+        if self._progress is None:
+            return
+
+        now = time.perf_counter()
+        if not force and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+
+        k = self._reported
+        self._reported = len(self.tic_times)
+        self._progress(done, total, self.tic_times[k:],
+                       self.tic_values[k:], self.bpc_values[k:])
+
+    # ----------------------------------------------------------
+    # SUPPORTO PARSING
+    # ----------------------------------------------------------
+    def _append_chromatograms(self, rt, intensities):
+        """Accoda un punto a TIC e BPC calcolato dalle intensità."""
+        self._append_point(rt, float(np.sum(intensities)),
+                           float(np.max(intensities)))
+
+    def _append_header_chromatograms(self, spectrum, rt):
+        """Punto di TIC / BPC dai cvParam; se mancano, dalle intensità."""
+        tic, bpc = self._header_chromatograms(spectrum)
+        if tic is None:
+            self._append_chromatograms(rt, spectrum["intensity array"].decode())
+        else:
+            self._append_point(rt, tic, bpc)
+
+    def _extend_chromatograms(self, times, tic, bpc):
+        """Accoda i punti di TIC / BPC di un blocco."""
+        self.tic_times.extend(times)
+        self.tic_values.extend(tic)
+        self.bpc_times.extend(times)
+        self.bpc_values.extend(bpc)
+
+    def _sort_chromatograms(self):
+        """Riordina TIC / BPC per RT (stabile), come l'archivio unito."""
+        order = np.argsort(self.tic_times, kind="stable")
+        for name in ("tic_times", "tic_values", "bpc_times", "bpc_values"):
+            values = getattr(self, name)
+            setattr(self, name, [values[i] for i in order])
+
+    def _append_point(self, rt, tic, bpc):
+        """Accoda un punto a TIC e BPC."""
+        self.tic_times.append(rt)
+        self.tic_values.append(tic)
+
+        self.bpc_times.append(rt)
+        self.bpc_values.append(bpc)
+
+    @staticmethod
+    def _header_chromatograms(spectrum):
+        """
+        (TIC, BPC) dai cvParam dello spettro, oppure (None, None)
+        se non sono presenti entrambi.
+        """
+        tic = spectrum.get("total ion current")
+        bpc = spectrum.get("base peak intensity")
+        if tic is None or bpc is None:
+            return None, None
+        return float(tic), float(bpc)
+
+    @classmethod
+    def _full_header(cls, spectrum):
+        """
+        Header (come _parse_spectrum_header) da uno spettro letto da
+        pyteomics; None se mancano gli array binari.
+        """
+        if spectrum.get("m/z array") is None or \
+                spectrum.get("intensity array") is None:
+            return None
+
+        tic, bpc = cls._header_chromatograms(spectrum)
+        return {
+            "level": spectrum.get("ms level"),
+            "rt": cls._spectrum_rt(spectrum),
+            "tic": tic,
+            "bpc": bpc,
+            "count": spectrum.get("defaultArrayLength", 0),
+            "precursor": cls._spectrum_precursor(spectrum),
+            "parent_id": cls._spectrum_parent_ref(spectrum),
+        }
+
+    @staticmethod
+    def _spectrum_rt(spectrum):
+        """Scan start time del primo scan, oppure None."""
+        try:
+            return spectrum["scanList"]["scan"][0]["scan start time"]
+        except Exception:
+            return None
+
+    @staticmethod
+    def _spectrum_parent_ref(spectrum):
+        """spectrumRef (id dello scan padre) del primo precursore, oppure None."""
+        try:
+            return spectrum["precursorList"]["precursor"][0].get("spectrumRef")
+        except Exception:
+            return None
+
+    @staticmethod
+    def _spectrum_precursor(spectrum):
+        """m/z del primo ione selezionato, oppure None."""
+        try:
+            return spectrum["precursorList"]["precursor"][0][
+                "selectedIonList"
+            ]["selectedIon"][0]["selected ion m/z"]
+        except Exception:
+            return None
+
+    # ----------------------------------------------------------
+    # LETTURA IN STREAMING
+    # ----------------------------------------------------------
+    def iter_spectra(self, file_path=None, ms_level=None, rt_range=None,
+                     mz_range=None, min_intensity=None):
+        """
+        Generatore di spettri letti direttamente dal disco, uno alla volta
+        (memoria limitata a un singolo scan, indipendente da load()).
+
+        Filtri:
+        - ms_level: int o sequenza di livelli
+        - rt_range: (rt_min, rt_max) in minuti
+        - mz_range: (mz_min, mz_max)
+        - min_intensity: soglia sulle intensità
+
+        Livello e RT vengono valutati sull'header, prima di decodificare
+        gli array; il taglio m/z (viste, senza copia su array ordinati)
+        e la soglia di intensità prima di restituire lo spettro.
+
+        Ogni elemento è un dict { id, level, rt, precursor, mz, int }.
+        """
+        file_path = file_path or self.file_path
+        if file_path is None:
+            raise RuntimeError("Nessun file mzML specificato.")
+
+        if ms_level is not None:
+            ms_level = {ms_level} if np.isscalar(ms_level) else set(ms_level)
+
+        from pyteomics import mzml
+
+        with mzml.read(file_path, decode_binary=False) as reader:
+            for spectrum in reader:
+
+                level = spectrum.get("ms level")
+                if level is None or (ms_level is not None and level not in ms_level):
+                    continue
+
+                rt = self._spectrum_rt(spectrum)
+                if rt is None:
+                    continue
+                if rt_range is not None and not (rt_range[0] <= rt <= rt_range[1]):
+                    continue
+
+                mz = spectrum.get("m/z array")
+                intensities = spectrum.get("intensity array")
+                if mz is None or intensities is None:
+                    continue
+
+                mz = mz.decode()
+                intensities = intensities.decode()
+
+                if mz_range is not None:
+                    mz, intensities = self._crop_mz(mz, intensities, *mz_range)
+
+                if min_intensity is not None:
+                    keep = intensities >= min_intensity
+                    mz, intensities = mz[keep], intensities[keep]
+
+                yield {
+                    "id": spectrum.get("id"),
+                    "level": level,
+                    "rt": rt,
+                    "precursor": self._spectrum_precursor(spectrum) if level > 1 else None,
+                    "mz": mz,
+                    "int": intensities,
+                }
+
+    @staticmethod
+    def _crop_mz(mz, intensities, mz_min, mz_max):
+        """Taglio m/z: ricerca binaria se ordinato, altrimenti maschera."""
+        if len(mz) < 2 or np.all(mz[1:] >= mz[:-1]):
+            lo = np.searchsorted(mz, mz_min, side="left")
+            hi = np.searchsorted(mz, mz_max, side="right")
+            return mz[lo:hi], intensities[lo:hi]
+
+        keep = (mz >= mz_min) & (mz <= mz_max)
+        return mz[keep], intensities[keep]
+
+    # ----------------------------------------------------------
+    # CROMATOGRAMMI PRE-CALCOLATI
+    # ----------------------------------------------------------
+    @staticmethod
+    def read_chromatogram_list(file_path):
+        """
+        Legge TIC / BPC dalla <chromatogramList> di un file indicizzato,
+        senza toccare gli spettri (accesso diretto tramite offset).
+
+        Restituisce { "tic": (times, values), "bpc": (times, values) }
+        con le sole chiavi trovate; dict vuoto se non disponibili.
+        """
+        kinds = {
+            "total ion current chromatogram": "tic",
+            "basepeak chromatogram": "bpc",
+        }
+        out = {}
+
+        if not _has_index_list(file_path):
+            return out
+
+        from pyteomics import mzml
+
+        try:
+            with mzml.PreIndexedMzML(file_path) as reader:
+                try:
+                    chrom_ids = list(reader.index["chromatogram"].keys())
+                except KeyError:
+                    return out
+
+                for chrom_id in chrom_ids:
+                    chrom = reader.get_by_id(chrom_id,
+                                             element_type="chromatogram")
+                    for name, key in kinds.items():
+                        if name in chrom and key not in out:
+                            out[key] = (np.asarray(chrom["time array"]),
+                                        np.asarray(chrom["intensity array"]))
+                    if len(out) == len(kinds):
+                        break
+        except Exception:
+            return {}
+
+        return out
 
     # ----------------------------------------------------------
     # FUNZIONI UTILI PER ALTRI MODULI
@@ -136,10 +1050,166 @@ class MZMLLoader:
         if not self.ms1_spectra:
             return None
 
-        rts = np.array([t for t, _, _ in self.ms1_spectra])
-        idx = np.abs(rts - rt_query).argmin()
+        idx = self.get_closest_ms1_many([rt_query])[0]
         return self.ms1_spectra[idx]
 
+    def get_closest_ms1_many(self, rts):
+        """
+        Versione vettoriale: per ogni RT richiesto restituisce l'indice
+        (in ms1_spectra) dello scan MS1 più vicino. Ricerca binaria
+        sull'indice RT ordinato, O(k log n).
+        """
+        rts = np.atleast_1d(np.asarray(rts, dtype=np.float64))
+        sorted_rts = self.ms1_rt_sorted
+        if len(sorted_rts) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        right = np.clip(np.searchsorted(sorted_rts, rts), 0, len(sorted_rts) - 1)
+        left = np.maximum(right - 1, 0)
+
+        # A parità di distanza vince lo scan precedente
+        use_right = np.abs(sorted_rts[right] - rts) < np.abs(rts - sorted_rts[left])
+        pos = np.where(use_right, right, left)
+        return self.ms1_rt_order[pos]
+
+    def get_ms1_indices_in_range(self, rt_min: float, rt_max: float):
+        """
+        Indici (in ms1_spectra, ordinati per RT) degli scan MS1 con
+        rt_min <= RT <= rt_max. Utile per step tra scan e medie su finestra.
+        """
+        lo = np.searchsorted(self.ms1_rt_sorted, rt_min, side="left")
+        hi = np.searchsorted(self.ms1_rt_sorted, rt_max, side="right")
+        return self.ms1_rt_order[lo:hi]
+
+    def find_ms2_by_precursor(self, mz: float, ppm: float = 10.0):
+        """
+        Indici (in ms2_spectra) degli MS2 con precursore entro mz ± ppm,
+        ordinati per m/z del precursore. Ricerca binaria, O(log n).
+        """
+        tol = mz * ppm * 1e-6
+        lo = np.searchsorted(self.precursor_sorted, mz - tol, side="left")
+        hi = np.searchsorted(self.precursor_sorted, mz + tol, side="right")
+        return self.precursor_order[lo:hi]
+
+    def get_ms1_parent(self, ms2_index: int):
+        """Indice (in ms1_spectra) dello scan MS1 padre, oppure None."""
+        parent = int(self.ms2_parent[ms2_index])
+        return parent if parent >= 0 else None
+
+    def get_ms2_children(self, ms1_index: int):
+        """Indici (in ms2_spectra) degli MS2 figli di uno scan MS1."""
+        start = self.ms1_child_offsets[ms1_index]
+        stop = self.ms1_child_offsets[ms1_index + 1]
+        return self.ms1_children[start:stop]
+
+    def ms1_packed(self):
+        """
+        (PackedSpectra, indici degli scan MS1 ordinati per RT) per le
+        operazioni vettoriali sull'intero run. Con archivio lazy gli MS1
+        vengono decodificati una sola volta e conservati (intensità
+        float32 con memory_budget, senza passare dalla cache LRU).
+
+        Solleva MemoryBudgetExceeded se la copia non rientra nel budget.
+        Thread-safe: la copia viene costruita una sola volta.
+        """
+        if isinstance(self.store, PackedSpectra):
+            return self.store, self.ms1_spectra.indices[self.ms1_rt_order]
+
+        if self.store is None:
+            return None, np.empty(0, dtype=np.intp)
+
+        with self._derived_lock:
+            if self._ms1_packed is None:
+                scans = self.ms1_spectra.indices[self.ms1_rt_order]
+                budgeted = self.memory_budget is not None
+                n_peaks = int(self.store.counts[scans].sum())
+                self._check_budget(n_peaks * (8 + (4 if budgeted else 8)),
+                                   "Copia packed degli MS1")
+
+                builder = PackedSpectraBuilder(
+                    intensity_dtype=np.float32 if budgeted else None
+                )
+                for i in scans:
+                    mz, intensities = self.store.read(i)
+                    builder.append(self.store.rt[i], 1, None, mz, intensities)
+                self._ms1_packed = builder.build()
+            packed = self._ms1_packed
+
+        return packed, np.arange(len(packed), dtype=np.intp)
+
+    def get_spatial_index(self):
+        """
+        Indice RT × m/z sugli MS1 (RTMZIndex), costruito al primo uso.
+        Solleva MemoryBudgetExceeded se non rientra nel budget.
+        Thread-safe come ms1_packed().
+        """
+        with self._derived_lock:
+            if self._spatial_index is None:
+                if self.store is None:
+                    return None
+                scans = self.ms1_spectra.indices
+                self._check_budget(
+                    RTMZIndex.estimated_nbytes(np.asarray(self.store.counts)[scans].sum()),
+                    "Indice RT × m/z"
+                )
+                store, scans = self.ms1_packed()
+                self._spatial_index = RTMZIndex(store, scans)
+            return self._spatial_index
+
+    def _check_budget(self, nbytes, what):
+        """Solleva MemoryBudgetExceeded se nbytes in più supererebbero il budget."""
+        if self.memory_budget is None:
+            return
+        resident = self.memory_stats()["resident_bytes"]
+        if resident + nbytes > self.memory_budget:
+            mb = 1024 ** 2
+            raise MemoryBudgetExceeded(
+                f"{what}: servono circa {nbytes / mb:.1f} MiB; con "
+                f"{resident / mb:.1f} MiB già residenti si supera il budget "
+                f"di memoria ({self.memory_budget / mb:.1f} MiB)."
+            )
+
+    def _derived_nbytes(self):
+        """Memoria di MS1 packed e indice RT × m/z (se costruiti)."""
+        nbytes = 0
+        if self._ms1_packed is not None:
+            nbytes += self._ms1_packed.nbytes
+        if self._spatial_index is not None:
+            nbytes += self._spatial_index.nbytes
+        return nbytes
+
+    def memory_stats(self):
+        """
+        Statistiche di memoria per calibrare memory_budget:
+        modalità, byte residenti (archivio, cache LRU e strutture
+        derivate), stima totale, hit / miss / eviction LRU.
+        """
+        store = self.store
+        derived = self._derived_nbytes()
+        stats = {
+            "budget": self.memory_budget,
+            "mode": None,
+            "resident_bytes": derived,
+            "derived_bytes": derived,
+            "estimated_bytes": 0,
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+        if isinstance(store, PackedSpectra):
+            stats.update(mode="packed",
+                         resident_bytes=store.nbytes + derived,
+                         estimated_bytes=store.nbytes)
+        elif isinstance(store, LazySpectra):
+            stats.update(mode="lazy",
+                         resident_bytes=store.resident_bytes + derived,
+                         estimated_bytes=store.estimated_nbytes(),
+                         hits=store.hits,
+                         misses=store.misses,
+                         evictions=store.evictions)
+        return stats
+
     def has_data(self):
         """Usato dai moduli per verificare se il caricamento è avvenuto."""
         return bool(self.tic_times)
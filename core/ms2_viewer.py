@@ -7,10 +7,10 @@ Python 3.12
 """
 
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
 
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from core.decimation import plot_sticks, set_stick_data
+from utils.helpers import format_mz
 
 
 class MS2Viewer:
@@ -22,26 +22,50 @@ class MS2Viewer:
     - precursor
     - mz[]
     - int[]
+
+    Dal loader arrivano anche il filtro per precursore (indice ordinato)
+    e il salto allo scan MS1 padre. La finestra mostra sempre il loader
+    corrente (get_loader): se nel frattempo è stato caricato o chiuso
+    un run, viene ricostruita (o chiusa) invece di leggere dal vecchio.
     """
 
     def __init__(self):
         self.window = None
+        self.root = None
+        self.ms2_list = []
+        self.loader = None
+        self.get_loader = None
+        self.on_show_ms1 = None
+        self._rows = []            # riga listbox → indice in ms2_list
+        self._sticks = None        # LineCollection dello spettro (riusata)
 
     # ==========================================================
     # APERTURA VIEWER
     # ==========================================================
-    def open(self, root, ms2_list):
+    def open(self, root, get_loader, on_show_ms1=None):
         """
         Apre la finestra MS2 viewer.
-        ms2_list = lista di spettri MS2 caricati dal loader
+        get_loader: callable che restituisce il loader corrente
+        on_show_ms1(ms1_index) = callback per mostrare lo scan MS1 padre
         """
+        loader = get_loader()
+        ms2_list = loader.ms2_spectra
         if not ms2_list:
             return
 
-        # Se già aperta → focus
-        if self.window and tk.Toplevel.winfo_exists(self.window):
-            self.window.lift()
-            return
+        # Se già aperta sullo stesso run → focus
+        if self.is_open():
+            if loader is self.loader and ms2_list is self.ms2_list:
+                self.window.lift()
+                return
+            self.window.destroy()
+
+        self.root = root
+        self.ms2_list = ms2_list
+        self.loader = loader
+        self.get_loader = get_loader
+        self.on_show_ms1 = on_show_ms1
+        self._sticks = None
 
         self.window = tk.Toplevel(root)
         self.window.title("MS2 – Visualizzatore Interattivo")
@@ -51,6 +75,27 @@ class MS2Viewer:
         # UI setup
         self._build_ui(ms2_list)
 
+    def is_open(self):
+        return bool(self.window) and bool(tk.Toplevel.winfo_exists(self.window))
+
+    def _stale(self):
+        """True se la finestra mostra un run non più attivo."""
+        loader = self.get_loader()
+        return loader is not self.loader or loader.ms2_spectra is not self.ms2_list
+
+    def sync(self):
+        """
+        Da chiamare quando cambia il run attivo: ricostruisce la finestra
+        sul loader corrente, oppure la chiude se il run non ha MS2.
+        Restituisce True se la finestra è stata toccata.
+        """
+        if not self.is_open() or not self._stale():
+            return False
+        self.window.destroy()
+        self.window = None
+        self.open(self.root, self.get_loader, on_show_ms1=self.on_show_ms1)
+        return True
+
     # ==========================================================
     # UI
     # ==========================================================
@@ -68,6 +113,14 @@ class MS2Viewer:
         )
         lbl.pack(anchor="w", pady=(0, 5))
 
+        self._build_precursor_filter(frame_left)
+
+        ttk.Button(
+            frame_left,
+            text="Mostra MS1 padre",
+            command=self._show_parent
+        ).pack(side="bottom", fill="x", pady=(6, 0))
+
         scrollbar = tk.Scrollbar(frame_left)
         scrollbar.pack(side="right", fill="y")
 
@@ -82,15 +135,12 @@ class MS2Viewer:
         scrollbar.config(command=self.listbox.yview)
 
         # Popola lista
-        for i, spec in enumerate(ms2_list):
-            rt = spec["rt"]
-            prec = spec["precursor"]
-            self.listbox.insert(
-                tk.END,
-                f"Scan {i+1} • RT={rt:.2f} min • Prec={prec:.4f}"
-            )
+        self._fill_list(range(len(ms2_list)))
 
         # ---------------- RIGHT PLOT ----------------
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
         frame_plot = tk.Frame(self.window, bg="#f3f3f5")
         frame_plot.pack(side="right", fill="both", expand=True, padx=10, pady=10)
 
@@ -104,15 +154,88 @@ class MS2Viewer:
         self.listbox.bind("<<ListboxSelect>>",
                           lambda e: self._on_selection(ms2_list))
 
+    def _build_precursor_filter(self, parent):
+        """Riga m/z ± ppm per filtrare gli MS2 per precursore."""
+        row = tk.Frame(parent, bg="#e1e2e5")
+        row.pack(fill="x", pady=(0, 6))
+
+        self.prec_var = tk.StringVar()
+        self.ppm_var = tk.StringVar(value="10")
+
+        tk.Label(row, text="Prec m/z", bg="#e1e2e5").pack(side="left")
+        ttk.Entry(row, width=10, textvariable=self.prec_var).pack(side="left", padx=3)
+        tk.Label(row, text="± ppm", bg="#e1e2e5").pack(side="left")
+        ttk.Entry(row, width=5, textvariable=self.ppm_var).pack(side="left", padx=3)
+
+        ttk.Button(row, text="Filtra", width=6,
+                   command=self._apply_filter).pack(side="left", padx=2)
+        ttk.Button(row, text="Tutti", width=6,
+                   command=lambda: self._fill_list(range(len(self.ms2_list)))
+                   ).pack(side="left")
+
+    def _fill_list(self, indices):
+        """Popola la listbox con gli MS2 indicati (indici in ms2_list)."""
+        self._rows = [int(i) for i in indices]
+        self.listbox.delete(0, tk.END)
+
+        for i in self._rows:
+            spec = self.ms2_list[i]
+            self.listbox.insert(
+                tk.END,
+                f"Scan {i+1} • RT={spec['rt']:.2f} min • "
+                f"Prec={format_mz(spec['precursor'])}"
+            )
+
+    def _apply_filter(self):
+        if self.sync():
+            return
+        try:
+            mz = float(self.prec_var.get())
+            ppm = float(self.ppm_var.get())
+        except ValueError:
+            messagebox.showwarning("Valore non valido",
+                                   "Precursore e ppm devono essere numerici.",
+                                   parent=self.window)
+            return
+        self._fill_list(self.loader.find_ms2_by_precursor(mz, ppm))
+
+    def select(self, indices):
+        """
+        Mostra solo gli MS2 indicati (es. figli di uno scan MS1)
+        e seleziona il primo.
+        """
+        if not self.is_open() or self.sync():
+            return
+        self._fill_list(indices)
+        if self._rows:
+            self.listbox.selection_set(0)
+            self._on_selection(self.ms2_list)
+
+    def _show_parent(self):
+        if self.sync():
+            return
+        sel = self.listbox.curselection()
+        if not sel or self.on_show_ms1 is None:
+            return
+
+        parent = self.loader.get_ms1_parent(self._rows[sel[0]])
+        if parent is None:
+            messagebox.showinfo("MS1 padre", "Scan MS1 padre non disponibile.",
+                                parent=self.window)
+            return
+        self.on_show_ms1(parent)
+
     # ==========================================================
     # PLOT MS2
     # ==========================================================
     def _on_selection(self, ms2_list):
+        if self.sync():
+            return
         sel = self.listbox.curselection()
         if not sel:
             return
 
-        idx = sel[0]
+        idx = self._rows[sel[0]]
         spec = ms2_list[idx]
 
         mz = spec["mz"]
@@ -126,29 +249,21 @@ class MS2Viewer:
         """
         Disegna spettro MS2 singolo.
         """
-        self.ax.clear()
-
-        markerline, stemlines, baseline = self.ax.stem(
-            mz, intens,
-            basefmt=" ",
-            markerfmt=" ",
-            linefmt="#2b579a"
-        )
-
-        try:
-            for s in stemlines:
-                s.set_linewidth(1.3)
-        except Exception:
-            stemlines.set_linewidth(1.3)
+        if self._sticks is None or self._sticks.axes is not self.ax:
+            self.ax.clear()
+            self._sticks = plot_sticks(self.ax, mz, intens,
+                                       colors="#2b579a", linewidths=1.3)
+            self.ax.set_xlabel("m/z")
+            self.ax.set_ylabel("Intensità")
+            self.ax.grid(True, alpha=0.25)
+        else:
+            set_stick_data(self._sticks, mz, intens)
 
         self.ax.set_title(
-            f"Spettro MS2\nPrec={precursor:.4f} m/z • RT={rt:.2f} min",
+            f"Spettro MS2\nPrec={format_mz(precursor)} m/z • RT={rt:.2f} min",
             pad=10,
             fontsize=11
         )
-        self.ax.set_xlabel("m/z")
-        self.ax.set_ylabel("Intensità")
-        self.ax.grid(True, alpha=0.25)
 
         # Autoscale
         if len(intens) > 0:
@@ -0,0 +1,154 @@
+"""
+core/overlay.py
+Overlay in blitting (rettangolo di zoom, crosshair con lettura) – LC–MS Viewer
+Versione riscritta 2026 – Python 3.12
+"""
+
+
+class BlitOverlay:
+    """
+    Disegna sopra la figura gli artisti che cambiano a ogni movimento
+    del mouse senza ridisegnare i dati:
+    - rettangolo di zoom (ZoomController)
+    - crosshair con lettura delle coordinate
+
+    Gli artisti sono `animated`: il draw normale li salta. A ogni draw
+    completo (draw_event) viene salvato lo sfondo del canvas; update()
+    ripristina lo sfondo, disegna solo gli overlay e fa blit.
+    Accetta un canvas o una lista di canvas (un pannello per canvas):
+    update() tocca solo i canvas in cui un overlay è cambiato.
+    Se l'asse viene pulito (ax.clear) gli artisti vengono ricreati al
+    primo uso.
+    """
+
+    def __init__(self, canvases):
+        if not isinstance(canvases, (list, tuple)):
+            canvases = [canvases]
+        self.canvases = list(canvases)
+        self.backgrounds = {}      # canvas → sfondo salvato
+        self._dirty = set()        # canvas da aggiornare al prossimo update()
+
+        self.rect = None
+        self.cross = None          # (vline, hline, testo)
+
+        for canvas in self.canvases:
+            canvas.mpl_connect("draw_event", self._on_draw)
+
+    # ==========================================================
+    # BLITTING
+    # ==========================================================
+    def _on_draw(self, event):
+        """Nuovo sfondo dopo ogni draw completo (dati, limiti, resize)."""
+        canvas = event.canvas
+        self.backgrounds[canvas] = canvas.copy_from_bbox(canvas.figure.bbox)
+        self._draw_artists(canvas)
+
+    def _artists(self, canvas):
+        items = [self.rect] + list(self.cross or ())
+        return [a for a in items
+                if a is not None and a.axes is not None and a.get_visible()
+                and a.figure.canvas is canvas]
+
+    def _draw_artists(self, canvas):
+        for artist in self._artists(canvas):
+            canvas.figure.draw_artist(artist)
+
+    def update(self):
+        """Ridisegna solo gli overlay (sullo sfondo salvato) dei canvas cambiati."""
+        dirty, self._dirty = self._dirty, set()
+        for canvas in dirty:
+            background = self.backgrounds.get(canvas)
+            if background is None:
+                canvas.draw_idle()
+                continue
+            canvas.restore_region(background)
+            self._draw_artists(canvas)
+            canvas.blit(canvas.figure.bbox)
+
+    def _touch(self, artist):
+        """Segna da aggiornare il canvas dell'artista."""
+        if artist is not None and artist.axes is not None:
+            self._dirty.add(artist.figure.canvas)
+
+    # ==========================================================
+    # RETTANGOLO DI ZOOM
+    # ==========================================================
+    def show_rect(self, ax, x0, x1):
+        """Rettangolo tra x0 e x1 per tutta l'altezza dell'asse."""
+        if self.rect is None or self.rect.axes is not ax:
+            from matplotlib.patches import Rectangle
+
+            self._remove(self.rect)
+            # Y in coordinate dell'asse; add_artist non tocca i dataLim
+            self.rect = Rectangle((0, 0), 0, 1,
+                                  transform=ax.get_xaxis_transform(),
+                                  fill=False,
+                                  edgecolor="red",
+                                  linestyle="--",
+                                  linewidth=1.3,
+                                  alpha=0.8,
+                                  animated=True)
+            ax.add_artist(self.rect)
+
+        xmin, xmax = sorted([x0, x1])
+        self.rect.set_x(xmin)
+        self.rect.set_width(xmax - xmin)
+        self.rect.set_visible(True)
+        self._touch(self.rect)
+
+    def hide_rect(self):
+        if self.rect is not None and self.rect.get_visible():
+            self.rect.set_visible(False)
+            self._touch(self.rect)
+
+    # ==========================================================
+    # CROSSHAIR
+    # ==========================================================
+    def show_crosshair(self, ax, x, y, text):
+        """Linee verticale / orizzontale in (x, y) e lettura in alto a sinistra."""
+        if self.cross is None or self.cross[0].axes is not ax:
+            from matplotlib.lines import Line2D
+
+            for artist in self.cross or ():
+                self._remove(artist)
+
+            style = {"color": "#605e5c", "linewidth": 0.8,
+                     "linestyle": ":", "animated": True}
+            vline = Line2D([0, 0], [0, 1], transform=ax.get_xaxis_transform(),
+                           **style)
+            hline = Line2D([0, 1], [0, 0], transform=ax.get_yaxis_transform(),
+                           **style)
+            ax.add_artist(vline)
+            ax.add_artist(hline)
+
+            label = ax.text(0.01, 0.97, "", transform=ax.transAxes,
+                            ha="left", va="top", fontsize=8, animated=True,
+                            bbox={"boxstyle": "round,pad=0.25", "fc": "white",
+                                  "ec": "#c8c6c4", "alpha": 0.9})
+            self.cross = (vline, hline, label)
+
+        vline, hline, label = self.cross
+        vline.set_xdata([x, x])
+        hline.set_ydata([y, y])
+        label.set_text(text)
+        for artist in self.cross:
+            artist.set_visible(True)
+        self._touch(vline)
+
+    def hide_crosshair(self):
+        if self.cross is not None and self.cross[0].get_visible():
+            for artist in self.cross:
+                artist.set_visible(False)
+            self._touch(self.cross[0])
+
+    # ==========================================================
+    # UTILITY
+    # ==========================================================
+    def _remove(self, artist):
+        """Toglie l'artista dal suo asse (il canvas va aggiornato)."""
+        if artist is not None and artist.axes is not None:
+            self._touch(artist)
+            try:
+                artist.remove()
+            except Exception:
+                pass
@@ -6,10 +6,9 @@ Peak picking moderno e modulare per LC–MS Viewer (rewrite 2026)
 Python 3.12
 """
 
-import tkinter as tk
-from tkinter import ttk, messagebox
 import numpy as np
-from scipy.signal import find_peaks
+
+from core.decimation import axis_data
 
 
 class PeakPickingCore:
@@ -20,12 +19,18 @@ class PeakPickingCore:
     - MS1
 
     Delegando il disegno delle T-bars e delle etichette al PlotManager.
+
+    tkinter viene importato solo dai metodi delle finestre: detect_peaks
+    è usato anche dal batch headless (core.batch).
     """
 
     def __init__(self):
         # Parametri default
         self.default_percent_threshold = 5.0
 
+        # Ultimo risultato (per l'esportazione dati)
+        self.last_result = None
+
     # ==========================================================
     # FINESTRA PARAMETRI PEAK PICKING
     # ==========================================================
@@ -33,6 +38,9 @@ class PeakPickingCore:
         """
         Crea una piccola finestra per impostare la soglia %.
         """
+        import tkinter as tk
+        from tkinter import ttk
+
         win = tk.Toplevel(root)
         win.title("Peak Picking Automatico")
         win.geometry("330x140")
@@ -62,6 +70,8 @@ class PeakPickingCore:
         """
         Avvia effettivamente il peak picking sull’asse corrente.
         """
+        from tkinter import messagebox
+
         try:
             percent = float(percent_var.get())
         except ValueError:
@@ -70,17 +80,16 @@ class PeakPickingCore:
             return
 
         ax = figure.gca()
-        lines = ax.get_lines()
-        if not lines:
+        data = axis_data(ax)
+        if data is None:
             messagebox.showwarning(
                 "Nessuna curva",
                 "Non c’è alcun grafico visibile."
             )
             return
 
-        # Dati dell’asse corrente
-        x = np.array(lines[0].get_xdata())
-        y = np.array(lines[0].get_ydata())
+        # Dati dell’asse corrente (completi, non la versione decimata)
+        x, y = data
 
         peaks, threshold = self._detect_peaks(y, percent)
 
@@ -88,8 +97,15 @@ class PeakPickingCore:
             messagebox.showinfo("Peak Picking", "Nessun picco trovato.")
             return
 
-        # Rimuovi eventuali etichette precedenti
         ax_key = self._axis_key(ax, figure)
+        self.last_result = {
+            "panel": ax_key,
+            "x": x[peaks],
+            "y": y[peaks],
+            "threshold": threshold,
+        }
+
+        # Rimuovi eventuali etichette precedenti
         plotman = root.app.plotting if hasattr(root, "app") else None
         if plotman:
             plotman.clear_peak_labels(ax_key, ax)
@@ -106,6 +122,19 @@ class PeakPickingCore:
     # ==========================================================
     # RICONOSCIMENTO PICCHI
     # ==========================================================
+    def detect_peaks(self, x, y, percent=None):
+        """
+        Uso senza GUI (batch, export): stessi criteri della finestra.
+        Restituisce (x_picchi, y_picchi, soglia).
+        """
+        if percent is None:
+            percent = self.default_percent_threshold
+
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        peaks, threshold = self._detect_peaks(y, percent)
+        return x[peaks], y[peaks], threshold
+
     def _detect_peaks(self, y, percent):
         """
         Riconosce picchi usando find_peaks con:
@@ -116,6 +145,9 @@ class PeakPickingCore:
         if len(y) < 5:
             return np.array([], dtype=int), 0
 
+        # scipy viene importato solo al primo peak picking (avvio rapido)
+        from scipy.signal import find_peaks
+
         max_y = float(np.max(y))
         threshold = max_y * (percent / 100.0)
 
@@ -175,6 +207,8 @@ class PeakPickingCore:
         """
         Mostra finestra con risultato del peak picking.
         """
+        import tkinter as tk
+
         win = tk.Toplevel(root)
         win.title("Picchi rilevati")
         win.geometry("360x320")
@@ -212,7 +246,11 @@ class PeakPickingCore:
         Restituisce quale asse è stato analizzato:
         'tic', 'bpc', 'ms1'
         Serve al PlotManager per sapere dove memorizzare le label.
+        Con un canvas per pannello l'asse porta il nome come label.
         """
+        if ax.get_label() in ("tic", "bpc", "ms1"):
+            return ax.get_label()
+
         axes = figure.get_axes()
         if ax is axes[0]:
             return "tic"
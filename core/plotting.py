@@ -7,7 +7,10 @@ Versione riscritta 2026 – Python 3.12
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
+
+from core.decimation import (
+    plot_decimated, plot_sticks, set_decimated_data, set_stick_data
+)
 
 
 class PlotManager:
@@ -26,6 +29,15 @@ class PlotManager:
         self.style_bpc = {"color": "#107c10", "linewidth": 1.7}
         self.style_ms1 = {"color": "#000000", "linewidth": 1.2}
 
+        # Spettro MS1 mostrato: (rt | None, mz, intensità)
+        self.current_ms1 = None
+
+        # Artisti persistenti: i plot successivi sullo stesso pannello
+        # aggiornano i dati (set_data / set_segments) invece di ricreare
+        # l'asse con ax.clear(). ax → {"kind": ..., "artists": {...}}
+        self.persistent = True
+        self._panels = {}
+
         # Etichette picchi (registrate dal PeakPickingCore)
         self.peak_labels = {
             "tic": [],
@@ -53,39 +65,124 @@ class PlotManager:
         """
         Disegna TIC con stile moderno.
         """
+        self.plot_tic_data(ax, loader.tic_times, loader.tic_values)
+
+    def plot_tic_data(self, ax, times, values):
+        """
+        Disegna TIC da array espliciti (es. anteprima durante il caricamento).
+        """
+        self._plot_chromatogram(ax, "tic", times, values, self.style_tic,
+                                "Total Ion Chromatogram (TIC)")
+
+    # ==========================================================
+    # BPC
+    # ==========================================================
+    def plot_bpc(self, ax, loader):
+        """
+        Disegna BPC con stile moderno.
+        """
+        self.plot_bpc_data(ax, loader.bpc_times, loader.bpc_values)
+
+    def plot_bpc_data(self, ax, times, values):
+        """
+        Disegna BPC da array espliciti (es. anteprima durante il caricamento).
+        """
+        self._plot_chromatogram(ax, "bpc", times, values, self.style_bpc,
+                                "Base Peak Chromatogram (BPC)")
+
+    def _plot_chromatogram(self, ax, kind, times, values, style, title):
+        artists = self._panel(ax, kind)
+
+        if artists is None:
+            ax.clear()
+            line = plot_decimated(
+                ax,
+                times,
+                values,
+                color=style["color"],
+                linewidth=style["linewidth"]
+            )
+
+            ax.set_title(title, pad=10)
+            ax.set_xlabel("Tempo (min)")
+            ax.set_ylabel("Intensità")
+            ax.grid(True, alpha=0.25)
+            self._keep_panel(ax, kind, line=line)
+            return
+
+        line = artists["line"]
+        self._drop_extras(ax, artists.values())
+        set_decimated_data(line, times, values)
+        line.set_color(style["color"])
+        line.set_linewidth(style["linewidth"])
+        ax.set_title(title, pad=10)
+
+        ax.set_autoscale_on(True)
+        ax.relim()
+        ax.autoscale_view()
+
+    # ==========================================================
+    # SESSIONE MULTI-RUN
+    # ==========================================================
+    def plot_session_tic(self, ax, session):
+        """
+        Sovrappone i TIC di tutti i run della sessione (un colore per run).
+        """
+        self._plot_runs(ax, session, "tic_times", "tic_values",
+                        self.style_tic, "Total Ion Chromatogram (TIC)")
+
+    def plot_session_bpc(self, ax, session):
+        """
+        Sovrappone i BPC di tutti i run della sessione (un colore per run).
+        """
+        self._plot_runs(ax, session, "bpc_times", "bpc_values",
+                        self.style_bpc, "Base Peak Chromatogram (BPC)")
+
+    def _plot_runs(self, ax, session, times_attr, values_attr, style, title):
         ax.clear()
-        ax.plot(
-            loader.tic_times,
-            loader.tic_values,
-            color=self.style_tic["color"],
-            linewidth=self.style_tic["linewidth"]
-        )
 
-        ax.set_title("Total Ion Chromatogram (TIC)", pad=10)
+        # Il primo run mantiene il colore dello stile, gli altri il ciclo
+        # di default di matplotlib
+        for i, (run, name) in enumerate(zip(session.runs, session.names())):
+            plot_decimated(
+                ax,
+                getattr(run, times_attr),
+                getattr(run, values_attr),
+                color=style["color"] if i == 0 else None,
+                linewidth=style["linewidth"],
+                label=name
+            )
+
+        ax.set_title(f"{title} • {len(session)} run", pad=10)
         ax.set_xlabel("Tempo (min)")
         ax.set_ylabel("Intensità")
         ax.grid(True, alpha=0.25)
+        ax.legend(fontsize=8, loc="upper right")
 
     # ==========================================================
-    # BPC
+    # XIC
     # ==========================================================
-    def plot_bpc(self, ax, loader):
+    def plot_xic(self, ax, result, max_legend=10):
         """
-        Disegna BPC con stile moderno.
+        Disegna gli XIC (risultato di XICExtractor.extract) su un pannello
+        cromatografico. Legenda solo per pochi target.
         """
         ax.clear()
-        ax.plot(
-            loader.bpc_times,
-            loader.bpc_values,
-            color=self.style_bpc["color"],
-            linewidth=self.style_bpc["linewidth"]
-        )
 
-        ax.set_title("Base Peak Chromatogram (BPC)", pad=10)
+        times = result["times"]
+        for mz, trace in zip(result["targets"], result["xic"]):
+            plot_decimated(ax, times, trace, linewidth=1.2, label=f"{mz:.4f}")
+
+        n = len(result["targets"])
+        ax.set_title(f"Extracted Ion Chromatogram (XIC) • {n} target • "
+                     f"±{result['ppm']:g} ppm", pad=10)
         ax.set_xlabel("Tempo (min)")
         ax.set_ylabel("Intensità")
         ax.grid(True, alpha=0.25)
 
+        if 0 < n <= max_legend:
+            ax.legend(fontsize=8, loc="upper right")
+
     # ==========================================================
     # MS1
     # ==========================================================
@@ -95,38 +192,74 @@ class PlotManager:
         Se vengono passati mz e intensities → spettro specifico (es. dal click).
         Se no → usa il primo MS1 del loader.
         """
-        ax.clear()
-
         if mz is None:
             if loader.ms1_mz is None:
+                ax.clear()
                 return
             mz = loader.ms1_mz
             intensities = loader.ms1_int
-            ax.set_title("Spettro MS1 (primo scan)", pad=10)
+            title = "Spettro MS1 (primo scan)"
         else:
-            ax.set_title(f"MS1 @ RT = {rt:.2f} min", pad=10)
+            title = f"MS1 @ RT = {rt:.2f} min"
 
-        markerline, stemlines, baseline = ax.stem(
-            mz, intensities,
-            basefmt=" ",
-            markerfmt=" ",
-            linefmt=self.style_ms1["color"]
-        )
+        self.current_ms1 = (rt, mz, intensities)
+        artists = self._panel(ax, "ms1")
 
-        # Uniform stem linewidth
-        try:
-            for s in stemlines:
-                s.set_linewidth(self.style_ms1["linewidth"])
-        except Exception:
-            stemlines.set_linewidth(self.style_ms1["linewidth"])
+        if artists is None:
+            ax.clear()
+            ax.set_title(title, pad=10)
 
-        ax.set_xlabel("m/z")
-        ax.set_ylabel("Intensità")
-        ax.grid(True, alpha=0.25)
+            sticks = plot_sticks(
+                ax, mz, intensities,
+                colors=self.style_ms1["color"],
+                linewidths=self.style_ms1["linewidth"]
+            )
+
+            ax.set_xlabel("m/z")
+            ax.set_ylabel("Intensità")
+            ax.grid(True, alpha=0.25)
+            self._keep_panel(ax, "ms1", sticks=sticks)
+        else:
+            self._drop_extras(ax, artists.values())
+            ax.set_title(title, pad=10)
+            set_stick_data(artists["sticks"], mz, intensities)
 
         # Autoscale margins
-        ymax = float(np.max(intensities))
-        ax.set_ylim(0, ymax * 1.25)
+        if len(intensities) > 0:
+            ymax = float(np.max(intensities))
+            ax.set_ylim(0, ymax * 1.25)
+
+    # ==========================================================
+    # ARTISTI PERSISTENTI
+    # ==========================================================
+    def _panel(self, ax, kind):
+        """
+        Artisti riusabili del pannello, oppure None se è il primo disegno,
+        se il pannello mostra altro (XIC, sessione) o se l'asse è stato
+        pulito nel frattempo.
+        """
+        panel = self._panels.get(ax)
+        if not self.persistent or panel is None or panel["kind"] != kind:
+            return None
+        if any(a.axes is not ax for a in panel["artists"].values()):
+            return None
+        return panel["artists"]
+
+    def _keep_panel(self, ax, kind, **artists):
+        self._panels[ax] = {"kind": kind, "artists": artists}
+
+    def _drop_extras(self, ax, keep):
+        """
+        Rimuove ciò che ax.clear() avrebbe tolto oltre ai dati del
+        pannello: T-bars ed etichette dei picchi, legenda, rettangolo di zoom.
+        """
+        keep = set(keep)
+        for artist in [*ax.lines, *ax.collections, *ax.texts, *ax.patches]:
+            if artist not in keep:
+                artist.remove()
+        legend = ax.get_legend()
+        if legend is not None:
+            legend.remove()
 
     # ==========================================================
     # STYLE UPDATE (usato da Style Editor)
@@ -143,7 +276,7 @@ class PlotManager:
         }
 
         if spectrum not in mapping:
-            return
+            return set()
 
         style = mapping[spectrum]
 
@@ -152,6 +285,31 @@ class PlotManager:
         if linewidth is not None:
             style["linewidth"] = linewidth
 
+        return self.apply_style(spectrum)
+
+    def apply_style(self, spectrum):
+        """
+        Porta lo stile corrente sugli artisti già disegnati del pannello
+        (linea TIC/BPC o stick MS1), senza rifare il plot dei dati.
+        Restituisce l'insieme dei canvas da ridisegnare (vuoto se nulla
+        è cambiato a schermo).
+        """
+        style = {
+            "tic": self.style_tic,
+            "bpc": self.style_bpc,
+            "ms1": self.style_ms1
+        }[spectrum]
+
+        canvases = set()
+        for ax, panel in self._panels.items():
+            if panel["kind"] != spectrum or self._panel(ax, spectrum) is None:
+                continue
+            for artist in panel["artists"].values():
+                artist.set_color(style["color"])
+                artist.set_linewidth(style["linewidth"])
+            canvases.add(ax.figure.canvas)
+        return canvases
+
     # ==========================================================
     # PEAK LABEL MANAGEMENT
     # gestiti in modo collaborativo con PeakPickingCore
@@ -186,6 +344,72 @@ class PlotManager:
         )
         self.peak_labels[ax_key].append(lbl)
 
+    # ==========================================================
+    # ESPORTAZIONE
+    # ==========================================================
+    def combined_figure(self, axes, figsize=(14, 10)):
+        """
+        Figura unica con i pannelli indicati uno sotto l'altro (come nel
+        layout "single"), per esportare in un solo file i pannelli della
+        modalità "split". Tracce, spettri, T-bars ed etichette sono copiati
+        con i dati mostrati (già decimati per la larghezza del pannello);
+        titoli, assi, griglia, limiti e legenda come a schermo.
+        Rettangolo di zoom e crosshair non vengono esportati.
+        """
+        from matplotlib.figure import Figure
+
+        figure = Figure(figsize=figsize, dpi=100, layout="constrained")
+        for i, src in enumerate(axes, start=1):
+            self._copy_axes(src, figure.add_subplot(len(axes), 1, i))
+        return figure
+
+    @staticmethod
+    def _copy_axes(src, ax):
+        from matplotlib.collections import LineCollection
+
+        for line in src.lines:
+            if line.get_animated() or not line.get_visible():
+                continue
+            ax.plot(*line.get_data(),
+                    color=line.get_color(),
+                    linewidth=line.get_linewidth(),
+                    linestyle=line.get_linestyle(),
+                    alpha=line.get_alpha(),
+                    label=line.get_label(),
+                    zorder=line.get_zorder())
+
+        for coll in src.collections:
+            if coll.get_animated() or not coll.get_visible():
+                continue
+            if isinstance(coll, LineCollection):
+                ax.add_collection(LineCollection(
+                    coll.get_segments(),
+                    colors=coll.get_colors(),
+                    linewidths=coll.get_linewidths(),
+                    linestyles=coll.get_linestyles(),
+                    alpha=coll.get_alpha(),
+                    zorder=coll.get_zorder()
+                ), autolim=False)
+
+        for text in src.texts:
+            if text.get_animated() or not text.get_visible():
+                continue
+            ax.text(*text.get_position(), text.get_text(),
+                    ha=text.get_ha(),
+                    va=text.get_va(),
+                    fontsize=text.get_fontsize(),
+                    color=text.get_color())
+
+        ax.set_title(src.get_title(), pad=10)
+        ax.set_xlabel(src.get_xlabel())
+        ax.set_ylabel(src.get_ylabel())
+        if any(g.get_visible() for g in src.get_xgridlines()):
+            ax.grid(True, alpha=0.25)
+        ax.set_xlim(src.get_xlim())
+        ax.set_ylim(src.get_ylim())
+        if src.get_legend() is not None:
+            ax.legend(fontsize=8, loc="upper right")
+
     # ==========================================================
     # SUPPORTO UTILITY
     # ==========================================================
@@ -0,0 +1,181 @@
+"""
+core/profiling.py
+Strumentazione del caricamento: timer per fase, byte letti, memoria
+Versione riscritta 2026 – Python 3.12
+"""
+
+import json
+import os
+import time
+import tracemalloc
+
+
+class LoadProfile:
+    """
+    Profilo di un singolo MZMLLoader.load.
+
+    - phase(name): context manager che somma il tempo alla fase
+    - lap(name):   somma il tempo trascorso dall'ultimo lap (loop caldi,
+                   senza un context manager per spettro)
+    - add_bytes / count_spectra: contatori
+    - trace_memory=True → picco di memoria Python/NumPy con tracemalloc
+      (rallenta il caricamento; i processi worker non sono inclusi)
+
+    report() restituisce un dict serializzabile in JSON, da allegare
+    ai ticket di performance.
+    """
+
+    def __init__(self, file_path=None, trace_memory=False):
+        self.file_path = file_path
+        self.trace_memory = trace_memory
+
+        self.phases = {}           # nome → secondi (ordine di prima comparsa)
+        self.bytes_read = 0
+        self.spectra = 0
+        self.strategy = None       # cache | eager | parallel | lazy | budgeted
+        self.memory_peak = None
+
+        self._started = None
+        self._total = None
+        self._mark = None
+        self._own_tracing = False
+
+    # ==========================================================
+    # AVVIO / STOP
+    # ==========================================================
+    def start(self):
+        if self.trace_memory:
+            self._own_tracing = not tracemalloc.is_tracing()
+            if self._own_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        self._started = time.perf_counter()
+        self._mark = self._started
+
+    def stop(self):
+        if self._started is None or self._total is not None:
+            return
+        self._total = time.perf_counter() - self._started
+
+        if self.trace_memory:
+            self.memory_peak = tracemalloc.get_traced_memory()[1]
+            if self._own_tracing:
+                tracemalloc.stop()
+
+    # ==========================================================
+    # TIMER
+    # ==========================================================
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def reset_lap(self):
+        """Riparte da ora per la prossima chiamata a lap()."""
+        self._mark = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + (now - self._mark)
+        self._mark = now
+
+    # ==========================================================
+    # CONTATORI
+    # ==========================================================
+    def add_bytes(self, nbytes):
+        self.bytes_read += int(nbytes)
+
+    def add_file_pass(self, file_path):
+        """Registra una lettura completa del file."""
+        try:
+            self.add_bytes(os.path.getsize(file_path))
+        except OSError:
+            pass
+
+    def count_spectra(self, n):
+        self.spectra = int(n)
+
+    # ==========================================================
+    # REPORT
+    # ==========================================================
+    def report(self):
+        total = self._total
+        if total is None and self._started is not None:
+            total = time.perf_counter() - self._started
+
+        rate = self.spectra / total if total else None
+        throughput = self.bytes_read / total if total else None
+
+        return {
+            "file": self.file_path,
+            "strategy": self.strategy,
+            "total_s": total,
+            "phases_s": dict(self.phases),
+            "other_s": (total - sum(self.phases.values())) if total else None,
+            "spectra": self.spectra,
+            "spectra_per_s": rate,
+            "bytes_read": self.bytes_read,
+            "bytes_per_s": throughput,
+            "memory_peak_bytes": self.memory_peak,
+        }
+
+    def to_json(self, path, extra=None):
+        """Scrive il report in JSON (extra: chiavi aggiuntive, es. memory_stats)."""
+        data = self.report()
+        if extra:
+            data.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+    @staticmethod
+    def format_report(report):
+        """Testo leggibile di un report (per la finestra diagnostica)."""
+        def mb(n):
+            return "–" if n is None else f"{n / 1024 ** 2:.1f} MiB"
+
+        lines = [
+            f"File:       {os.path.basename(report['file'] or '') or '–'}",
+            f"Strategia:  {report['strategy'] or '–'}",
+            f"Totale:     {report['total_s'] or 0:.3f} s",
+            "",
+            "Fasi:",
+        ]
+
+        total = report["total_s"] or 0
+        phases = dict(report["phases_s"])
+        if report["other_s"] is not None:
+            phases["(altro)"] = max(0.0, report["other_s"])
+        for name, sec in sorted(phases.items(), key=lambda p: -p[1]):
+            share = 100 * sec / total if total else 0
+            lines.append(f"  {name:<18} {sec:8.3f} s  {share:5.1f} %")
+
+        rate = report["spectra_per_s"]
+        throughput = report["bytes_per_s"]
+        lines += [
+            "",
+            f"Spettri:    {report['spectra']}"
+            + (f"  ({rate:,.0f} /s)" if rate else ""),
+            f"Byte letti: {mb(report['bytes_read'])}"
+            + (f"  ({mb(throughput)}/s)" if throughput else ""),
+            f"Picco mem.: {mb(report['memory_peak_bytes'])}",
+        ]
+        return "\n".join(lines)
+
+
+class _Phase:
+    """Context manager di LoadProfile.phase."""
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add(self.name, time.perf_counter() - self._t0)
+        self.profile.reset_lap()
+        return False
@@ -0,0 +1,167 @@
+"""
+core/session.py
+Sessione multi-run (campione, bianco, QC…) con caricamento concorrente
+Versione riscritta 2026 – Python 3.12
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from core.cache import SpectraCache
+from core.loader import MZMLLoader, LoadCancelled, PROGRESS_INTERVAL
+
+
+def _load_run(file_path, cache_root, memory_budget):
+    """
+    Eseguito nel processo worker: decodifica il run e lo scrive nella
+    cache su disco, da cui il processo principale lo riapre in
+    memory-map senza copiare gli array tra processi.
+
+    Un run oltre la quota di budget resta lazy e non va in cache:
+    vengono restituiti i suoi metadati (MZMLLoader.lazy_headers), così
+    il processo principale lo riapre senza rileggere il file.
+
+    Nessuna eviction qui: un worker potrebbe eliminare la voce appena
+    scritta da un altro prima che il processo principale la riapra.
+    """
+    loader = MZMLLoader(cache=SpectraCache(root=cache_root, max_bytes=None),
+                        memory_budget=memory_budget)
+    loader.load(file_path)
+    headers = loader.lazy_headers()
+    loader.reset()
+    return headers
+
+
+class RunSession:
+    """
+    Contiene N run (un MZMLLoader ciascuno) aperti insieme.
+
+    - load(paths): decodifica concorrente in un pool di processi
+    - un unico memory_budget ripartito in parti uguali tra i run
+    - memory_stats(): contabilità aggregata
+    """
+
+    def __init__(self, cache=None, memory_budget=None, workers=None):
+        self.cache = cache if cache is not None else SpectraCache()
+        self.memory_budget = memory_budget
+        self.workers = workers or os.cpu_count() or 1
+        self.runs = []             # lista di MZMLLoader
+
+    def __len__(self):
+        return len(self.runs)
+
+    def __iter__(self):
+        return iter(self.runs)
+
+    # ==========================================================
+    # CARICAMENTO
+    # ==========================================================
+    def run_budget(self, n_runs=None):
+        """Quota di memoria per run (None = nessun limite)."""
+        if self.memory_budget is None:
+            return None
+        n = n_runs if n_runs is not None else max(1, len(self.runs))
+        return self.memory_budget // max(1, n)
+
+    def load(self, paths, progress=None, cancel=None):
+        """
+        Carica tutti i file in parallelo (un processo per file) e
+        sostituisce i run della sessione: il tempo totale è circa quello
+        del file più lento. Restituisce la lista di (path, messaggio)
+        per i file non caricati.
+
+        I worker scrivono i run nella cache su disco; qui vengono poi
+        riaperti in memory-map nell'ordine di paths e solo dopo la
+        cache viene riportata entro il suo limite (senza toccare le voci
+        della sessione). Un run che supera la sua quota di budget resta
+        lazy: il worker ne restituisce i metadati e qui viene solo
+        riaperto l'indice del file.
+
+        progress(done, total, path) viene chiamata a ogni file completato.
+        cancel: threading.Event; se impostato solleva LoadCancelled.
+        """
+        paths = list(paths)
+        budget = self.run_budget(len(paths))
+        errors = []
+        headers = {}               # path → metadati dei run lazy
+
+        pool = ProcessPoolExecutor(max_workers=max(1, min(self.workers, len(paths))))
+        try:
+            futures = {
+                pool.submit(_load_run, path, self.cache.root, budget): path
+                for path in paths
+            }
+            pending = set(futures)
+            while pending:
+                if cancel is not None and cancel.is_set():
+                    raise LoadCancelled()
+
+                done, pending = wait(pending, timeout=PROGRESS_INTERVAL,
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = futures[future]
+                    try:
+                        headers[path] = future.result()
+                    except Exception as e:
+                        errors.append((path, str(e)))
+
+                    if progress is not None:
+                        progress(len(futures) - len(pending), len(futures), path)
+        except LoadCancelled:
+            # I file già in decodifica terminano in background
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+        # Riapertura nell'ordine scelto dall'utente
+        failed = {path for path, _ in errors}
+        runs = []
+        for path in paths:
+            if path in failed:
+                continue
+            loader = MZMLLoader(cache=self.cache, memory_budget=budget)
+            try:
+                if headers.get(path) is not None:
+                    loader.open_headers(path, headers[path])
+                else:
+                    loader.load(path)
+            except Exception as e:
+                errors.append((path, str(e)))
+                continue
+            runs.append(loader)
+
+        self.cache.evict(keep=paths)
+
+        self.clear()
+        self.runs = runs
+        return errors
+
+    # ==========================================================
+    # GESTIONE RUN
+    # ==========================================================
+    def names(self):
+        return [os.path.basename(run.file_path) for run in self.runs]
+
+    def clear(self):
+        for run in self.runs:
+            run.reset()
+        self.runs = []
+
+    def memory_stats(self):
+        """Somma delle statistiche di memoria di tutti i run."""
+        total = {
+            "budget": self.memory_budget,
+            "runs": len(self.runs),
+            "resident_bytes": 0,
+            "derived_bytes": 0,
+            "estimated_bytes": 0,
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+        for run in self.runs:
+            stats = run.memory_stats()
+            for key in ("resident_bytes", "derived_bytes", "estimated_bytes",
+                        "hits", "misses", "evictions"):
+                total[key] += stats[key]
+        return total
@@ -0,0 +1,175 @@
+"""
+core/spatial_index.py
+Indice spaziale RT × m/z sui picchi MS1 – LC–MS Viewer
+Versione riscritta 2026 – Python 3.12
+"""
+
+import numpy as np
+
+
+class RTMZIndex:
+    """
+    Indice a tile sui picchi MS1 di un archivio packed.
+
+    - asse RT: gruppi di scans_per_tile scan consecutivi (in ordine di RT)
+    - asse m/z: fasce larghe mz_tile
+
+    Per ogni tile sono registrati la lista dei picchi (CSR: tile_offsets
+    su peaks) e l'intensità massima. Una query rettangolare legge solo
+    i tile che intersecano il rettangolo e poi filtra i bordi.
+    """
+
+    def __init__(self, store, scans, scans_per_tile=32, mz_tile=5.0):
+        """
+        store: PackedSpectra
+        scans: indici degli scan MS1 nell'archivio, ordinati per RT
+        """
+        self.store = store
+        self.scans = np.asarray(scans, dtype=np.intp)
+        self.scans_per_tile = scans_per_tile
+        self.mz_tile = float(mz_tile)
+
+        self.rts = store.rt[self.scans]
+        self._build()
+
+    # ==========================================================
+    # COSTRUZIONE
+    # ==========================================================
+    def _build(self):
+        store = self.store
+
+        # Rango RT di ogni scan dell'archivio (-1 = non MS1)
+        rank = np.full(len(store), -1, dtype=np.int64)
+        rank[self.scans] = np.arange(len(self.scans))
+
+        peak_rank = rank[store.scan_index()]
+        peak_idx = np.flatnonzero(peak_rank >= 0)
+        peak_rank = peak_rank[peak_idx]
+        mz = store.mz[peak_idx]
+
+        self.mz_min = float(mz.min()) if len(mz) else 0.0
+        mz_max = float(mz.max()) if len(mz) else 0.0
+
+        self.n_rt_tiles = max(1, -(-len(self.scans) // self.scans_per_tile))
+        self.n_mz_tiles = int((mz_max - self.mz_min) // self.mz_tile) + 1
+
+        tile_id = (peak_rank // self.scans_per_tile) * self.n_mz_tiles + \
+            ((mz - self.mz_min) // self.mz_tile).astype(np.int64)
+
+        order = np.argsort(tile_id, kind="stable")
+        tile_id = tile_id[order]
+
+        self.peaks = peak_idx[order]          # indici nei picchi dell'archivio
+        self.peak_rank = peak_rank[order]     # rango RT dello scan di ogni picco
+
+        n_tiles = self.n_rt_tiles * self.n_mz_tiles
+        counts = np.bincount(tile_id, minlength=n_tiles)
+        self.tile_offsets = np.zeros(n_tiles + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.tile_offsets[1:])
+
+        # Intensità massima per tile (solo tile non vuoti)
+        self.tile_max = np.zeros(n_tiles)
+        nonempty = np.flatnonzero(counts)
+        if len(nonempty):
+            intens = np.asarray(store.intensity[self.peaks], dtype=np.float64)
+            self.tile_max[nonempty] = np.maximum.reduceat(
+                intens, self.tile_offsets[nonempty]
+            )
+
+    @property
+    def nbytes(self):
+        """Memoria occupata dall'indice (esclusi i picchi dell'archivio)."""
+        return sum(a.nbytes for a in (self.scans, self.rts, self.peaks,
+                                      self.peak_rank, self.tile_offsets,
+                                      self.tile_max))
+
+    @staticmethod
+    def estimated_nbytes(n_peaks):
+        """Memoria stimata dell'indice per n_peaks picchi MS1."""
+        return int(n_peaks) * (np.dtype(np.intp).itemsize + 8)
+
+    # ==========================================================
+    # QUERY
+    # ==========================================================
+    def _mz_tiles(self, mz_min, mz_max):
+        """Fasce m/z che intersecano [mz_min, mz_max] (range semiaperto)."""
+        m0 = int(max(0, (mz_min - self.mz_min) // self.mz_tile))
+        m1 = int(min(self.n_mz_tiles, (mz_max - self.mz_min) // self.mz_tile + 1))
+        return m0, m1
+
+    def _tile_ranges(self, rt_min, rt_max, mz_min, mz_max):
+        """Tile RT / m/z che intersecano il rettangolo (range semiaperti)."""
+        lo = np.searchsorted(self.rts, rt_min, side="left")
+        hi = np.searchsorted(self.rts, rt_max, side="right")
+        if hi <= lo:
+            return None
+
+        r0, r1 = lo // self.scans_per_tile, (hi - 1) // self.scans_per_tile + 1
+
+        m0, m1 = self._mz_tiles(mz_min, mz_max)
+        if m1 <= m0:
+            return None
+
+        return (lo, hi), (r0, r1), (m0, m1)
+
+    def _gather(self, r0, r1, m0, m1):
+        """Picchi (indici nell'archivio, rango RT) dei tile [r0, r1) × [m0, m1)."""
+        tiles = (np.arange(r0, r1)[:, None] * self.n_mz_tiles +
+                 np.arange(m0, m1)[None, :]).ravel()
+        starts = self.tile_offsets[tiles]
+        counts = self.tile_offsets[tiles + 1] - starts
+
+        total = int(counts.sum())
+        first = np.cumsum(counts) - counts
+        sel = np.repeat(starts - first, counts) + np.arange(total)
+        return self.peaks[sel], self.peak_rank[sel]
+
+    def query(self, rt_min, rt_max, mz_min, mz_max):
+        """
+        Picchi MS1 con rt_min <= RT <= rt_max e mz_min <= m/z <= mz_max.
+        Restituisce (rt, mz, intensità) come array paralleli.
+        """
+        ranges = self._tile_ranges(rt_min, rt_max, mz_min, mz_max)
+        if ranges is None:
+            return np.empty(0), np.empty(0), np.empty(0)
+        (lo, hi), (r0, r1), (m0, m1) = ranges
+
+        # Gather dei picchi dei soli tile candidati
+        peaks, rank = self._gather(r0, r1, m0, m1)
+        mz = self.store.mz[peaks]
+
+        keep = (rank >= lo) & (rank < hi) & (mz >= mz_min) & (mz <= mz_max)
+        peaks, rank = peaks[keep], rank[keep]
+
+        return self.rts[rank], self.store.mz[peaks], self.store.intensity[peaks]
+
+    def mz_band(self, mz_min, mz_max):
+        """
+        Picchi MS1 con mz_min <= m/z <= mz_max su tutto il run.
+        Restituisce (rango RT dello scan, intensità): la somma per scan
+        (XIC) è un np.bincount sul rango.
+        """
+        m0, m1 = self._mz_tiles(mz_min, mz_max)
+        if m1 <= m0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        peaks, rank = self._gather(0, self.n_rt_tiles, m0, m1)
+        mz = self.store.mz[peaks]
+        keep = (mz >= mz_min) & (mz <= mz_max)
+        return rank[keep], self.store.intensity[peaks[keep]]
+
+    def max_intensity(self, rt_min, rt_max, mz_min, mz_max):
+        """Intensità massima nel rettangolo (0 se vuoto)."""
+        _, _, intens = self.query(rt_min, rt_max, mz_min, mz_max)
+        return float(intens.max()) if len(intens) else 0.0
+
+    def tile_grid(self):
+        """
+        Matrice (n_rt_tiles, n_mz_tiles) delle intensità massime,
+        con i bordi RT / m/z dei tile (n + 1 per asse, come per
+        pcolormesh): panoramica per viste a mappa.
+        """
+        rt_edges = np.append(self.rts[::self.scans_per_tile], self.rts[-1:])
+        mz_edges = self.mz_min + np.arange(self.n_mz_tiles + 1) * self.mz_tile
+        return self.tile_max.reshape(self.n_rt_tiles, self.n_mz_tiles), \
+            rt_edges, mz_edges
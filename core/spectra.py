@@ -0,0 +1,380 @@
+"""
+core/spectra.py
+Contenitori di spettri per MZMLLoader (packed CSR / accesso lazy)
+Versione riscritta 2026 – Python 3.12
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+
+class PackedSpectra:
+    """
+    Archivio colonnare (stile CSR) di tutti gli scan di un run.
+
+    - mz / intensity: array contigui con i picchi di tutti gli scan
+    - offsets: picchi dello scan i = [offsets[i], offsets[i+1])
+    - rt / level / precursor: array paralleli, uno per scan
+      (precursor = NaN per gli MS1)
+    - ids / parent_ids: id mzML dello scan e, per gli MS2, dello scan
+      padre (spectrumRef del precursore, None se assente)
+
+    Gli spettri restituiti da peaks() sono viste, non copie.
+    """
+
+    def __init__(self, rt, level, precursor, offsets, mz, intensity,
+                 ids=None, parent_ids=None):
+        self.rt = np.asarray(rt, dtype=np.float64)
+        self.level = np.asarray(level, dtype=np.int8)
+        self.precursor = np.asarray(precursor, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.mz = np.asarray(mz)
+        self.intensity = np.asarray(intensity)
+        self.ids = list(ids) if ids is not None else []
+        self.parent_ids = list(parent_ids) if parent_ids is not None else []
+
+    def __len__(self):
+        return len(self.rt)
+
+    def peaks(self, i):
+        """Restituisce (mz, intensità) dello scan i come viste."""
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return self.mz[start:stop], self.intensity[start:stop]
+
+    @property
+    def counts(self):
+        """Numero di picchi per scan."""
+        return np.diff(self.offsets)
+
+    def scan_index(self):
+        """Indice di scan di ogni picco (per operazioni vettoriali sull'intero run)."""
+        return np.repeat(np.arange(len(self), dtype=np.intp), self.counts)
+
+    def take(self, order):
+        """Nuovo archivio con gli scan riordinati / selezionati secondo order."""
+        order = np.asarray(order, dtype=np.intp)
+        counts = self.counts[order]
+
+        offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        # Indici dei picchi: inizio dello scan originale + posizione interna
+        gather = np.repeat(self.offsets[order] - offsets[:-1], counts) + \
+            np.arange(offsets[-1], dtype=np.int64)
+
+        return PackedSpectra(
+            self.rt[order], self.level[order], self.precursor[order],
+            offsets, self.mz[gather], self.intensity[gather],
+            ids=[self.ids[i] for i in order] if self.ids else None,
+            parent_ids=[self.parent_ids[i] for i in order]
+            if self.parent_ids else None
+        )
+
+    @classmethod
+    def concatenate(cls, parts):
+        """Unisce più archivi (es. blocchi decodificati in parallelo)."""
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return PackedSpectraBuilder().build()
+
+        offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for p in parts:
+            offsets.append(p.offsets[1:] + base)
+            base += p.offsets[-1]
+
+        return cls(
+            np.concatenate([p.rt for p in parts]),
+            np.concatenate([p.level for p in parts]),
+            np.concatenate([p.precursor for p in parts]),
+            np.concatenate(offsets),
+            np.concatenate([p.mz for p in parts]),
+            np.concatenate([p.intensity for p in parts]),
+            ids=[i for p in parts for i in p.ids],
+            parent_ids=[i for p in parts for i in p.parent_ids]
+        )
+
+    @property
+    def nbytes(self):
+        """Memoria occupata dagli array numerici."""
+        return sum(a.nbytes for a in (self.rt, self.level, self.precursor,
+                                      self.offsets, self.mz, self.intensity))
+
+    def close(self):
+        """Nessuna risorsa esterna da rilasciare."""
+
+
+class PackedSpectraBuilder:
+    """
+    Accumula gli scan durante il parsing e produce un PackedSpectra
+    con un'unica concatenazione finale.
+
+    Con max_bytes, quando i picchi accumulati superano la soglia, i
+    picchi vengono scartati e da lì in poi si registrano solo i
+    metadati (overflowed = True): il chiamante costruisce un archivio
+    lazy senza rileggere il file.
+    """
+
+    def __init__(self, intensity_dtype=None, max_bytes=None):
+        self.intensity_dtype = intensity_dtype
+        self.max_bytes = max_bytes
+        self.nbytes = 0            # byte dei picchi accumulati
+        self.overflowed = False
+
+        self.rt = []
+        self.level = []
+        self.precursor = []
+        self.ids = []
+        self.parent_ids = []
+        self._mz = []
+        self._int = []
+        self._counts = []
+
+    def __len__(self):
+        return len(self.rt)
+
+    @property
+    def counts(self):
+        """Numero di picchi per scan."""
+        return np.asarray(self._counts, dtype=np.int64)
+
+    def headers(self):
+        """Metadati degli scan (chiavi di LazySpectra.headers)."""
+        return {
+            "ids": self.ids,
+            "rt": self.rt,
+            "level": self.level,
+            "precursor": self.precursor,
+            "parent_ids": self.parent_ids,
+            "counts": self.counts,
+        }
+
+    def append(self, rt, level, precursor, mz, intensities,
+               spectrum_id=None, parent_id=None):
+        self.append_header(rt, level, precursor, len(mz),
+                           spectrum_id=spectrum_id, parent_id=parent_id)
+        if self.intensity_dtype is not None:
+            intensities = np.asarray(intensities, dtype=self.intensity_dtype)
+        self._add_peaks(mz, intensities)
+
+    def append_header(self, rt, level, precursor, count,
+                      spectrum_id=None, parent_id=None):
+        """Solo i metadati di uno scan (count = numero di picchi)."""
+        self.rt.append(rt)
+        self.level.append(level)
+        self.precursor.append(np.nan if precursor is None else precursor)
+        self.ids.append(spectrum_id)
+        self.parent_ids.append(parent_id)
+        self._counts.append(count)
+
+    def extend(self, part):
+        """Accoda tutti gli scan di un PackedSpectra (es. blocco parallelo)."""
+        self.rt.extend(part.rt.tolist())
+        self.level.extend(part.level.tolist())
+        self.precursor.extend(part.precursor.tolist())
+        self.ids.extend(part.ids or [None] * len(part))
+        self.parent_ids.extend(part.parent_ids or [None] * len(part))
+        self._counts.extend(part.counts.tolist())
+        self._add_peaks(part.mz, part.intensity)
+
+    def _add_peaks(self, mz, intensities):
+        if self.overflowed:
+            return
+        self._mz.append(mz)
+        self._int.append(intensities)
+        self.nbytes += mz.nbytes + intensities.nbytes
+
+        if self.max_bytes is not None and self.nbytes > self.max_bytes:
+            self.overflowed = True
+            self._mz, self._int = [], []
+            self.nbytes = 0
+
+    def build(self):
+        if self.overflowed:
+            raise RuntimeError("Picchi scartati oltre max_bytes: solo metadati.")
+
+        offsets = np.zeros(len(self._counts) + 1, dtype=np.int64)
+        np.cumsum(self._counts, out=offsets[1:])
+
+        mz = np.concatenate(self._mz) if self._mz else np.empty(0)
+        intensity = np.concatenate(self._int) if self._int else np.empty(0)
+
+        return PackedSpectra(self.rt, self.level, self.precursor,
+                             offsets, mz, intensity,
+                             ids=self.ids, parent_ids=self.parent_ids)
+
+
+class LazySpectra:
+    """
+    Archivio di scan basato sull'<indexList> del file mzML.
+
+    In memoria restano solo i metadati (id, RT, livello MS, precursore,
+    scan padre, numero di picchi); gli array m/z / intensità vengono decodificati su
+    richiesta tramite gli offset in byte dell'indice (pyteomics
+    PreIndexedMzML).
+
+    Con cache_bytes > 0 gli spettri decodificati restano in una cache
+    LRU limitata a cache_bytes; in caso di miss vengono riletti dal file.
+
+    Reader e cache sono protetti da un lock: peaks() / read() possono
+    essere chiamati anche dai thread in background (mappa RT × m/z).
+    """
+
+    def __init__(self, file_path, ids, rt, level, precursor, parent_ids=None,
+                 counts=None, cache_bytes=0, intensity_dtype=None):
+        from pyteomics import mzml
+
+        self.file_path = file_path
+        self.ids = list(ids)
+        self.parent_ids = list(parent_ids) if parent_ids is not None else []
+        self.rt = np.asarray(rt, dtype=np.float64)
+        self.level = np.asarray(level, dtype=np.int8)
+        self.precursor = np.asarray(precursor, dtype=np.float64)
+        self.counts = np.asarray(
+            counts if counts is not None else np.zeros(len(self.ids)),
+            dtype=np.int64
+        )
+
+        # Cache LRU degli spettri decodificati
+        self.cache_bytes = cache_bytes
+        self.intensity_dtype = intensity_dtype
+        self._lru = OrderedDict()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.RLock()
+        self._reader = mzml.PreIndexedMzML(file_path)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def peaks(self, i):
+        """Restituisce (mz, intensità) dello scan i (cache LRU o file)."""
+        with self._lock:
+            cached = self._lru.get(i)
+            if cached is not None:
+                self._lru.move_to_end(i)
+                self.hits += 1
+                return cached
+
+            self.misses += 1
+            mz, intensities = self.read(i)
+
+            size = mz.nbytes + intensities.nbytes
+            if 0 < size <= self.cache_bytes:
+                self._lru[i] = (mz, intensities)
+                self.resident_bytes += size
+                while self.resident_bytes > self.cache_bytes:
+                    _, (old_mz, old_int) = self._lru.popitem(last=False)
+                    self.resident_bytes -= old_mz.nbytes + old_int.nbytes
+                    self.evictions += 1
+
+            return mz, intensities
+
+    def headers(self):
+        """
+        Metadati degli scan (id, rt, level, precursor, parent_ids,
+        counts): bastano per ricreare l'archivio in un altro processo.
+        """
+        return {
+            "ids": self.ids,
+            "rt": self.rt,
+            "level": self.level,
+            "precursor": self.precursor,
+            "parent_ids": self.parent_ids,
+            "counts": self.counts,
+        }
+
+    def read(self, i):
+        """(mz, intensità) dello scan i letti dal file, senza la cache LRU."""
+        with self._lock:
+            spectrum = self._reader.get_by_id(self.ids[i])
+        mz = spectrum["m/z array"]
+        intensities = spectrum["intensity array"]
+        if self.intensity_dtype is not None:
+            intensities = np.asarray(intensities, dtype=self.intensity_dtype)
+        return mz, intensities
+
+    def estimated_nbytes(self, mz_itemsize=8, int_itemsize=4):
+        """Memoria stimata per tenere tutti i picchi decodificati."""
+        return int(self.counts.sum()) * (mz_itemsize + int_itemsize)
+
+    def close(self):
+        """Chiude il reader sottostante e svuota la cache."""
+        with self._lock:
+            self._lru.clear()
+            self.resident_bytes = 0
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+
+class SpectrumRecord(Mapping):
+    """
+    Dict in sola lettura { rt, precursor, mz, int } per un singolo scan.
+    mz / int vengono letti dall'archivio solo al primo accesso.
+    """
+
+    _KEYS = ("rt", "precursor", "mz", "int")
+
+    def __init__(self, store, i):
+        self._store = store
+        self._i = i
+        self._peaks = None
+
+    def __getitem__(self, key):
+        if key == "rt":
+            return float(self._store.rt[self._i])
+        if key == "precursor":
+            prec = float(self._store.precursor[self._i])
+            return None if np.isnan(prec) else prec
+        if key in ("mz", "int"):
+            if self._peaks is None:
+                self._peaks = self._store.peaks(self._i)
+            return self._peaks[0] if key == "mz" else self._peaks[1]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+
+class SpectrumView(Sequence):
+    """
+    Vista su un sottoinsieme di scan di un archivio.
+
+    Mantiene l'interfaccia storica del loader:
+    - record="tuple" → (rt, mz, int)               (ms1_spectra)
+    - record="dict"  → { rt, precursor, mz, int }  (ms2_spectra)
+    """
+
+    def __init__(self, store, indices, record="tuple"):
+        self.store = store
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.record = record
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        j = int(self.indices[i])
+        if self.record == "dict":
+            return SpectrumRecord(self.store, j)
+
+        mz, intensities = self.store.peaks(j)
+        return (float(self.store.rt[j]), mz, intensities)
+
+    @property
+    def rts(self):
+        """Array dei tempi di ritenzione (senza decodificare i picchi)."""
+        return self.store.rt[self.indices]
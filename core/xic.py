@@ -0,0 +1,218 @@
+"""
+core/xic.py
+Estrazione vettoriale di cromatogrammi ionici (XIC / EIC) – LC–MS Viewer
+Versione riscritta 2026 – Python 3.12
+"""
+
+import numpy as np
+
+from core.loader import MemoryBudgetExceeded
+from core.spectra import LazySpectra
+
+
+class XICExtractor:
+    """
+    Estrae gli XIC di una lista di target m/z (finestra ± ppm) sugli
+    MS1 caricati nel loader.
+
+    Usa l'indice RT × m/z del loader (get_spatial_index, condiviso con
+    la mappa di intensità): per ogni target vengono letti solo i picchi
+    delle fasce m/z che intersecano la finestra, e la somma per scan è
+    un np.bincount sul rango RT. Nessun loop Python per scan; l'indice
+    viene costruito una volta per run, entro il memory_budget.
+
+    Se l'indice non rientra nel budget (run lazy molto grandi) gli XIC
+    vengono calcolati scorrendo gli scan uno alla volta: più lento, ma
+    in memoria resta un solo spettro.
+
+    tkinter viene importato solo dai metodi delle finestre: extract /
+    export_csv sono usati anche dal batch headless (core.batch).
+    """
+
+    def __init__(self):
+        self.default_ppm = 5.0
+        self.last_result = None
+
+    # ==========================================================
+    # ESTRAZIONE
+    # ==========================================================
+    def extract(self, loader, targets, ppm=5.0):
+        """
+        Restituisce un dict:
+        - times:   RT degli MS1 (n_scan,)
+        - targets: m/z target (n_target,)
+        - ppm:     tolleranza usata
+        - xic:     intensità sommate (n_target, n_scan)
+        """
+        targets = np.atleast_1d(np.asarray(targets, dtype=np.float64))
+
+        if not loader.ms1_spectra or len(targets) == 0:
+            result = {
+                "times": np.empty(0),
+                "targets": targets,
+                "ppm": ppm,
+                "xic": np.zeros((len(targets), 0)),
+            }
+            self.last_result = result
+            return result
+
+        tol = targets * ppm * 1e-6
+        try:
+            index = loader.get_spatial_index()
+        except MemoryBudgetExceeded:
+            times, xic = self._extract_scans(loader, targets - tol, targets + tol)
+        else:
+            n_scans = len(index.scans)
+            times = np.array(index.rts, dtype=np.float64)
+            xic = np.empty((len(targets), n_scans))
+            for i, (lo, hi) in enumerate(zip(targets - tol, targets + tol)):
+                rank, intensities = index.mz_band(lo, hi)
+                xic[i] = np.bincount(rank, weights=intensities, minlength=n_scans)
+
+        result = {
+            "times": times,
+            "targets": targets,
+            "ppm": ppm,
+            "xic": xic,
+        }
+        self.last_result = result
+        return result
+
+    @staticmethod
+    def _extract_scans(loader, lo, hi):
+        """
+        XIC uno scan MS1 alla volta (in ordine di RT), per i run il cui
+        indice supera il memory_budget. Gli scan lazy sono letti senza
+        passare dalla cache LRU.
+        """
+        store = loader.store
+        read = store.read if isinstance(store, LazySpectra) else store.peaks
+        scans = loader.ms1_spectra.indices[loader.ms1_rt_order]
+
+        xic = np.empty((len(lo), len(scans)))
+        for j, i in enumerate(scans):
+            mz, intensities = read(i)
+            mz = np.asarray(mz, dtype=np.float64)
+            intensities = np.asarray(intensities, dtype=np.float64)
+            if len(mz) > 1 and np.any(np.diff(mz) < 0):
+                order = np.argsort(mz, kind="stable")
+                mz, intensities = mz[order], intensities[order]
+
+            cumsum = np.zeros(len(intensities) + 1)
+            np.cumsum(intensities, out=cumsum[1:])
+            xic[:, j] = (cumsum[np.searchsorted(mz, hi, side="right")] -
+                         cumsum[np.searchsorted(mz, lo, side="left")])
+
+        return np.array(store.rt[scans], dtype=np.float64), xic
+
+    # ==========================================================
+    # ESPORTAZIONE
+    # ==========================================================
+    def export_csv(self, result, path):
+        """
+        Scrive gli XIC in CSV: una riga per scan, colonna RT + una
+        colonna per target.
+        """
+        header = "rt," + ",".join(f"{mz:.5f}" for mz in result["targets"])
+        table = np.column_stack([result["times"], result["xic"].T])
+        np.savetxt(path, table, delimiter=",", header=header, comments="",
+                   fmt="%.6g")
+
+    # ==========================================================
+    # FINESTRA XIC
+    # ==========================================================
+    def open_window(self, root, get_loader, plotman, axes):
+        """
+        Finestra per inserire i target m/z (separati da virgola,
+        spazio o a capo), la tolleranza ppm e il pannello di destinazione.
+        get_loader: callable che restituisce il loader corrente
+        axes = { "TIC": ax_tic, "BPC": ax_bpc }
+        """
+        import tkinter as tk
+        from tkinter import ttk
+
+        win = tk.Toplevel(root)
+        win.title("XIC – Cromatogrammi ionici estratti")
+        win.geometry("380x360")
+        win.attributes("-topmost", True)
+
+        ttk.Label(win, text="Target m/z:",
+                  font=("Segoe UI", 10)).pack(anchor="w", padx=12, pady=(10, 2))
+
+        text = tk.Text(win, width=40, height=8, font=("Segoe UI", 10))
+        text.pack(fill="both", expand=True, padx=12)
+
+        row = tk.Frame(win)
+        row.pack(fill="x", padx=12, pady=8)
+
+        ttk.Label(row, text="Tolleranza (ppm):").pack(side="left")
+        ppm_var = tk.StringVar(value=str(self.default_ppm))
+        ttk.Entry(row, width=8, textvariable=ppm_var).pack(side="left", padx=6)
+
+        panel_var = tk.StringVar(value="TIC")
+        ttk.Combobox(row, width=6, state="readonly", values=list(axes),
+                     textvariable=panel_var).pack(side="right")
+        ttk.Label(row, text="Pannello:").pack(side="right", padx=6)
+
+        ttk.Button(
+            win,
+            text="Estrai XIC",
+            command=lambda: self._run_xic(
+                text, ppm_var, panel_var, get_loader(), plotman, axes
+            )
+        ).pack(fill="x", padx=12, pady=3)
+
+        ttk.Button(
+            win,
+            text="Esporta CSV",
+            command=self._export_dialog
+        ).pack(fill="x", padx=12, pady=(3, 12))
+
+    def _run_xic(self, text, ppm_var, panel_var, loader, plotman, axes):
+        from tkinter import messagebox
+
+        try:
+            targets = [float(t) for t in
+                       text.get("1.0", "end").replace(",", " ").split()]
+            ppm = float(ppm_var.get())
+        except ValueError:
+            messagebox.showwarning("Valore non valido",
+                                   "Target e tolleranza devono essere numerici.")
+            return
+
+        if not targets:
+            messagebox.showwarning("Nessun target", "Inserisci almeno un m/z.")
+            return
+
+        if not loader.ms1_spectra:
+            messagebox.showwarning("Nessun dato", "Carica un file mzML.")
+            return
+
+        result = self.extract(loader, targets, ppm=ppm)
+
+        ax = axes[panel_var.get()]
+        plotman.plot_xic(ax, result)
+        ax.figure.canvas.draw_idle()
+
+    def _export_dialog(self):
+        from tkinter import messagebox, filedialog
+
+        if self.last_result is None:
+            messagebox.showwarning("Nessun XIC", "Esegui prima un'estrazione.")
+            return
+
+        path = filedialog.asksaveasfilename(
+            title="Esporta XIC",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv")]
+        )
+        if not path:
+            return
+
+        try:
+            self.export_csv(self.last_result, path)
+            messagebox.showinfo("Esportazione completata",
+                                f"XIC esportati in:\n\n{path}")
+        except Exception as e:
+            messagebox.showerror("Errore",
+                                 f"Errore durante l'esportazione:\n\n{e}")
@@ -7,7 +7,6 @@ Versione riscritta 2026 – Python 3.12
 """
 
 import numpy as np
-from matplotlib.patches import Rectangle
 import time
 
 
@@ -19,15 +18,22 @@ class ZoomController:
     - sincronizzazione TIC ↔ BPC
     - aggiornamento MS1 in base al range RT visibile
     - click → cerca MS1 più vicino
+
+    Con un BlitOverlay il rettangolo di zoom è un overlay in blitting:
+    on_motion aggiorna solo la geometria e il chiamante esegue
+    overlay.update() (un blit, nessun ridisegno dei dati).
     """
 
-    def __init__(self):
+    def __init__(self, overlay=None):
         # Stato zoom rettangolare
         self.zoom_active = False
         self.x0 = None
         self.rect_artist = None
         self._last_motion_ts = 0
 
+        # BlitOverlay opzionale (senza: rettangolo + draw_idle)
+        self.overlay = overlay
+
     # ==========================================================
     # EVENTI PRINCIPALI
     # ==========================================================
@@ -76,23 +82,26 @@ class ZoomController:
         - calcola nuovo range X
         - sincronizza TIC ↔ BPC
         - aggiorna MS1 alla finestra RT
+
+        Restituisce True solo se sono stati applicati nuovi limiti X
+        (drag di ampiezza non nulla): un semplice click non cambia i dati.
         """
         if not self.zoom_active:
-            return
+            return False
 
         self.zoom_active = False
         if event.inaxes not in [ax_tic, ax_bpc]:
             self._clear_rect()
-            return
+            return False
 
         if self.x0 is None or event.xdata is None:
             self._clear_rect()
-            return
+            return False
 
         xmin, xmax = sorted([self.x0, event.xdata])
         if abs(xmax - xmin) < 1e-9:
             self._clear_rect()
-            return
+            return False
 
         # Imposta zoom sull’asse selezionato
         target = event.inaxes
@@ -108,6 +117,7 @@ class ZoomController:
         self._update_ms1_range(ax_ms1, loader, xmin, xmax, plotting)
 
         self._clear_rect()
+        return True
 
     def on_scroll(self, event):
         """
@@ -135,8 +145,14 @@ class ZoomController:
     # ==========================================================
     def _draw_zoom_rect(self, ax, x0, x1):
         """Disegna o aggiorna il rettangolo di zoom."""
+        if self.overlay is not None:
+            self.overlay.show_rect(ax, x0, x1)
+            return
+
         self._clear_rect()
 
+        from matplotlib.patches import Rectangle
+
         xmin, xmax = sorted([x0, x1])
         ymin, ymax = ax.get_ylim()
 
@@ -154,6 +170,9 @@ class ZoomController:
 
     def _clear_rect(self):
         """Elimina il rettangolo di zoom."""
+        if self.overlay is not None:
+            self.overlay.hide_rect()
+
         if self.rect_artist is not None:
             try:
                 self.rect_artist.remove()
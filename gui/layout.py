@@ -8,19 +8,27 @@ Python 3.12
 """
 
 import os
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
 
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-# Import dei moduli core (saranno popolati successivamente)
-from core.loader import MZMLLoader
+# Import dei moduli core (saranno popolati successivamente).
+# matplotlib, pyteomics e scipy vengono importati solo quando servono:
+# la finestra compare prima della costruzione della figura.
+from core.loader import MZMLLoader, LoadCancelled
+from core.cache import SpectraCache
+from core.session import RunSession
 from core.plotting import PlotManager
 from core.zoom import ZoomController
+from core.overlay import BlitOverlay
 from core.peak_picking import PeakPickingCore
 from core.ms2_viewer import MS2Viewer
+from core.xic import XICExtractor
+from core.diagnostics import Diagnostics
+from core.export import DataExporter
+from core.heatmap import IntensityMap
 from core.converter import RAWConverter
 from utils.styles_io import StylesIO
 from utils.file_dialogs import FileDialogs
@@ -35,6 +43,17 @@ FLUENT_ACCENT = "#2b579a"
 FLUENT_ACCENT_HOVER = "#1f4e8f"
 FLUENT_TEXT = "#1a1a1a"
 
+# Intervallo di polling della coda di caricamento (ms)
+LOAD_POLL_MS = 50
+
+# Budget di memoria (byte): per il run singolo o condiviso tra i run di una
+# sessione; oltre questa stima un run resta lazy
+MEMORY_BUDGET = 2 * 1024 ** 3
+
+# Disposizione dei pannelli: "split" = un canvas per pannello (un click
+# sul TIC ridisegna solo il canvas MS1), "single" = una figura unica
+PANEL_LAYOUT = "split"
+
 
 # -------------------------------------------------------------------
 #  ICON LOADER
@@ -62,10 +81,11 @@ def load_icon(icon_name: str, size=(22, 22)):
 #  APP CLASS
 # -------------------------------------------------------------------
 class LCMSViewerApp:
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, startup=None):
         from gui.style import FluentStyle
         
         self.root = root
+        self.startup = startup     # StartupReport opzionale (main.py)
         # Applica subito stile Fluent UI all’intera app
         FluentStyle(root)
         self.root.configure(bg=FLUENT_BG)
@@ -75,17 +95,28 @@ class LCMSViewerApp:
         # -------------------------------
         # ISTANZA MODULI CORE
         # -------------------------------
-        self.loader = MZMLLoader()
+        self.loader = MZMLLoader(cache=SpectraCache(), memory_budget=MEMORY_BUDGET)
+        self.session = RunSession(cache=self.loader.cache, memory_budget=MEMORY_BUDGET)
         self.plotting = PlotManager()
         self.zoom = ZoomController()
         self.peak_core = PeakPickingCore()
         self.ms2_viewer = MS2Viewer()
+        self.xic = XICExtractor()
+        self.diagnostics = Diagnostics()
+        self.exporter = DataExporter()
+        self.intensity_map = IntensityMap()
         self.converter = RAWConverter()
         self.styles_io = StylesIO()
         self.dialogs = FileDialogs()
 
         # Variabili di stato / stile
         self.current_mzml = None
+
+        # Caricamento in background
+        self._load_thread = None
+        self._load_queue = None
+        self._load_cancel = None
+        self._preview = None
         self.icons = {}
         self._load_all_icons()
 
@@ -94,9 +125,23 @@ class LCMSViewerApp:
         self._build_sidebar()
         self._build_main_area()
 
+        # Prima pittura (header, sidebar, barra di stato) prima di
+        # importare matplotlib e costruire la figura
+        self.root.update()
+        self._mark_startup("finestra visibile")
+
+        self._build_figure()
+
         # Collegamento iniziale degli eventi
         self._bind_plot_events()
 
+        elapsed = self._mark_startup("grafici pronti")
+        if elapsed is not None:
+            self.status_label.configure(text=f"Pronto • avvio {elapsed:.2f} s")
+
+    def _mark_startup(self, name):
+        return None if self.startup is None else self.startup.mark(name)
+
     # ----------------------------------------------------------
     # ICONS LOADING
     # ----------------------------------------------------------
@@ -141,6 +186,7 @@ class LCMSViewerApp:
         # CHAPTER: File
         self._sidebar_title("File")
         self._sidebar_button("Apri mzML", "open", self.open_file)
+        self._sidebar_button("Apri sessione (più run)", "open", self.open_session)
         self._sidebar_button("Converti RAW → mzML", "convert", self.convert_raw)
         self._sidebar_button("Chiudi spettro", "close", self.close_spectrum)
 
@@ -152,6 +198,7 @@ class LCMSViewerApp:
         self._sidebar_button("BPC", "bpc", self.plot_bpc)
         self._sidebar_button("MS1", "ms1", self.plot_ms1)
         self._sidebar_button("MS2 Viewer", "ms2", self.open_ms2)
+        self._sidebar_button("Mappa RT × m/z", "ms1", self.open_intensity_map)
 
         self._sidebar_button("Reset Zoom", "reset", self.reset_zoom)
 
@@ -160,8 +207,11 @@ class LCMSViewerApp:
         # CHAPTER: Tools
         self._sidebar_title("Strumenti")
         self._sidebar_button("Peak Picking", "peak", self.open_peak_window)
+        self._sidebar_button("XIC", "tic", self.open_xic_window)
         self._sidebar_button("Style Editor", "style", self.open_style_editor)
         self._sidebar_button("Esporta grafico", "export", self.export_plot)
+        self._sidebar_button("Esporta dati", "export", self.export_data)
+        self._sidebar_button("Diagnostica", "zoom", self.open_diagnostics)
 
     def _sidebar_title(self, text: str):
         lbl = tk.Label(
@@ -210,14 +260,81 @@ class LCMSViewerApp:
         self.main_area = tk.Frame(self.root, bg=FLUENT_BG)
         self.main_area.pack(fill="both", expand=True)
 
-        # Matplotlib Figure
-        self.figure = Figure(figsize=(14, 10), dpi=100, layout="constrained")
-        self.ax_tic = self.figure.add_subplot(3, 1, 1)
-        self.ax_bpc = self.figure.add_subplot(3, 1, 2)
-        self.ax_ms1 = self.figure.add_subplot(3, 1, 3)
+        self._build_status_bar()
 
-        self.canvas = FigureCanvasTkAgg(self.figure, master=self.main_area)
-        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+    def _build_figure(self):
+        """
+        Figura/e matplotlib (import del backend TkAgg solo qui).
+        In modalità "split" ogni pannello ha figura e canvas propri con
+        margini fissi: gli assi restano allineati tra i canvas e nessun
+        layout viene ricalcolato a ogni draw.
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        names = ("tic", "bpc", "ms1")
+        if PANEL_LAYOUT == "split":
+            self.figures = []
+            for _ in names:
+                figure = Figure(figsize=(14, 10 / 3), dpi=100)
+                figure.subplots_adjust(left=0.06, right=0.99, top=0.86, bottom=0.17)
+                self.figures.append(figure)
+            self.ax_tic, self.ax_bpc, self.ax_ms1 = (
+                figure.add_subplot(1, 1, 1, label=name)
+                for figure, name in zip(self.figures, names)
+            )
+        else:
+            figure = Figure(figsize=(14, 10), dpi=100, layout="constrained")
+            self.figures = [figure]
+            self.ax_tic, self.ax_bpc, self.ax_ms1 = (
+                figure.add_subplot(3, 1, i, label=name)
+                for i, name in enumerate(names, start=1)
+            )
+
+        self.canvases = []
+        for figure in self.figures:
+            canvas = FigureCanvasTkAgg(figure, master=self.main_area)
+            canvas.get_tk_widget().pack(fill="both", expand=True)
+            self.canvases.append(canvas)
+
+        # Pannello dell'ultimo click (peak picking in "split")
+        self._active_ax = self.ax_tic
+
+        # Rettangolo di zoom e crosshair in blitting
+        self.overlay = BlitOverlay(self.canvases)
+        self.zoom.overlay = self.overlay
+
+    def _draw(self, *axes):
+        """draw_idle dei soli canvas dei pannelli indicati (tutti se nessuno)."""
+        axes = axes or (self.ax_tic, self.ax_bpc, self.ax_ms1)
+        for canvas in {ax.figure.canvas for ax in axes}:
+            canvas.draw_idle()
+
+    def _build_status_bar(self):
+        """Barra inferiore: stato caricamento, avanzamento, annulla."""
+        bar = tk.Frame(self.main_area, bg=FLUENT_BG)
+        bar.pack(fill="x", side="bottom", padx=10, pady=(0, 6))
+
+        self.status_label = tk.Label(
+            bar,
+            text="Pronto",
+            bg=FLUENT_BG,
+            fg=FLUENT_TEXT,
+            font=("Segoe UI", 9),
+            anchor="w"
+        )
+        self.status_label.pack(side="left", fill="x", expand=True)
+
+        self.cancel_button = ttk.Button(
+            bar,
+            text="Annulla",
+            command=self.cancel_load,
+            state="disabled"
+        )
+        self.cancel_button.pack(side="right", padx=(8, 0))
+
+        self.progress_bar = ttk.Progressbar(bar, length=240, mode="determinate")
+        self.progress_bar.pack(side="right")
 
     # ----------------------------------------------------------
     # EVENT BINDING
@@ -227,39 +344,331 @@ class LCMSViewerApp:
         Registra i listener di click, zoom e aggiornamento.
         Tutta la logica è delegata ai moduli core.
         """
-        self.canvas.mpl_connect("button_press_event", self._on_click)
-        self.canvas.mpl_connect("scroll_event", self._on_scroll)
-        self.canvas.mpl_connect("motion_notify_event", self._on_motion)
-        self.canvas.mpl_connect("button_release_event", self._on_release)
+        for canvas in self.canvases:
+            canvas.mpl_connect("button_press_event", self._on_click)
+            canvas.mpl_connect("scroll_event", self._on_scroll)
+            canvas.mpl_connect("motion_notify_event", self._on_motion)
+            canvas.mpl_connect("button_release_event", self._on_release)
+            canvas.mpl_connect("axes_leave_event", self._on_leave)
 
     # ----------------------------------------------------------
     # FILE OPERATIONS
     # ----------------------------------------------------------
     def open_file(self):
+        if self._is_loading():
+            messagebox.showwarning("Caricamento in corso",
+                                   "Attendi o annulla il caricamento corrente.")
+            return
+
         file_path = self.dialogs.open_mzml()
         if not file_path:
             return
 
-        self.current_mzml = file_path
-        self.loader.load(file_path)
+        self._start_load(file_path)
+
+    def open_session(self):
+        if self._is_loading():
+            messagebox.showwarning("Caricamento in corso",
+                                   "Attendi o annulla il caricamento corrente.")
+            return
+
+        paths = self.dialogs.open_mzml_multiple()
+        if not paths:
+            return
+
+        self._start_session_load(paths)
+
+    # ----------------------------------------------------------
+    # CARICAMENTO IN BACKGROUND
+    # ----------------------------------------------------------
+    def _is_loading(self):
+        return self._load_thread is not None
+
+    def _start_load(self, file_path):
+        """
+        Avvia il caricamento in un thread worker. Il run corrente resta
+        attivo finché il nuovo non è completo; l'avanzamento arriva
+        tramite coda e viene letto da _poll_load con root.after.
+        """
+        # Budget dell'app, non quello del loader corrente (dopo una
+        # sessione è la quota di un singolo run)
+        loader = MZMLLoader(cache=self.loader.cache,
+                            memory_budget=MEMORY_BUDGET,
+                            trace_memory=self.loader.trace_memory)
+
+        self._load_queue = queue.Queue()
+        self._load_cancel = threading.Event()
+        self._preview = {"times": [], "tic": [], "bpc": [], "header": set()}
+
+        self._load_thread = threading.Thread(
+            target=self._load_worker,
+            args=(loader, file_path, self._load_queue, self._load_cancel),
+            daemon=True
+        )
+        self._load_thread.start()
+
+        self.plotting.reset_axes(self.ax_ms1, "MS1")
+        self.status_label.configure(
+            text=f"Caricamento: {os.path.basename(file_path)}…")
+        self.progress_bar.configure(mode="determinate", value=0)
+        self.cancel_button.configure(state="normal")
+
+        self.root.after(LOAD_POLL_MS, self._poll_load, file_path)
+
+    @staticmethod
+    def _load_worker(loader, file_path, q, cancel):
+        """Eseguito nel thread worker: nessun accesso a Tk qui."""
+        def progress(done, total, times, tic, bpc):
+            q.put(("progress", done, total, times, tic, bpc))
+
+        # Anteprima immediata dalla <chromatogramList>, se presente
+        header = MZMLLoader.read_chromatogram_list(file_path)
+        if header:
+            q.put(("header", header))
+
+        try:
+            loader.load(file_path, workers=os.cpu_count() or 1,
+                        progress=progress, cancel=cancel)
+        except LoadCancelled:
+            q.put(("cancelled",))
+            return
+        except Exception as e:
+            q.put(("error", str(e)))
+            return
+
+        q.put(("done", loader))
+
+    def _poll_load(self, file_path):
+        """Svuota la coda di caricamento e aggiorna l'anteprima TIC / BPC."""
+        updated = False
+        last_progress = None
+
+        while True:
+            try:
+                msg = self._load_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            kind = msg[0]
+            if kind == "header":
+                # I cromatogrammi completi hanno la precedenza sull'anteprima
+                for key, (times, values) in msg[1].items():
+                    self._preview["header"].add(key)
+                    if key == "tic":
+                        self.plotting.plot_tic_data(self.ax_tic, times, values)
+                    else:
+                        self.plotting.plot_bpc_data(self.ax_bpc, times, values)
+                self._draw(self.ax_tic, self.ax_bpc)
+            elif kind == "progress":
+                _, done, total, times, tic, bpc = msg
+                self._preview["times"].extend(times)
+                self._preview["tic"].extend(tic)
+                self._preview["bpc"].extend(bpc)
+                updated = updated or bool(times)
+                last_progress = (done, total)
+            else:
+                self._finish_load(msg, file_path)
+                return
+
+        if last_progress is not None:
+            done, total = last_progress
+            if total:
+                self.progress_bar.configure(mode="determinate",
+                                            maximum=total, value=done)
+            else:
+                self.progress_bar.configure(mode="indeterminate")
+                self.progress_bar.step(5)
+
+        # Un solo ridisegno per ciclo di polling
+        if updated:
+            p = self._preview
+            if "tic" not in p["header"]:
+                self.plotting.plot_tic_data(self.ax_tic, p["times"], p["tic"])
+            if "bpc" not in p["header"]:
+                self.plotting.plot_bpc_data(self.ax_bpc, p["times"], p["bpc"])
+            self._draw(self.ax_tic, self.ax_bpc)
+
+        self.root.after(LOAD_POLL_MS, self._poll_load, file_path)
+
+    def _finish_load(self, msg, file_path):
+        """Gestisce la fine del caricamento (done / cancelled / error)."""
+        self._load_thread = None
+        self._load_queue = None
+        self._load_cancel = None
+        self._preview = None
+        self.cancel_button.configure(state="disabled")
+        self.progress_bar.configure(mode="determinate", value=0)
+
+        kind = msg[0]
+        if kind == "done":
+            old = self.loader
+            self.loader = msg[1]
+            old.reset()
+            self.session.clear()
+            self.ms2_viewer.sync()
+
+            self.current_mzml = file_path
+            self.status_label.configure(text=os.path.basename(file_path))
+
+            messagebox.showinfo("File caricato",
+                                f"Il file è stato caricato:\n\n{os.path.basename(file_path)}")
+
+            self.plot_tic()
+            self.plot_bpc()
+            self.plot_ms1()
+            return
+
+        # Annullato / errore → ripristina la vista del run precedente
+        if kind == "cancelled":
+            self.status_label.configure(text="Caricamento annullato")
+        else:
+            self.status_label.configure(text="Errore di caricamento")
+            messagebox.showerror("Errore", msg[1])
+
+        self._replot_current()
+
+    # ----------------------------------------------------------
+    # SESSIONE MULTI-RUN
+    # ----------------------------------------------------------
+    def _start_session_load(self, paths):
+        """
+        Carica i run della sessione in un thread worker (che a sua volta
+        usa un pool di processi, un file per processo). Come per il run
+        singolo, la sessione corrente resta attiva fino al completamento.
+        """
+        session = RunSession(cache=self.session.cache,
+                             memory_budget=self.session.memory_budget)
+
+        self._load_queue = queue.Queue()
+        self._load_cancel = threading.Event()
+
+        self._load_thread = threading.Thread(
+            target=self._session_worker,
+            args=(session, paths, self._load_queue, self._load_cancel),
+            daemon=True
+        )
+        self._load_thread.start()
+
+        self.status_label.configure(text=f"Caricamento sessione: {len(paths)} run…")
+        self.progress_bar.configure(mode="determinate", maximum=len(paths), value=0)
+        self.cancel_button.configure(state="normal")
+
+        self.root.after(LOAD_POLL_MS, self._poll_session)
+
+    @staticmethod
+    def _session_worker(session, paths, q, cancel):
+        """Eseguito nel thread worker: nessun accesso a Tk qui."""
+        def progress(done, total, path):
+            q.put(("progress", done, total, path))
+
+        try:
+            errors = session.load(paths, progress=progress, cancel=cancel)
+        except LoadCancelled:
+            q.put(("cancelled",))
+            return
+        except Exception as e:
+            q.put(("error", str(e)))
+            return
+
+        q.put(("done", session, errors))
+
+    def _poll_session(self):
+        """Svuota la coda della sessione: un aggiornamento per file completato."""
+        while True:
+            try:
+                msg = self._load_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if msg[0] == "progress":
+                _, done, total, path = msg
+                self.progress_bar.configure(maximum=total, value=done)
+                self.status_label.configure(
+                    text=f"Sessione: {done}/{total} run • {os.path.basename(path)}")
+            else:
+                self._finish_session_load(msg)
+                return
+
+        self.root.after(LOAD_POLL_MS, self._poll_session)
+
+    def _finish_session_load(self, msg):
+        """Fine caricamento sessione: il primo run diventa quello attivo."""
+        self._load_thread = None
+        self._load_queue = None
+        self._load_cancel = None
+        self.cancel_button.configure(state="disabled")
+        self.progress_bar.configure(mode="determinate", value=0)
+
+        kind = msg[0]
+        if kind == "cancelled":
+            self.status_label.configure(text="Caricamento annullato")
+            return
+        if kind == "error":
+            self.status_label.configure(text="Errore di caricamento")
+            messagebox.showerror("Errore", msg[1])
+            return
+
+        _, session, errors = msg
+        if errors:
+            messagebox.showwarning(
+                "Run non caricati",
+                "\n".join(f"{os.path.basename(p)}: {e}" for p, e in errors))
+        if not len(session):
+            return
+
+        old_session, old_loader = self.session, self.loader
+        self.session = session
+        self.loader = session.runs[0]
+        if old_loader not in old_session.runs:
+            old_loader.reset()
+        old_session.clear()
+        self.ms2_viewer.sync()
 
-        messagebox.showinfo("File caricato",
-                            f"Il file è stato caricato:\n\n{os.path.basename(file_path)}")
+        self.current_mzml = self.loader.file_path
+        self.status_label.configure(
+            text=f"Sessione: {len(session)} run • attivo {session.names()[0]}")
 
         self.plot_tic()
         self.plot_bpc()
         self.plot_ms1()
 
+    def cancel_load(self):
+        """Richiede l'annullamento del caricamento in corso."""
+        if self._load_cancel is not None:
+            self._load_cancel.set()
+            self.status_label.configure(text="Annullamento…")
+
+    def _replot_current(self):
+        """Ridisegna i pannelli con il run attualmente caricato."""
+        if len(self.session) > 1:
+            self.plotting.plot_session_tic(self.ax_tic, self.session)
+            self.plotting.plot_session_bpc(self.ax_bpc, self.session)
+            if self.loader.ms1_mz is not None:
+                self.plotting.plot_ms1(self.ax_ms1, self.loader)
+        elif self.loader.has_data():
+            self.plotting.plot_tic(self.ax_tic, self.loader)
+            self.plotting.plot_bpc(self.ax_bpc, self.loader)
+            if self.loader.ms1_mz is not None:
+                self.plotting.plot_ms1(self.ax_ms1, self.loader)
+        else:
+            self.plotting.reset_axes(self.ax_tic, "TIC")
+            self.plotting.reset_axes(self.ax_bpc, "BPC")
+            self.plotting.reset_axes(self.ax_ms1, "MS1")
+        self._draw()
+
     def convert_raw(self):
         self.converter.batch_convert()
 
     def close_spectrum(self):
+        self.cancel_load()
         self.current_mzml = None
         self.loader.reset()
+        self.session.clear()
+        self.ms2_viewer.sync()
         self.plotting.reset_axes(self.ax_tic, "TIC")
         self.plotting.reset_axes(self.ax_bpc, "BPC")
         self.plotting.reset_axes(self.ax_ms1, "MS1")
-        self.canvas.draw_idle()
+        self._draw()
 
     # ----------------------------------------------------------
     # PLOTTING ACTIONS
@@ -268,66 +677,173 @@ class LCMSViewerApp:
         if not self.loader.tic_times:
             messagebox.showwarning("Nessun dato", "Carica un file mzML.")
             return
-        self.plotting.plot_tic(self.ax_tic, self.loader)
-        self.canvas.draw_idle()
+        if len(self.session) > 1:
+            self.plotting.plot_session_tic(self.ax_tic, self.session)
+        else:
+            self.plotting.plot_tic(self.ax_tic, self.loader)
+        self._draw(self.ax_tic)
 
     def plot_bpc(self):
         if not self.loader.bpc_times:
             messagebox.showwarning("Nessun dato", "Carica un file mzML.")
             return
-        self.plotting.plot_bpc(self.ax_bpc, self.loader)
-        self.canvas.draw_idle()
+        if len(self.session) > 1:
+            self.plotting.plot_session_bpc(self.ax_bpc, self.session)
+        else:
+            self.plotting.plot_bpc(self.ax_bpc, self.loader)
+        self._draw(self.ax_bpc)
 
     def plot_ms1(self):
         if self.loader.ms1_mz is None:
             messagebox.showwarning("Nessun dato", "Carica un file mzML.")
             return
         self.plotting.plot_ms1(self.ax_ms1, self.loader)
-        self.canvas.draw_idle()
+        self._draw(self.ax_ms1)
 
     def open_ms2(self):
         if not self.loader.ms2_spectra:
             messagebox.showwarning("Nessun MS2", "Nessuno spettro MS2 trovato.")
             return
-        self.ms2_viewer.open(self.root, self.loader.ms2_spectra)
+        self.ms2_viewer.open(self.root, lambda: self.loader,
+                             on_show_ms1=self.show_ms1)
+
+    def open_intensity_map(self):
+        self.intensity_map.open_window(self.root, lambda: self.loader,
+                                       on_select_rt=self.show_ms1_at)
+
+    def show_ms1_at(self, rt):
+        """Mostra nel pannello MS1 lo scan più vicino al tempo indicato."""
+        closest = self.loader.get_closest_ms1(rt)
+        if not closest:
+            return
+        rt, mz, intens = closest
+        self.plotting.plot_ms1(self.ax_ms1, self.loader, mz=mz,
+                               intensities=intens, rt=rt)
+        self._draw(self.ax_ms1)
+
+    def show_ms1(self, ms1_index):
+        """Mostra nel pannello MS1 lo scan indicato (indice in ms1_spectra)."""
+        rt, mz, intens = self.loader.ms1_spectra[ms1_index]
+        self.plotting.plot_ms1(self.ax_ms1, self.loader, mz=mz,
+                               intensities=intens, rt=rt)
+        self._draw(self.ax_ms1)
 
     # ----------------------------------------------------------
     # PEAK PICKING
     # ----------------------------------------------------------
     def open_peak_window(self):
-        self.peak_core.open_window(self.root, self.figure, self.canvas)
+        figure = self._active_ax.figure
+        self.peak_core.open_window(self.root, figure, figure.canvas)
+
+    # ----------------------------------------------------------
+    # XIC
+    # ----------------------------------------------------------
+    def open_xic_window(self):
+        if not self.loader.ms1_spectra:
+            messagebox.showwarning("Nessun dato", "Carica un file mzML.")
+            return
+        self.xic.open_window(self.root, lambda: self.loader, self.plotting,
+                             {"TIC": self.ax_tic, "BPC": self.ax_bpc})
+
+    # ----------------------------------------------------------
+    # DIAGNOSTICA
+    # ----------------------------------------------------------
+    def open_diagnostics(self):
+        self.diagnostics.open_window(self.root, lambda: self.loader,
+                                     lambda: self.session, startup=self.startup)
 
     # ----------------------------------------------------------
     # STYLE EDITOR
     # ----------------------------------------------------------
     def open_style_editor(self):
-        self.styles_io.open_editor(self.root, self.plotting, self.canvas)
+        self.styles_io.open_editor(self.root, self.plotting, self.canvases)
 
     # ----------------------------------------------------------
     # EXPORT
     # ----------------------------------------------------------
     def export_plot(self):
-        self.dialogs.export_figure(self.figure)
+        # In "split" i tre pannelli vengono riuniti in un'unica figura
+        if len(self.figures) > 1:
+            figure = self.plotting.combined_figure(
+                (self.ax_tic, self.ax_bpc, self.ax_ms1))
+        else:
+            figure = self.figures[0]
+        self.dialogs.export_figure(figure)
+
+    def export_data(self):
+        self.exporter.open_window(self.root, lambda: self.loader,
+                                  self.plotting, self.peak_core)
 
     # ----------------------------------------------------------
     # ZOOM + EVENTS
     # ----------------------------------------------------------
     def reset_zoom(self):
         self.zoom.reset_all(self.ax_tic, self.ax_bpc, self.ax_ms1, self.loader, self.plotting)
-        self.canvas.draw_idle()
+        self._draw()
 
     def _on_click(self, event):
+        if self._is_loading():
+            return
+        if event.inaxes is not None:
+            # Pannello attivo (anche figure.gca() per il peak picking)
+            self._active_ax = event.inaxes
+            event.inaxes.figure.sca(event.inaxes)
+
         self.zoom.on_click(event, self.ax_tic, self.ax_bpc, self.ax_ms1, self.loader, self.plotting)
-        self.canvas.draw_idle()
+        self._sync_ms2_children(event)
+
+        # Click su TIC/BPC: cambia solo l'MS1, il rettangolo va in blitting
+        if event.inaxes in (self.ax_tic, self.ax_bpc):
+            self._draw(self.ax_ms1)
+        self.overlay.update()
+
+    def _sync_ms2_children(self, event):
+        """Click su TIC/BPC con MS2 viewer aperto → mostra gli MS2 figli."""
+        if not self.ms2_viewer.is_open() or event.button != 1:
+            return
+        if event.inaxes not in (self.ax_tic, self.ax_bpc) or event.xdata is None:
+            return
+        if self.ms2_viewer.ms2_list is not self.loader.ms2_spectra:
+            return
+
+        ms1_index = self.loader.get_closest_ms1_many([event.xdata])
+        if len(ms1_index):
+            self.ms2_viewer.select(self.loader.get_ms2_children(ms1_index[0]))
 
     def _on_release(self, event):
-        self.zoom.on_release(event, self.ax_tic, self.ax_bpc, self.ax_ms1, self.loader, self.plotting)
-        self.canvas.draw_idle()
+        if self._is_loading():
+            return
+        # Solo un drag di zoom cambia i pannelli (limiti TIC/BPC + MS1);
+        # dopo un semplice click basta togliere il rettangolo (blit)
+        if self.zoom.on_release(event, self.ax_tic, self.ax_bpc, self.ax_ms1,
+                                self.loader, self.plotting):
+            self._draw()
+        else:
+            self.overlay.update()
 
     def _on_motion(self, event):
+        # Solo overlay (blit): i dati non vengono ridisegnati
         self.zoom.on_motion(event)
-        self.canvas.draw_idle()
+        self._update_crosshair(event)
+        self.overlay.update()
+
+    def _on_leave(self, event):
+        self.overlay.hide_crosshair()
+        self.overlay.update()
+
+    def _update_crosshair(self, event):
+        ax = event.inaxes
+        if ax is None or event.xdata is None or event.ydata is None:
+            self.overlay.hide_crosshair()
+            return
+
+        if ax is self.ax_ms1:
+            text = f"m/z {event.xdata:.4f} • I {event.ydata:.3g}"
+        else:
+            text = f"RT {event.xdata:.2f} min • I {event.ydata:.3g}"
+        self.overlay.show_crosshair(ax, event.xdata, event.ydata, text)
 
     def _on_scroll(self, event):
         self.zoom.on_scroll(event)
-        self.canvas.draw_idle()
+        if event.inaxes is not None:
+            self._draw(event.inaxes)
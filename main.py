@@ -2,10 +2,23 @@
 """
 LC–MS Scientific Viewer (rewrite 2026)
 Main entry point – Python 3.12
+
+Uso:
+    python main.py                        avvia il viewer
+    python main.py --import-report [s]    report dei tempi di import a freddo
+                                          (budget opzionale in secondi:
+                                          exit code 1 se superato)
 """
 
+import time
+
+_T0 = time.perf_counter()
+
+import os
+import sys
 import tkinter as tk
-from gui.layout import LCMSViewerApp
+
+from utils.startup import StartupReport
 
 
 def main():
@@ -13,17 +26,40 @@ def main():
     Avvia l'applicazione principale con finestra Tkinter.
     L'intera logica e il layout vengono gestiti nei moduli della cartella gui/.
     """
+    if "--import-report" in sys.argv:
+        sys.exit(import_report(sys.argv[sys.argv.index("--import-report") + 1:]))
+
+    startup = StartupReport(t0=_T0)
+
     root = tk.Tk()
 
     # Titolo base, il resto lo gestisce l'app
     root.title("LC–MS Scientific Viewer")
 
+    # Import del layout dopo la creazione della finestra
+    from gui.layout import LCMSViewerApp
+    startup.mark("moduli importati")
+
     # Inizializzazione applicazione
-    app = LCMSViewerApp(root)
+    app = LCMSViewerApp(root, startup=startup)
 
     # Avvia loop grafico
     root.mainloop()
 
 
+def import_report(args):
+    """Stampa il riepilogo di -X importtime; 1 se il budget è superato."""
+    budget = float(args[0]) if args else None
+
+    result = StartupReport.import_times(
+        ("gui.layout",), cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    print(StartupReport.format_import_times(result, budget=budget))
+
+    if budget is not None and result["total_s"] > budget:
+        return 1
+    return 0
+
+
 if __name__ == "__main__":
     main()
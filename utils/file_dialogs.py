@@ -32,6 +32,17 @@ class FileDialogs:
             return None
         return file_path
 
+    def open_mzml_multiple(self):
+        """
+        Mostra dialogo per aprire più file mzML (sessione multi-run).
+        Ritorna lista di path, oppure lista vuota.
+        """
+        paths = filedialog.askopenfilenames(
+            title="Seleziona i file mzML della sessione",
+            filetypes=[("File mzML", "*.mzML"), ("Tutti i file", "*.*")]
+        )
+        return list(paths) if paths else []
+
     # ==========================================================
     # ESPORTAZIONE FIGURA
     # ==========================================================
@@ -0,0 +1,126 @@
+"""
+utils/startup.py
+Tempi di avvio dell'applicazione e report dei tempi di import
+Versione riscritta 2026 – Python 3.12
+"""
+
+import subprocess
+import sys
+import time
+
+
+# Moduli pesanti che non devono essere importati all'avvio
+DEFERRED_MODULES = ("pyteomics", "scipy")
+
+
+class StartupReport:
+    """
+    Cronologia dell'avvio (mark) e riepilogo di `python -X importtime`.
+
+    - mark(name): tempo trascorso da t0 e moduli pesanti già caricati
+    - import_times(): misura a freddo, in un processo separato, il costo
+      di import dei moduli indicati, raggruppato per pacchetto
+    """
+
+    def __init__(self, t0=None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.marks = []            # (nome, secondi da t0)
+
+    # ==========================================================
+    # CRONOLOGIA
+    # ==========================================================
+    def mark(self, name):
+        elapsed = time.perf_counter() - self.t0
+        self.marks.append((name, elapsed))
+        return elapsed
+
+    def elapsed(self, name):
+        """Secondi da t0 al mark indicato (None se assente)."""
+        for mark, sec in self.marks:
+            if mark == name:
+                return sec
+        return None
+
+    @staticmethod
+    def loaded_deferred():
+        """Moduli di DEFERRED_MODULES già presenti in sys.modules."""
+        return [m for m in DEFERRED_MODULES if m in sys.modules]
+
+    def summary(self):
+        lines = ["Avvio:"]
+        for name, sec in self.marks:
+            lines.append(f"  {name:<24} {sec:7.3f} s")
+        loaded = self.loaded_deferred()
+        lines.append(f"  moduli differiti caricati: {', '.join(loaded) or 'nessuno'}")
+        return "\n".join(lines)
+
+    # ==========================================================
+    # IMPORT TIME
+    # ==========================================================
+    @staticmethod
+    def import_times(modules=("gui.layout",), cwd=None):
+        """
+        Esegue `python -X importtime -c "import ..."` in un processo
+        nuovo (import a freddo) e restituisce un dict:
+        - total_s:    tempo cumulativo degli import richiesti
+        - packages:   { pacchetto: secondi self } ordinato decrescente
+        - deferred:   moduli di DEFERRED_MODULES importati comunque
+        """
+        code = "; ".join(f"import {m}" for m in modules)
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True, text=True, cwd=cwd
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Import non riuscito:\n{proc.stderr.strip()[-2000:]}")
+
+        total_us = 0
+        packages = {}
+        seen = set()
+
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            try:
+                self_us, cumulative_us, name = line[len("import time:"):].split("|")
+                self_us, cumulative_us = int(self_us), int(cumulative_us)
+            except ValueError:
+                continue        # riga di intestazione
+
+            # Import di primo livello (nessuna indentazione) → totale
+            if not name.startswith("  "):
+                total_us += cumulative_us
+
+            name = name.strip()
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0) + self_us
+            seen.add(package)
+
+        ordered = dict(sorted(((p, us / 1e6) for p, us in packages.items()),
+                              key=lambda p: -p[1]))
+        return {
+            "modules": list(modules),
+            "total_s": total_us / 1e6,
+            "packages": ordered,
+            "deferred": [m for m in DEFERRED_MODULES if m in seen],
+        }
+
+    @staticmethod
+    def format_import_times(result, top=15, budget=None):
+        """Testo del report di import (budget in secondi, opzionale)."""
+        lines = [
+            f"Import a freddo di {', '.join(result['modules'])}: "
+            f"{result['total_s']:.3f} s",
+        ]
+        if budget is not None:
+            verdict = "OK" if result["total_s"] <= budget else "SUPERATO"
+            lines.append(f"Budget: {budget:.3f} s → {verdict}")
+
+        lines += ["", f"Pacchetti (tempo self, primi {top}):"]
+        for package, sec in list(result["packages"].items())[:top]:
+            lines.append(f"  {package:<24} {sec:7.3f} s")
+
+        lines.append("")
+        lines.append("Moduli differiti importati all'avvio: "
+                     f"{', '.join(result['deferred']) or 'nessuno'}")
+        return "\n".join(lines)
@@ -17,13 +17,29 @@ class StylesIO:
     Gestisce:
     - Style Editor (finestra)
     - Salvataggio / caricamento stili JSON
-    - Applicazione a PlotManager
+    - Applicazione a PlotManager (direttamente sugli artisti disegnati)
+
+    Gli eventi degli slider vengono accorpati: al massimo un ridisegno
+    per frame (~60 FPS), qualunque sia la frequenza degli eventi.
     """
 
+    # Intervallo minimo tra due ridisegni richiesti dall'editor (ms)
+    REDRAW_INTERVAL_MS = 16
+
+    def __init__(self):
+        self._redraw_pending = set()       # canvas in attesa di ridisegno
+
     # ==========================================================
     # STYLE EDITOR
     # ==========================================================
-    def open_editor(self, root, plotman, canvas):
+    def open_editor(self, root, plotman, canvases):
+        """
+        canvases: canvas della figura principale o lista di canvas
+        (un canvas per pannello)
+        """
+        if not isinstance(canvases, (list, tuple)):
+            canvases = [canvases]
+
         win = tk.Toplevel(root)
         win.title("Style Editor — LC–MS Viewer")
         win.geometry("430x580")
@@ -48,10 +64,10 @@ class StylesIO:
 
         ttk.Button(
             win, text="Colore TIC",
-            command=lambda: self._pick_color("tic", plotman, canvas)
+            command=lambda: self._pick_color("tic", plotman, canvases)
         ).pack(fill="x", padx=20, pady=3)
 
-        self._make_linewidth_slider(win, "tic", plotman, canvas)
+        self._make_linewidth_slider(win, "tic", plotman, canvases)
 
         # ==========================================================
         # BPC
@@ -63,10 +79,10 @@ class StylesIO:
 
         ttk.Button(
             win, text="Colore BPC",
-            command=lambda: self._pick_color("bpc", plotman, canvas)
+            command=lambda: self._pick_color("bpc", plotman, canvases)
         ).pack(fill="x", padx=20, pady=3)
 
-        self._make_linewidth_slider(win, "bpc", plotman, canvas)
+        self._make_linewidth_slider(win, "bpc", plotman, canvases)
 
         # ==========================================================
         # MS1
@@ -78,10 +94,10 @@ class StylesIO:
 
         ttk.Button(
             win, text="Colore MS1",
-            command=lambda: self._pick_color("ms1", plotman, canvas)
+            command=lambda: self._pick_color("ms1", plotman, canvases)
         ).pack(fill="x", padx=20, pady=3)
 
-        self._make_linewidth_slider(win, "ms1", plotman, canvas)
+        self._make_linewidth_slider(win, "ms1", plotman, canvases)
 
         # ==========================================================
         # GRIGLIA E SFONDO
@@ -94,13 +110,13 @@ class StylesIO:
         ttk.Button(
             win,
             text="Colore griglia",
-            command=lambda: self._pick_grid_color(plotman, canvas)
+            command=lambda: self._pick_grid_color(plotman, canvases)
         ).pack(fill="x", padx=20, pady=3)
 
         ttk.Button(
             win,
             text="Colore sfondo del pannello",
-            command=lambda: self._pick_panel_color(plotman, canvas)
+            command=lambda: self._pick_panel_color(plotman, canvases)
         ).pack(fill="x", padx=20, pady=3)
 
         # ==========================================================
@@ -118,7 +134,7 @@ class StylesIO:
 
         ttk.Button(
             win, text="Carica stile",
-            command=lambda: self.load_styles(plotman, canvas)
+            command=lambda: self.load_styles(plotman, canvases)
         ).pack(fill="x", padx=20, pady=5)
 
         # ==========================================================
@@ -132,7 +148,7 @@ class StylesIO:
     # ==========================================================
     # SLIDER LINEWIDTH
     # ==========================================================
-    def _make_linewidth_slider(self, win, spectrum, plotman, canvas):
+    def _make_linewidth_slider(self, win, spectrum, plotman, canvases):
         frame = tk.Frame(win)
         frame.pack(fill="x", padx=20, pady=2)
 
@@ -141,7 +157,7 @@ class StylesIO:
             frame, from_=0.5, to=5.0, value=plotman.__dict__[f"style_{spectrum}"]["linewidth"],
             orient="horizontal",
             command=lambda value: self._update_linewidth(
-                spectrum, float(value), plotman, canvas
+                spectrum, float(value), plotman, canvases
             )
         )
         slider.pack(fill="x")
@@ -149,38 +165,55 @@ class StylesIO:
     # ==========================================================
     # PICK COLOR
     # ==========================================================
-    def _pick_color(self, spectrum, plotman, canvas):
+    def _pick_color(self, spectrum, plotman, canvases):
         color = askcolor(title=f"Colore {spectrum.upper()}")[1]
         if not color:
             return
-        plotman.set_style(spectrum, color=color)
-        canvas.draw_idle()
+        for canvas in plotman.set_style(spectrum, color=color):
+            canvas.draw_idle()
 
-    def _update_linewidth(self, spectrum, lw, plotman, canvas):
-        plotman.set_style(spectrum, linewidth=lw)
-        canvas.draw_idle()
+    def _update_linewidth(self, spectrum, lw, plotman, canvases):
+        self._schedule_redraw(plotman.set_style(spectrum, linewidth=lw))
+
+    def _schedule_redraw(self, changed):
+        """Un solo draw_idle per frame e per canvas anche con molti eventi slider."""
+        if not changed:
+            return
+        scheduled = bool(self._redraw_pending)
+        self._redraw_pending |= set(changed)
+        if scheduled:
+            return
+
+        def redraw():
+            pending, self._redraw_pending = self._redraw_pending, set()
+            for canvas in pending:
+                canvas.draw_idle()
+
+        next(iter(changed)).get_tk_widget().after(self.REDRAW_INTERVAL_MS, redraw)
 
     # ==========================================================
     # GRIGLIA E SFONDO
     # ==========================================================
-    def _pick_grid_color(self, plotman, canvas):
+    def _pick_grid_color(self, plotman, canvases):
         color = askcolor(title="Colore griglia")[1]
         if not color:
             return
 
         # Applica a tutte le axes
-        for ax in canvas.figure.get_axes():
-            ax.grid(color=color)
-        canvas.draw_idle()
+        for canvas in canvases:
+            for ax in canvas.figure.get_axes():
+                ax.grid(color=color)
+            canvas.draw_idle()
 
-    def _pick_panel_color(self, plotman, canvas):
+    def _pick_panel_color(self, plotman, canvases):
         color = askcolor(title="Colore sfondo pannello")[1]
         if not color:
             return
 
-        for ax in canvas.figure.get_axes():
-            ax.set_facecolor(color)
-        canvas.draw_idle()
+        for canvas in canvases:
+            for ax in canvas.figure.get_axes():
+                ax.set_facecolor(color)
+            canvas.draw_idle()
 
     # ==========================================================
     # SALVATAGGIO STILI
@@ -211,7 +244,7 @@ class StylesIO:
     # ==========================================================
     # CARICAMENTO STILI
     # ==========================================================
-    def load_styles(self, plotman, canvas):
+    def load_styles(self, plotman, canvases):
         from tkinter import filedialog
         path = filedialog.askopenfilename(
             title="Carica stile",
@@ -228,7 +261,10 @@ class StylesIO:
             plotman.style_bpc = styles.get("bpc", plotman.style_bpc)
             plotman.style_ms1 = styles.get("ms1", plotman.style_ms1)
 
-            canvas.draw_idle()
+            for spectrum in ("tic", "bpc", "ms1"):
+                plotman.apply_style(spectrum)
+            for canvas in canvases:
+                canvas.draw_idle()
             messagebox.showinfo("Stile caricato", "Stile applicato correttamente.")
 
         except Exception as e: